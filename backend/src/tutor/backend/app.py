@@ -1,13 +1,27 @@
+from contextlib import contextmanager
 import io
-from typing import Any, TypeVar, Final
+import json
+import math
+import threading
+import time
+from typing import Any, Iterator, TypeVar, Final
 
 import numpy as np
 from PIL import Image
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 
-from tutor.backend.parse import parse_conversation, parse_message_face_emotions
-from tutor.model import Tutor
+from tutor.backend.capture import CaptureIntervalController
+from tutor.backend.frames import FrameChangeDetector
+from tutor.backend.interaction_log import InteractionLog
+from tutor.backend.parse import parse_conversation, parse_message_face_emotions, parse_timestamp
+from tutor.backend.sessions import SessionRequestTracker
+from tutor.model import Tutor, aggregate_face_emotions
+from tutor.model.emotion import FaceEmotionRating
+from tutor.model.language import AdmissionRejectedError, ModelPrice, UsageLedger, LedgerLog, ledger_scope
+from tutor.util.cancellation import cancellation_scope, RequestCancelledError
+from tutor.util.deadline import Deadline, DeadlineExceededError
+from tutor.util.metrics import METRICS
 
 _T = TypeVar('_T')
 
@@ -15,14 +29,76 @@ SESSION_ID_FIELD: Final[str] = "sessionId"
 CONVERSATION_FIELD: Final[str] = "conversation"
 USE_EMOTIONS_FIELD: Final[str] = "useEmotions"
 MESSAGE_FACE_EMOTION_FILED: Final[str] = "messageEmotions"
+DEADLINE_FIELD: Final[str] = "deadlineMs"
 
 IMAGE_FIELD: Final[str] = "image"
+TIMESTAMPS_FIELD: Final[str] = "timestamps"
+NEXT_CAPTURE_FIELD: Final[str] = "nextCaptureMs"
 
-def make_app(tutor_model: Tutor, use_error_handler: bool = True) -> Flask:
+USAGE_FIELD: Final[str] = "usage"
+
+
+def make_app(
+        tutor_model: Tutor,
+        use_error_handler: bool = True,
+        default_deadline_ms: float | None = None,
+        model_prices: dict[str, ModelPrice] | None = None,
+        ledger_log: LedgerLog | None = None,
+        frame_detector: FrameChangeDetector | None = None,
+        capture_controller: CaptureIntervalController | None = None,
+        interaction_log: InteractionLog | None = None,
+) -> Flask:
+    """
+    :param tutor_model: The tutor serving the requests.
+    :param use_error_handler: Whether unexpected errors should be answered with a generic error response.
+    :param default_deadline_ms: The time budget of a tutor request in milliseconds if the request does not specify
+    one itself; ``None`` for no time limit.
+    :param model_prices: The prices of the language models used to estimate the cost of each request.
+    :param ledger_log: The log to which the token usage of each tutor request is appended, if any.
+    :param frame_detector: The detector of unchanged frames, whose face emotion is reused instead of scored again;
+    every frame is scored if ``None``.
+    :param capture_controller: The controller recommending each session's next capture interval, which face emotion
+    responses include as ``nextCaptureMs``; no recommendation if ``None``.
+    :param interaction_log: The log to which every answered tutor request is handed off, if any.
+    """
 
     app = Flask(__name__)
     CORS(app)
 
+    session_tracker = SessionRequestTracker()
+    seen_endpoints: set[str] = set()
+    seen_endpoints_lock = threading.Lock()
+
+    @app.before_request
+    def start_request_timer() -> None:
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_latency(response: Any) -> Any:
+        # the first request of each endpoint is reported apart, so that cold starts do not show up as latency spikes
+        start = g.get("request_start")
+        if start is None or request.endpoint is None:
+            return response
+        latency_ms = (time.perf_counter() - start) * 1000.0
+        with seen_endpoints_lock:
+            first = request.endpoint not in seen_endpoints
+            seen_endpoints.add(request.endpoint)
+        metric = "first_latency_ms" if first else "latency_ms"
+        METRICS.window(f"request.{request.endpoint}.{metric}").add(latency_ms)
+        return response
+
+    @contextmanager
+    def _capture_tracking() -> Iterator[None]:
+        # face emotion requests in flight indicate the server's load to the capture controller
+        if capture_controller is None:
+            yield
+            return
+        capture_controller.begin()
+        try:
+            yield
+        finally:
+            capture_controller.end()
+
     @app.route("/tutor", methods=["POST"])
     def tutor() -> tuple[Any, int]:
         """
@@ -34,18 +110,60 @@ def make_app(tutor_model: Tutor, use_error_handler: bool = True) -> Flask:
             if field not in data:
                return jsonify({"error": f"JSON data is missing required '{field}' value"}), 400
 
-        # session_id = str(data[SESSION_ID_FIELD])
+        session_id = data.get(SESSION_ID_FIELD)
+        if session_id is not None:
+            session_id = str(session_id)
         conversation_raw = data[CONVERSATION_FIELD]
         use_emotions_raw = data[USE_EMOTIONS_FIELD]
         msg_face_emotions_raw = data[MESSAGE_FACE_EMOTION_FILED]
+        deadline_ms = data.get(DEADLINE_FIELD, default_deadline_ms)
+        if deadline_ms is not None:
+            try:
+                deadline_ms = float(deadline_ms)
+            except (TypeError, ValueError):
+                deadline_ms = None
+            if deadline_ms is None or not math.isfinite(deadline_ms) or deadline_ms <= 0:
+                return jsonify({"error": f"'{DEADLINE_FIELD}' must be a positive number of milliseconds"}), 400
 
 
         conversation = parse_conversation(conversation_raw)
         use_emotions = bool(use_emotions_raw)
         msg_face_emotions = parse_message_face_emotions(msg_face_emotions_raw)
+        deadline = Deadline(None if deadline_ms is None else deadline_ms / 1000.0)
 
-        response, add_content = tutor_model.generate_response(conversation, use_emotions, msg_face_emotions)
-        result = jsonify({"response": response, **add_content})
+        # a newer request of the same session cancels the remaining stages of this one
+        token = session_tracker.begin(session_id)
+        ledger = UsageLedger(model_prices)
+        try:
+            with cancellation_scope(token), ledger_scope(ledger):
+                response, add_content = tutor_model.generate_response(
+                    conversation, use_emotions, msg_face_emotions, deadline, session_id
+                )
+        except RequestCancelledError:
+            return jsonify({"error": "The request was superseded by a newer request of the session."}), 409
+        except DeadlineExceededError:
+            return jsonify({
+                "error": "The tutor could not respond within the deadline.", USAGE_FIELD: ledger.summary()
+            }), 504
+        finally:
+            session_tracker.end(session_id, token)
+            # calls of cancelled requests consumed tokens as well
+            ledger.publish(METRICS)
+            if ledger_log is not None:
+                ledger_log.write(ledger, session_id)
+
+        if interaction_log is not None:
+            # only queued here, the log is written in the background
+            interaction_log.write({
+                "t": round(time.time(), 3),
+                "sessionId": session_id,
+                "useEmotions": use_emotions,
+                "message": conversation[-1].content if conversation else None,
+                "response": response,
+                "usedInput": add_content,
+            })
+
+        result = jsonify({"response": response, **add_content, USAGE_FIELD: ledger.summary()})
         return result, 200
 
 
@@ -58,17 +176,100 @@ def make_app(tutor_model: Tutor, use_error_handler: bool = True) -> Flask:
         if file.filename == "":
             return jsonify({"error": "No file selected for uploading"}), 400
 
+        session_id = request.form.get(SESSION_ID_FIELD)
         img_bytes = file.read()
-        img = Image.open(io.BytesIO(img_bytes))
 
-        emotion, confidence = tutor_model.predict_face_emotion(img)
+        with _capture_tracking():
+            thumbnail = None
+            cached = None
+            if frame_detector is not None:
+                thumbnail = frame_detector.thumbnail(img_bytes)
+                cached = frame_detector.lookup(session_id, thumbnail)
 
-        result = jsonify({
-            "emotion": emotion,
-            "confidence": confidence,
-        })
+            if cached is not None:
+                emotion, confidence = cached
+            else:
+                img = Image.open(io.BytesIO(img_bytes))
+                emotion, confidence = tutor_model.predict_face_emotion(img)
+                if frame_detector is not None:
+                    frame_detector.store(session_id, thumbnail, (emotion, confidence))
 
-        return result, 200
+            result = {
+                "emotion": emotion,
+                "confidence": confidence,
+            }
+            if capture_controller is not None:
+                result[NEXT_CAPTURE_FIELD] = capture_controller.next_interval_ms(session_id, [emotion])
+
+        return jsonify(result), 200
+
+    @app.route("/faceEmotions", methods=["POST"])
+    def faceEmotions() -> tuple[Any, int]:
+        """
+        Score several frames of a session at once and aggregate them into one sentiment.
+        """
+        files = [file for file in request.files.getlist(IMAGE_FIELD) if file.filename != ""]
+        if not files:
+            return jsonify({"error": "No image part in the request"}), 400
+
+        try:
+            timestamps = [parse_timestamp(t) for t in json.loads(request.form.get(TIMESTAMPS_FIELD, "null"))]
+        except (TypeError, ValueError):
+            timestamps = None
+        if timestamps is None or len(timestamps) != len(files):
+            return jsonify({"error": f"Form data needs a '{TIMESTAMPS_FIELD}' JSON list with one ISO timestamp "
+                                     f"per image"}), 400
+
+        session_id = request.form.get(SESSION_ID_FIELD)
+        frames = [file.read() for file in files]
+
+        with _capture_tracking():
+            if frame_detector is not None:
+                thumbnails = [frame_detector.thumbnail(frame) for frame in frames]
+                sources, remembered = frame_detector.plan(session_id, thumbnails)
+            else:
+                thumbnails = None
+                sources, remembered = list(range(len(frames))), None
+
+            scored = sorted({source for source in sources if source is not None})
+            results = dict(zip(scored, tutor_model.predict_face_emotions(
+                [Image.open(io.BytesIO(frames[i])) for i in scored]
+            ))) if scored else {}
+            if frame_detector is not None and scored:
+                frame_detector.store(session_id, thumbnails[scored[-1]], results[scored[-1]])
+
+            ratings = [
+                FaceEmotionRating(*(remembered if source is None else results[source]), timestamp=timestamp)
+                for source, timestamp in zip(sources, timestamps)
+            ]
+            ordered_ratings = sorted(ratings, key=lambda rating: rating.timestamp)
+            aggregated = aggregate_face_emotions(ordered_ratings)
+
+            result = {
+                "frames": [
+                    {"emotion": rating.emotion, "confidence": rating.confidence,
+                     "timestamp": rating.timestamp.isoformat()}
+                    for rating in ratings
+                ],
+                "sentiment": aggregated[0],
+                "confidence": float(aggregated[1]),
+            }
+            if capture_controller is not None:
+                result[NEXT_CAPTURE_FIELD] = capture_controller.next_interval_ms(
+                    session_id, [rating.emotion for rating in ordered_ratings]
+                )
+
+        return jsonify(result), 200
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics() -> tuple[Any, int]:
+        return jsonify(METRICS.snapshot()), 200
+
+    @app.errorhandler(AdmissionRejectedError)
+    def handle_admission_rejected(e: AdmissionRejectedError) -> tuple[Any, int, dict]:
+        retry_after = max(1, math.ceil(e.retry_after))
+        result = jsonify({"error": "The tutor is busy, please retry later.", "retryAfter": retry_after})
+        return result, 503, {"Retry-After": str(retry_after)}
 
     if use_error_handler:
         @app.errorhandler(Exception)
@@ -1,3 +1,4 @@
+import atexit
 import os
 from typing import Final
 
@@ -6,7 +7,11 @@ import huggingface_hub
 import transformers
 
 from tutor.backend.app import make_app
+from tutor.backend.capture import CaptureIntervalController
+from tutor.backend.frames import FrameChangeDetector
+from tutor.backend.interaction_log import InteractionLog
 from tutor.backend.logic import TutorType, make_tutor
+from tutor.model.language import LedgerLog, load_prices
 
 TRANSFORMERS_SEED: Final[int] = 42
 
@@ -22,7 +27,60 @@ def main():
 
     tutor = make_tutor(TutorType.LLM)
 
-    app = make_app(tutor, use_error_handler=False)
+    default_deadline_ms = os.getenv("TUTOR_DEADLINE_MS")
+    if default_deadline_ms:
+        default_deadline_ms = float(default_deadline_ms)
+    else:
+        default_deadline_ms = None
+
+    prices_file = os.getenv("LLM_PRICES_FILE")
+    model_prices = load_prices(prices_file) if prices_file else None
+    ledger_log_file = os.getenv("LLM_LEDGER_LOG")
+    ledger_log = LedgerLog(ledger_log_file) if ledger_log_file else None
+    if ledger_log is not None:
+        # write the queued lines on shutdown
+        atexit.register(ledger_log.close)
+
+    frame_change_threshold = os.getenv("FACE_CHANGE_THRESHOLD")
+    if frame_change_threshold:
+        frame_detector = FrameChangeDetector(
+            threshold=float(frame_change_threshold),
+            max_staleness=float(os.getenv("FACE_MAX_STALENESS", "5")),
+        )
+    else:
+        frame_detector = None
+
+    capture_controller = CaptureIntervalController(
+        min_interval_ms=float(os.getenv("FACE_MIN_CAPTURE_MS", "250")),
+        max_interval_ms=float(os.getenv("FACE_MAX_CAPTURE_MS", "4000")),
+        target_in_flight=int(os.getenv("FACE_TARGET_IN_FLIGHT", "4")),
+    )
+
+    interaction_log_dir = os.getenv("INTERACTION_LOG_DIR")
+    if interaction_log_dir:
+        interaction_log = InteractionLog(
+            os.path.expanduser(interaction_log_dir),
+            log_format=os.getenv("INTERACTION_LOG_FORMAT", "jsonl"),
+            max_queue=int(os.getenv("INTERACTION_LOG_QUEUE", "10000")),
+            overflow=os.getenv("INTERACTION_LOG_OVERFLOW", "drop"),
+            segment_records=int(os.getenv("INTERACTION_LOG_SEGMENT_RECORDS", "100000")),
+            segment_seconds=float(os.getenv("INTERACTION_LOG_SEGMENT_SECONDS", "3600")),
+        )
+        # write the queued records on shutdown
+        atexit.register(interaction_log.close)
+    else:
+        interaction_log = None
+
+    app = make_app(
+        tutor,
+        use_error_handler=False,
+        default_deadline_ms=default_deadline_ms,
+        model_prices=model_prices,
+        ledger_log=ledger_log,
+        frame_detector=frame_detector,
+        capture_controller=capture_controller,
+        interaction_log=interaction_log,
+    )
     app.run(debug=True, use_reloader=False, port=5050)
 
 
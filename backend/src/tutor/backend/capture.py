@@ -0,0 +1,81 @@
+from collections import OrderedDict
+import threading
+from typing import Final, Sequence
+
+from tutor.model.emotion import Emotion
+from tutor.util.metrics import METRICS
+
+NEXT_CAPTURE_METRIC: Final[str] = "face_emotion.next_capture_ms"
+IN_FLIGHT_METRIC: Final[str] = "face_emotion.in_flight"
+
+
+class CaptureIntervalController:
+    """
+    Recommends to each session the time until it should capture its next webcam frame.
+    The interval of a session grows while its face emotion stays the same and falls back to the minimum as soon as
+    the emotion changes. It is further stretched while more face emotion requests are in flight than the target,
+    so clients slow down before the inference queue builds up.
+    """
+
+    def __init__(
+            self,
+            min_interval_ms: float = 250.0,
+            max_interval_ms: float = 4000.0,
+            backoff: float = 1.5,
+            target_in_flight: int = 4,
+            max_sessions: int = 1024,
+    ) -> None:
+        """
+        :param min_interval_ms: The interval while the emotion changes and the server is idle.
+        :param max_interval_ms: The longest recommended interval.
+        :param backoff: The factor by which the interval of a session grows per frame with an unchanged emotion.
+        :param target_in_flight: The number of concurrent face emotion requests the server handles without delay.
+        :param max_sessions: The number of sessions whose interval is remembered; the least recently active sessions
+        are forgotten first.
+        """
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max_interval_ms
+        self.backoff = backoff
+        self.target_in_flight = target_in_flight
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict[str, tuple[Emotion, float]] = OrderedDict()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def begin(self) -> None:
+        """
+        Registers a face emotion request in flight.
+        """
+        with self._lock:
+            self._in_flight += 1
+            in_flight = self._in_flight
+        METRICS.window(IN_FLIGHT_METRIC).add(in_flight)
+
+    def end(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def next_interval_ms(self, session_id: str | None, emotions: Sequence[Emotion]) -> int:
+        """
+        :param session_id: The session of the scored frames; only the server load is considered if ``None``.
+        :param emotions: The face emotions of the session's frames of this request, in capture order.
+        :return: The recommended time in milliseconds until the session's next capture.
+        """
+        with self._lock:
+            # the request itself is still in flight
+            load = max(1.0, (self._in_flight - 1) / self.target_in_flight)
+            interval = self.min_interval_ms
+            if session_id is not None and emotions:
+                previous = self._sessions.get(session_id)
+                if previous is not None:
+                    previous_emotion, previous_interval = previous
+                    if all(emotion == previous_emotion for emotion in emotions):
+                        interval = min(previous_interval * self.backoff, self.max_interval_ms)
+                self._sessions[session_id] = (emotions[-1], interval)
+                self._sessions.move_to_end(session_id)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+
+        interval = min(interval * load, self.max_interval_ms)
+        METRICS.window(NEXT_CAPTURE_METRIC).add(interval)
+        return int(round(interval))
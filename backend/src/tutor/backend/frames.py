@@ -0,0 +1,124 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import io
+import threading
+import time
+from typing import Final, Sequence
+
+import numpy as np
+from PIL import Image
+
+from tutor.model.emotion import Emotion
+from tutor.util.metrics import METRICS
+
+FRAMES_METRIC: Final[str] = "face_emotion.frames"
+SKIPPED_FRAMES_METRIC: Final[str] = "face_emotion.skipped_frames"
+
+
+def frame_thumbnail(image_bytes: bytes, size: int = 32) -> np.ndarray:
+    """
+    Decodes an encoded frame into a small grayscale thumbnail. JPEG frames are decoded at a reduced scale, which is
+    much cheaper than a full decode.
+    :return: The thumbnail with shape ``(size, size)`` and values in [0, 1], with its mean brightness subtracted so
+    changes of the camera's exposure do not count as changes of the frame.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft("L", (size * 4, size * 4))
+    thumbnail = np.asarray(image.convert("L").resize((size, size), Image.BILINEAR), dtype=np.float32) / 255.0
+    return thumbnail - thumbnail.mean()
+
+
+@dataclass
+class _ScoredFrame:
+    thumbnail: np.ndarray
+    result: tuple[Emotion, float]
+    scored_at: float
+
+
+class FrameChangeDetector:
+    """
+    Remembers the last scored frame of each session, so near-identical frames reuse its face emotion instead of
+    being scored again. A frame is rescored anyway once the remembered result is older than the maximum staleness.
+    The numbers of received and skipped frames are published as metrics.
+    """
+
+    def __init__(
+            self,
+            threshold: float = 0.02,
+            max_staleness: float = 5.0,
+            thumbnail_size: int = 32,
+            max_sessions: int = 1024,
+    ) -> None:
+        """
+        :param threshold: The mean absolute difference of two thumbnails, within [0, 1], below which frames are
+        considered identical.
+        :param max_staleness: The time in seconds a scored result may be reused.
+        :param thumbnail_size: The width and height of the compared thumbnails in pixels.
+        :param max_sessions: The number of sessions whose last frame is remembered; the least recently active
+        sessions are forgotten first.
+        """
+        self.threshold = threshold
+        self.max_staleness = max_staleness
+        self.thumbnail_size = thumbnail_size
+        self.max_sessions = max_sessions
+        self._frames: OrderedDict[str, _ScoredFrame] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def thumbnail(self, image_bytes: bytes) -> np.ndarray:
+        return frame_thumbnail(image_bytes, self.thumbnail_size)
+
+    def changed(self, thumbnail: np.ndarray, reference: np.ndarray) -> bool:
+        return float(np.abs(thumbnail - reference).mean()) >= self.threshold
+
+    def _remembered(self, session_id: str | None) -> _ScoredFrame | None:
+        if session_id is None:
+            return None
+        with self._lock:
+            frame = self._frames.get(session_id)
+            if frame is None:
+                return None
+            self._frames.move_to_end(session_id)
+        if time.monotonic() - frame.scored_at > self.max_staleness:
+            return None
+        return frame
+
+    def plan(self, session_id: str | None, thumbnails: Sequence[np.ndarray]) \
+            -> tuple[list[int | None], tuple[Emotion, float] | None]:
+        """
+        Determines which of the session's consecutive frames have to be scored. Each frame is compared to the last
+        frame scored before it, i.e. the session's last scored frame or an earlier frame of the given ones.
+        :return: For each frame, the index of the frame whose result it uses, which is its own index if it has to be
+        scored, or ``None`` if it reuses the session's last scored result; and that result.
+        """
+        remembered = self._remembered(session_id)
+        reference = remembered.thumbnail if remembered is not None else None
+        reference_index = None
+        sources = []
+        for i, thumbnail in enumerate(thumbnails):
+            if reference is None or self.changed(thumbnail, reference):
+                reference, reference_index = thumbnail, i
+            sources.append(reference_index)
+
+        METRICS.counter(FRAMES_METRIC).increment(len(thumbnails))
+        METRICS.counter(SKIPPED_FRAMES_METRIC).increment(sum(1 for i, source in enumerate(sources) if source != i))
+        return sources, remembered.result if remembered is not None else None
+
+    def lookup(self, session_id: str | None, thumbnail: np.ndarray) -> tuple[Emotion, float] | None:
+        """
+        :return: The result of the session's last scored frame if the given frame is near-identical to it and the
+        result is not stale, ``None`` if the frame has to be scored.
+        """
+        sources, remembered = self.plan(session_id, [thumbnail])
+        return remembered if sources[0] is None else None
+
+    def store(self, session_id: str | None, thumbnail: np.ndarray, result: tuple[Emotion, float]) -> None:
+        """
+        Remembers the result of a scored frame of the session.
+        """
+        if session_id is None:
+            return
+        with self._lock:
+            self._frames[session_id] = _ScoredFrame(thumbnail, result, time.monotonic())
+            self._frames.move_to_end(session_id)
+            while len(self._frames) > self.max_sessions:
+                self._frames.popitem(last=False)
@@ -0,0 +1,214 @@
+from datetime import datetime
+import gzip
+import json
+import logging
+import os
+from pathlib import Path
+import queue
+import threading
+import time
+from typing import Any, Final, Literal, Union
+
+import fastparquet
+import pandas as pd
+
+from tutor.util.metrics import METRICS
+
+_logger = logging.getLogger(__name__)
+
+LogFormat = Literal["jsonl", "parquet"]
+OverflowPolicy = Literal["drop", "block"]
+
+RECORDS_METRIC: Final[str] = "interaction_log.records"
+DROPPED_METRIC: Final[str] = "interaction_log.dropped"
+WRITE_ERRORS_METRIC: Final[str] = "interaction_log.write_errors"
+QUEUE_SIZE_METRIC: Final[str] = "interaction_log.queue_size"
+BATCH_WRITE_METRIC: Final[str] = "interaction_log.batch_write_ms"
+
+_SEGMENT_SUFFIXES: Final[dict[str, str]] = {"jsonl": ".jsonl.gz", "parquet": ".parquet"}
+_STOP: Final[object] = object()
+
+
+class InteractionLog:
+    """
+    Write-behind log of tutor interactions, which keeps writing files off the request path.
+    ``write`` only puts the record into a bounded queue; a background thread takes the queued records in batches and
+    appends them to the current segment file, either gzip-compressed JSON lines (one gzip member per batch) or
+    parquet (one row group per batch). A new segment is started once the current one holds ``segment_records``
+    records or is ``segment_seconds`` old; batches are split where a segment is full.
+    If the queue is full, records are dropped or the caller waits for room, depending on the overflow policy.
+    ``close`` writes the remaining records, e.g. on shutdown.
+    """
+
+    def __init__(
+            self,
+            directory: Union[str, Path],
+            log_format: LogFormat = "jsonl",
+            max_queue: int = 10000,
+            overflow: OverflowPolicy = "drop",
+            block_timeout: float | None = 1.0,
+            batch_size: int = 256,
+            flush_interval: float = 1.0,
+            segment_records: int = 100000,
+            segment_seconds: float = 3600.0,
+    ) -> None:
+        """
+        :param directory: The directory receiving the segments.
+        :param log_format: The format of the segments, ``"jsonl"`` or ``"parquet"``. The columns of a parquet segment
+        are those of its first batch; a batch with further columns starts a new segment. Nested values are stored as
+        JSON strings.
+        :param max_queue: The maximum number of records waiting to be written.
+        :param overflow: Whether records are dropped (``"drop"``) or callers wait (``"block"``) while the queue is full.
+        :param block_timeout: The maximum time in seconds a caller waits for room before the record is dropped;
+        unlimited if ``None``.
+        :param batch_size: The maximum number of records written at once.
+        :param flush_interval: The maximum time in seconds a record waits for more records to fill a batch.
+        :param segment_records: The number of records after which a new segment is started.
+        :param segment_seconds: The age in seconds after which a new segment is started.
+        """
+        if log_format not in _SEGMENT_SUFFIXES:
+            raise ValueError(f"Unknown interaction log format '{log_format}'")
+        if overflow not in ("drop", "block"):
+            raise ValueError(f"Unknown overflow policy '{overflow}'")
+        if segment_records < 1:
+            raise ValueError(f"A segment must hold at least one record, got {segment_records}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.log_format = log_format
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.segment_records = segment_records
+        self.segment_seconds = segment_seconds
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._segment_path: Path | None = None
+        self._segment_started = 0.0
+        self._segment_size = 0
+        self._segment_columns: list[str] | None = None
+        self._segment_index = 0
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name="interaction-log", daemon=True)
+        self._writer.start()
+
+    def write(self, record: dict[str, Any]) -> bool:
+        """
+        Queues a JSON-compatible record for writing.
+        :return: Whether the record was queued; ``False`` if it was dropped.
+        """
+        if self._closed:
+            return False
+        try:
+            if self.overflow == "block":
+                self._queue.put(record, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            METRICS.counter(DROPPED_METRIC).increment()
+            return False
+        return True
+
+    def flush(self) -> None:
+        """
+        Waits until all queued records are written.
+        """
+        self._queue.join()
+
+    def close(self, timeout: float | None = 10.0) -> None:
+        """
+        Writes the queued records and stops the writer. Records written afterwards are dropped.
+        :param timeout: The maximum time in seconds to wait for the writer; unlimited if ``None``.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._writer.join(timeout)
+
+    def _run(self) -> None:
+        stopped = False
+        while not stopped:
+            item = self._queue.get()
+            items = [item]
+            # fill the batch with the records arriving within the flush interval
+            deadline = time.monotonic() + self.flush_interval
+            while item is not _STOP and len(items) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                items.append(item)
+
+            stopped = items[-1] is _STOP
+            batch = [record for record in items if record is not _STOP]
+            try:
+                if batch:
+                    self._write_batch(batch)
+            except Exception as e:
+                METRICS.counter(WRITE_ERRORS_METRIC).increment()
+                _logger.error(f"Failed to write {len(batch)} interaction records: {e!r}")
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+                METRICS.gauge(QUEUE_SIZE_METRIC).set(self._queue.qsize())
+
+    def _rotate_if_needed(self) -> None:
+        if (
+                self._segment_path is not None
+                and self._segment_size < self.segment_records
+                and time.time() - self._segment_started < self.segment_seconds
+        ):
+            return
+        self._start_segment()
+
+    def _start_segment(self) -> None:
+        now = time.time()
+        self._segment_index += 1
+        timestamp = datetime.fromtimestamp(now).strftime("%Y%m%dT%H%M%S")
+        name = f"interactions-{timestamp}-{os.getpid()}-{self._segment_index:04d}{_SEGMENT_SUFFIXES[self.log_format]}"
+        self._segment_path = self.directory / name
+        self._segment_started = now
+        self._segment_size = 0
+        self._segment_columns = None
+
+    def _write_batch(self, batch: list[dict[str, Any]]) -> None:
+        start = time.perf_counter()
+        offset = 0
+        while offset < len(batch):
+            self._rotate_if_needed()
+            # the part of the batch that fits into the current segment
+            part = batch[offset:offset + self.segment_records - self._segment_size]
+            if self.log_format == "jsonl":
+                data = "".join(json.dumps(record, separators=(",", ":"), default=str) + "\n" for record in part)
+                # every batch is a complete gzip member, so a crash never corrupts earlier batches
+                with gzip.open(self._segment_path, "ab") as f:
+                    f.write(data.encode("utf-8"))
+            else:
+                self._write_parquet(part)
+            self._segment_size += len(part)
+            offset += len(part)
+        METRICS.counter(RECORDS_METRIC).increment(len(batch))
+        METRICS.window(BATCH_WRITE_METRIC).add((time.perf_counter() - start) * 1000.0)
+
+    def _write_parquet(self, batch: list[dict[str, Any]]) -> None:
+        rows = [
+            {
+                key: json.dumps(value, separators=(",", ":"), default=str) if isinstance(value, (dict, list)) else value
+                for key, value in record.items()
+            }
+            for record in batch
+        ]
+        frame = pd.DataFrame(rows)
+        if self._segment_columns is not None and not set(frame.columns) <= set(self._segment_columns):
+            # the columns of a parquet file cannot be extended, so the new columns go into a new segment
+            _logger.info(f"Starting a new interaction log segment for the new columns "
+                         f"{sorted(set(frame.columns) - set(self._segment_columns))}")
+            self._start_segment()
+        if self._segment_columns is None:
+            self._segment_columns = list(frame.columns)
+        frame = frame.reindex(columns=self._segment_columns)
+        append = self._segment_path.exists()
+        fastparquet.write(str(self._segment_path), frame, compression="GZIP", append=append,
+                          object_encoding="utf8", write_index=False)
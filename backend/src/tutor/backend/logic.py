@@ -1,15 +1,27 @@
 import os
 from enum import Enum
 from pathlib import Path
+from typing import Callable, Final
 
 from accelerate import Accelerator
 import torch
 from transformers import BertTokenizer, AutoTokenizer, AutoModelForCausalLM, ViTImageProcessor, ViTForImageClassification
 from peft import PeftModel, PeftConfig
 
-from tutor.model import Tutor, ReturnPromptTutor, LLMTutor, MockTutor, EchoTutor, BasicPromptGenerator
-from tutor.model.emotion import EmotionModel, LocalEmotionModel, EmotionBert, FaceEmotionModel, LocalFaceEmotionModel
-from tutor.model.language import LanguageModel, LanguageModelEndpoint, LocalLanguageModel, GeminiLanguageModel
+from tutor.model import Tutor, ReturnPromptTutor, LLMTutor, MockTutor, EchoTutor, PromptGenerator, \
+    BasicPromptGenerator, ConversationWindow, ConversationCache, SemanticIndex, ModelRegistry, ManagedLanguageModel, \
+    ManagedEmotionModel, model_file_bytes
+from tutor.model.emotion import EmotionModel, LocalEmotionModel, EmotionBert, FaceEmotionModel, LocalFaceEmotionModel, \
+    CascadeEmotionModel, load_emotion_student, load_tfidf_emotion_model, load_checkpoint
+from tutor.model.emotion.checkpoint import CHECKPOINT_FILE
+from tutor.model.tutor import DEFAULT_MAX_STAGE_WORKERS
+from tutor.model.language import LanguageModel, LanguageModelEndpoint, LocalLanguageModel, GeminiLanguageModel, \
+    HedgedLanguageModel, RateLimitedLanguageModel
+from tutor.util.warmup import load_compile_cache, save_compile_cache
+
+
+SENTIMENT_BASE_MODEL: Final[str] = "bert-base-uncased"
+FACE_EMOTION_BASE_MODEL: Final[str] = "jayanta/google-vit-base-patch16-224-cartoon-face-recognition"
 
 
 class TutorType(Enum):
@@ -19,24 +31,120 @@ class TutorType(Enum):
     Echo = 3
 
 
-def make_sentiment_model(models_root: str, device: torch.device) -> EmotionModel | None:
+def _use_compile() -> bool:
+    return os.getenv("TORCH_COMPILE", "").lower() in ("1", "true", "yes")
+
+
+def _compile_cache_dir(models_root: str) -> str:
+    return os.path.expanduser(os.getenv("TORCH_COMPILE_CACHE_DIR", os.path.join(models_root, "compile_cache")))
+
+
+def make_model_registry() -> ModelRegistry | None:
+    budget_mb = os.getenv("MODEL_MEMORY_BUDGET_MB")
+    if not budget_mb:
+        return None
+    idle_timeout = os.getenv("MODEL_IDLE_TIMEOUT")
+    return ModelRegistry(int(float(budget_mb) * 2 ** 20), float(idle_timeout) if idle_timeout else None)
+
+
+def _managed_emotion_model(
+        registry: ModelRegistry | None,
+        name: str,
+        loader: Callable[[], EmotionModel],
+        memory_bytes: int | None = None,
+) -> EmotionModel:
+    """
+    :param memory_bytes: The expected memory of the model; unknown if ``None``.
+    :return: The model loaded on demand by the registry, or the model loaded right away if there is no registry.
+    """
+    if registry is None:
+        return loader()
+    registry.register(name, loader, memory_bytes)
+    return ManagedEmotionModel(registry, name)
+
+
+def _managed_language_model(
+        registry: ModelRegistry | None,
+        name: str,
+        loader: Callable[[], LanguageModel],
+        memory_bytes: int | None = None,
+) -> LanguageModel:
+    """
+    :param memory_bytes: The expected memory of the model; unknown if ``None``.
+    :return: The model loaded on demand by the registry, or the model loaded right away if there is no registry.
+    """
+    if registry is None:
+        return loader()
+    registry.register(name, loader, memory_bytes)
+    return ManagedLanguageModel(registry, name)
+
+
+def _sentiment_window_kwargs() -> dict:
+    max_windows = os.getenv("SENTIMENT_MAX_WINDOWS", "8")
+    return dict(
+        max_window_tokens=int(os.getenv("SENTIMENT_WINDOW_TOKENS", "512")),
+        window_overlap=int(os.getenv("SENTIMENT_WINDOW_OVERLAP", "64")),
+        max_windows=int(max_windows) if max_windows else None,
+    )
+
+
+def make_teacher_sentiment_model(models_root: str, device: torch.device) -> LocalEmotionModel:
     bert_model_path = os.path.join(models_root, "sentiment/BERT_model_3emo_3cls_deepseek.pt")
     bert_tokenizer_dir = os.path.join(models_root, "sentiment")
 
-    bert_model = EmotionBert()
-    bert_model.load_state_dict(torch.load(bert_model_path, map_location=device))
-    bert_model.eval()
+    checkpoint_path = os.path.join(models_root, "sentiment", CHECKPOINT_FILE)
+    if os.path.exists(checkpoint_path):
+        # memory-mapped weights, without loading the pre-trained model first
+        bert_model = load_checkpoint(checkpoint_path, device)
+    else:
+        bert_model = EmotionBert()
+        bert_model.load_state_dict(torch.load(bert_model_path, map_location=device))
+        bert_model.eval()
+    if _use_compile():
+        # the classification head is too small to benefit from compilation
+        bert_model.bert.compile(dynamic=True)
     bert_tokenizer = BertTokenizer.from_pretrained(bert_tokenizer_dir)
 
-    return LocalEmotionModel(bert_tokenizer, bert_model)
+    return LocalEmotionModel(bert_tokenizer, bert_model, **_sentiment_window_kwargs())
+
+
+def make_student_sentiment_model(student_dir: str, device: torch.device) -> LocalEmotionModel:
+    student = load_emotion_student(student_dir, device)
+    if _use_compile():
+        student.bert.compile(dynamic=True)
+    tokenizer = BertTokenizer.from_pretrained(student_dir)
+    return LocalEmotionModel(tokenizer, student, **_sentiment_window_kwargs())
+
+
+def make_sentiment_model(models_root: str, device: torch.device) -> EmotionModel | None:
+    student_dir = os.getenv("SENTIMENT_STUDENT_DIR")
+    if student_dir:
+        model = make_student_sentiment_model(os.path.expanduser(student_dir), device)
+    else:
+        model = make_teacher_sentiment_model(models_root, device)
+
+    cascade_model_path = os.getenv("SENTIMENT_CASCADE_MODEL")
+    if cascade_model_path:
+        first = load_tfidf_emotion_model(os.path.expanduser(cascade_model_path))
+        return CascadeEmotionModel(first, model, float(os.getenv("SENTIMENT_CASCADE_THRESHOLD", "0.5")))
+    return model
 
 def make_face_emotion_model(models_root: str, device: torch.device) -> FaceEmotionModel | None:
-    model_path = r"jayanta/google-vit-base-patch16-224-cartoon-face-recognition"
-    model_weights_path = os.path.join(models_root, "face_emotion", "model.pt")
-    processor = ViTImageProcessor.from_pretrained(model_path)
-    model = ViTForImageClassification.from_pretrained(model_path, num_labels=3, ignore_mismatched_sizes=True)
-    model.load_state_dict(torch.load(model_weights_path, map_location=device))
-    model.eval()
+    model_dir = os.path.join(models_root, "face_emotion")
+    model_weights_path = os.path.join(model_dir, "model.pt")
+    checkpoint_path = os.path.join(model_dir, CHECKPOINT_FILE)
+    if os.path.exists(checkpoint_path):
+        # the converter stores the processor config next to the checkpoint
+        processor = ViTImageProcessor.from_pretrained(model_dir)
+        model = load_checkpoint(checkpoint_path, device)
+    else:
+        processor = ViTImageProcessor.from_pretrained(FACE_EMOTION_BASE_MODEL)
+        model = ViTForImageClassification.from_pretrained(FACE_EMOTION_BASE_MODEL, num_labels=3,
+                                                          ignore_mismatched_sizes=True)
+        model.load_state_dict(torch.load(model_weights_path, map_location=device))
+        model.eval()
+    if _use_compile():
+        model.compile(dynamic=True)
     return LocalFaceEmotionModel(processor, model)
 
 
@@ -50,21 +158,127 @@ def make_description_model(models_root: str, device: torch.device) -> LanguageMo
     return None
 
 
-def make_qa_model(models_root: str, device: torch.device) -> LanguageModel | None:
-    # qa_model_dir = os.path.join(models_root, "question_answer/Mistral7B_QA_5/checkpoint-2030")
-    # peft_config = PeftConfig.from_pretrained(qa_model_dir)
-    # base_model_name = peft_config.base_model_name_or_path
-    # base_model = AutoModelForCausalLM.from_pretrained(base_model_name, device_map=device, torch_dtype="auto")
-    # qa_model = PeftModel.from_pretrained(base_model, qa_model_dir, device_map=device, torch_dtype="auto")
-    # qa_model.eval()
-    # qa_tokenizer = AutoTokenizer.from_pretrained(qa_model_dir, device_map=device, torch_dtype="auto")
-    # return LocalLanguageModel(qa_tokenizer, qa_model)
-    return None
+def load_peft_language_model(model_dir: str, device: torch.device) -> LocalLanguageModel:
+    peft_config = PeftConfig.from_pretrained(model_dir)
+    base_model_name = peft_config.base_model_name_or_path
+    base_model = AutoModelForCausalLM.from_pretrained(base_model_name, device_map=device, torch_dtype="auto")
+    model = PeftModel.from_pretrained(base_model, model_dir, device_map=device, torch_dtype="auto")
+    model.eval()
+    tokenizer = AutoTokenizer.from_pretrained(model_dir, device_map=device, torch_dtype="auto")
+    return LocalLanguageModel(tokenizer, model)
+
 
+def make_qa_model(
+        models_root: str,
+        device: torch.device,
+        registry: ModelRegistry | None = None,
+) -> LanguageModel | None:
+    # e.g. question_answer/Mistral7B_QA_5/checkpoint-2030, relative to the models directory
+    qa_model_dir = os.getenv("QA_LOCAL_MODEL")
+    if not qa_model_dir:
+        return None
+    qa_model_dir = os.path.join(models_root, os.path.expanduser(qa_model_dir))
+    return _managed_language_model(registry, "qa", lambda: load_peft_language_model(qa_model_dir, device))
+
+
+def with_rate_limit(model: LanguageModel, env_prefix: str) -> LanguageModel:
+    """
+    Wraps the given model with the rate limits configured via ``<env_prefix>_RPM`` and ``<env_prefix>_TPM``.
+    The model is returned as is if no request limit is configured.
+    """
+    requests_per_minute = os.getenv(f"{env_prefix}_RPM")
+    if not requests_per_minute:
+        return model
+    tokens_per_minute = os.getenv(f"{env_prefix}_TPM")
+    return RateLimitedLanguageModel(
+        model,
+        requests_per_minute=float(requests_per_minute),
+        tokens_per_minute=float(tokens_per_minute) if tokens_per_minute else None,
+        max_queue=int(os.getenv("LLM_MAX_QUEUE", "32")),
+        max_wait=float(os.getenv("LLM_MAX_WAIT", "30")),
+    )
+
+
+def load_causal_language_model(model_dir: str, device: torch.device) -> LocalLanguageModel:
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModelForCausalLM.from_pretrained(model_dir, device_map=device, torch_dtype="auto")
+    model.eval()
+    return LocalLanguageModel(tokenizer, model)
 
-def make_tutor_model(models_root: str, device: torch.device) -> LanguageModel | None:
-    api_key = os.getenv("GOOGLE_AI_API_KEY")
-    return GeminiLanguageModel(api_key=api_key, model_name="learnlm-2.0-flash-experimental")
+
+def make_tutor_model(
+        models_root: str,
+        device: torch.device,
+        registry: ModelRegistry | None = None,
+) -> LanguageModel | None:
+    # an OpenAI-compatible endpoint replaces Gemini as primary backend, e.g. a local mock server for load tests
+    endpoint = os.getenv("TUTOR_ENDPOINT")
+    if endpoint:
+        endpoint_model = LanguageModelEndpoint(
+            api_endpoint=endpoint,
+            model_name=os.getenv("TUTOR_MODEL"),
+            bearer=os.getenv("TUTOR_API_KEY"),
+        )
+        backends = [with_rate_limit(endpoint_model, "TUTOR")]
+    else:
+        api_key = os.getenv("GOOGLE_AI_API_KEY")
+        gemini_model = GeminiLanguageModel(api_key=api_key, model_name="learnlm-2.0-flash-experimental")
+        backends = [with_rate_limit(gemini_model, "GEMINI")]
+
+    # optional fallback backends, queried when the primary backend is slow or fails
+    fallback_endpoint = os.getenv("TUTOR_FALLBACK_ENDPOINT")
+    if fallback_endpoint:
+        fallback_model = LanguageModelEndpoint(
+            api_endpoint=fallback_endpoint,
+            model_name=os.getenv("TUTOR_FALLBACK_MODEL"),
+            bearer=os.getenv("TUTOR_FALLBACK_API_KEY"),
+        )
+        backends.append(with_rate_limit(fallback_model, "TUTOR_FALLBACK"))
+
+    fallback_local_dir = os.getenv("TUTOR_FALLBACK_LOCAL_MODEL")
+    if fallback_local_dir:
+        backends.append(_managed_language_model(
+            registry, "tutor_fallback", lambda: load_causal_language_model(fallback_local_dir, device),
+            model_file_bytes(fallback_local_dir),
+        ))
+
+    if len(backends) == 1:
+        return backends[0]
+    return HedgedLanguageModel(backends)
+
+
+def make_conversation_window(
+        models_root: str,
+        prompt_generator: PromptGenerator,
+        summary_model: LanguageModel | None,
+) -> ConversationWindow | None:
+    max_turns = os.getenv("TUTOR_WINDOW_TURNS")
+    if not max_turns or summary_model is None:
+        return None
+    tokenizer_dir = os.getenv("TUTOR_WINDOW_TOKENIZER", os.path.join(models_root, "sentiment"))
+    return ConversationWindow(
+        prompt_generator,
+        summary_model,
+        AutoTokenizer.from_pretrained(tokenizer_dir),
+        max_turns=int(max_turns),
+        summary_interval=int(os.getenv("TUTOR_WINDOW_SUMMARY_INTERVAL", "4")),
+        max_summary_tokens=int(os.getenv("TUTOR_WINDOW_SUMMARY_TOKENS", "256")),
+    )
+
+
+def make_desc_qa_cache(sentiment_model: EmotionModel | None) -> ConversationCache[tuple[str, str]] | None:
+    threshold = os.getenv("TUTOR_DESC_QA_CACHE_THRESHOLD")
+    if not threshold or sentiment_model is None:
+        return None
+    index = SemanticIndex(
+        capacity=int(os.getenv("TUTOR_DESC_QA_CACHE_CAPACITY", "4096")),
+        threshold=float(threshold),
+        eviction=os.getenv("TUTOR_DESC_QA_CACHE_EVICTION", "lru"),
+        approximate=os.getenv("TUTOR_DESC_QA_CACHE_APPROXIMATE", "").lower() in ("1", "true", "yes"),
+        metrics_prefix="tutor.desc_qa_cache",
+    )
+    # the conversations are embedded with the pooled outputs of the sentiment model's encoder
+    return ConversationCache(sentiment_model, index)
 
 
 def make_tutor(tutor_type: TutorType = TutorType.LLM) -> Tutor:
@@ -75,21 +289,42 @@ def make_tutor(tutor_type: TutorType = TutorType.LLM) -> Tutor:
                 models_root = os.path.expanduser(models_root)
 
             main_device = torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu")
+            if _use_compile():
+                load_compile_cache(_compile_cache_dir(models_root))
 
             accelerator = Accelerator()
             accelerator.wait_for_everyone()
 
             prompt_generator = BasicPromptGenerator()
+            # loads the optional local models on demand within a memory budget, if configured
+            registry = make_model_registry()
 
             face_emotion_model = make_face_emotion_model(models_root, main_device)
-            sentiment_model = make_sentiment_model(models_root, main_device)
+            sentiment_model = _managed_emotion_model(
+                registry, "sentiment", lambda: make_sentiment_model(models_root, main_device)
+            )
             desc_model = make_description_model(models_root, main_device)
-            qa_model = make_qa_model(models_root, main_device)
+            qa_model = make_qa_model(models_root, main_device, registry)
+            fused_desc_qa = os.getenv("TUTOR_FUSED_DESC_QA", "").lower() in ("1", "true", "yes")
+            tutor_model = make_tutor_model(models_root, main_device, registry) if tutor_type == TutorType.LLM else None
+            summary_model = tutor_model if tutor_model is not None else desc_model
+            conversation_window = make_conversation_window(models_root, prompt_generator, summary_model)
+            desc_qa_cache = make_desc_qa_cache(sentiment_model)
+            max_stage_workers = int(os.getenv("TUTOR_STAGE_WORKERS", str(DEFAULT_MAX_STAGE_WORKERS)))
             if tutor_type == TutorType.LLM:
-                tutor_model = make_tutor_model(models_root, main_device)
-                tutor = LLMTutor(prompt_generator, tutor_model, face_emotion_model, sentiment_model, desc_model, qa_model)
+                tutor = LLMTutor(prompt_generator, tutor_model, face_emotion_model, sentiment_model, desc_model, qa_model,
+                                 fused_desc_qa=fused_desc_qa, conversation_window=conversation_window,
+                                 desc_qa_cache=desc_qa_cache, max_stage_workers=max_stage_workers)
             else:
-                tutor = ReturnPromptTutor(prompt_generator, face_emotion_model, sentiment_model, desc_model, qa_model)
+                tutor = ReturnPromptTutor(prompt_generator, face_emotion_model, sentiment_model, desc_model, qa_model,
+                                          fused_desc_qa=fused_desc_qa, conversation_window=conversation_window,
+                                          desc_qa_cache=desc_qa_cache, max_stage_workers=max_stage_workers)
+
+            # warm up the local models, so that the first requests are not slowed down by cold kernels and allocators
+            if os.getenv("TUTOR_WARMUP", "true").lower() in ("1", "true", "yes"):
+                tutor.warmup(int(os.getenv("TUTOR_WARMUP_REPEATS", "3")))
+                if _use_compile():
+                    save_compile_cache(_compile_cache_dir(models_root))
         case TutorType.Echo:
             tutor = EchoTutor()
         case _:
@@ -1,11 +1,22 @@
 import json
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Sequence
 
 from tutor.model.language import Message
 from tutor.model.emotion import Emotion, FaceEmotionRating
 
 
+def parse_timestamp(value: str) -> datetime:
+    """
+    Parses an ISO timestamp as a UTC-aware datetime, so that timestamps with and without an offset can be compared.
+    Timestamps without an offset are taken to be in UTC.
+    """
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
 def parse_conversation(data: str | list[dict] | dict) -> Sequence[Message] | None:
     if isinstance(data, str):
         try:
@@ -42,7 +53,7 @@ def parse_message_face_emotions(data: str | list[dict] | dict) -> Sequence[FaceE
     for face_emotion in data:
         emotion = Emotion(face_emotion.get("emotion"))
         confidence = face_emotion.get("confidence")
-        timestamp = datetime.fromisoformat(face_emotion.get("timestamp"))
+        timestamp = parse_timestamp(face_emotion.get("timestamp"))
 
         if all((emotion, confidence, timestamp)):
             cur_face_emotion = FaceEmotionRating(emotion=emotion, confidence=confidence, timestamp=timestamp)
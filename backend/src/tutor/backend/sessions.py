@@ -0,0 +1,45 @@
+import threading
+from typing import Final
+
+from tutor.util.cancellation import CancellationToken
+from tutor.util.metrics import METRICS
+
+SUPERSEDED_REQUESTS_METRIC: Final[str] = "tutor.superseded_requests"
+
+
+class SessionRequestTracker:
+    """
+    Tracks the in-flight tutor request of each session. Starting a new request for a session cancels the token
+    of the session's previous request, so its remaining stages are not executed for a stale conversation.
+    """
+
+    def __init__(self) -> None:
+        self._tokens: dict[str, CancellationToken] = {}
+        self._lock = threading.Lock()
+
+    def begin(self, session_id: str | None) -> CancellationToken:
+        """
+        :param session_id: The session of the new request. Requests without session are never superseded.
+        :return: The cancellation token of the new request.
+        """
+        token = CancellationToken()
+        if session_id is None:
+            return token
+
+        with self._lock:
+            previous = self._tokens.get(session_id)
+            self._tokens[session_id] = token
+
+        if previous is not None and previous.cancel():
+            METRICS.counter(SUPERSEDED_REQUESTS_METRIC).increment()
+        return token
+
+    def end(self, session_id: str | None, token: CancellationToken) -> None:
+        """
+        Stops tracking the given request, unless it was already superseded by a newer request of the session.
+        """
+        if session_id is None:
+            return
+        with self._lock:
+            if self._tokens.get(session_id) is token:
+                del self._tokens[session_id]
@@ -0,0 +1,122 @@
+"""
+Side-by-side comparison of the two-call (description, then question-answer pairs) and the fused single-call
+generation of description and question-answer pairs, measuring latency and comparing the outputs of both modes.
+"""
+import argparse
+import difflib
+import os
+import time
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from tutor.data import load_annotations, record_to_conversation, DEFAULT_ANNOTATION_PATH
+from tutor.model import PromptGenerator, BasicPromptGenerator
+from tutor.model.language import LanguageModel, LanguageModelEndpoint, GeminiLanguageModel, Message
+
+
+def _count_qa_pairs(qa_pairs: str | None) -> int:
+    if not qa_pairs:
+        return 0
+    return sum(1 for line in qa_pairs.splitlines() if line.strip().endswith("?") or line.strip().startswith("Q:"))
+
+
+def _similarity(a: str | None, b: str | None) -> float | None:
+    if not a or not b:
+        return None
+    return difflib.SequenceMatcher(None, a.split(), b.split()).ratio()
+
+
+def compare_sample(
+        conversation: Sequence[Message],
+        prompt_generator: PromptGenerator,
+        desc_model: LanguageModel,
+        qa_model: LanguageModel,
+) -> dict:
+    start = time.perf_counter()
+    desc = desc_model.prompt(prompt_generator.generate_description_prompt(conversation))
+    qa_pairs = None
+    if desc is not None:
+        qa_pairs = qa_model.prompt(prompt_generator.generate_qa_prompt(conversation, desc))
+    two_call_latency = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fused_output = desc_model.prompt(prompt_generator.generate_description_qa_prompt(conversation))
+    fused_latency = time.perf_counter() - start
+    fused = prompt_generator.parse_description_qa_output(fused_output)
+    fused_desc, fused_qa_pairs = (None, None) if fused is None else fused
+
+    return {
+        "two_call_latency": two_call_latency,
+        "fused_latency": fused_latency,
+        "fused_parsed": fused is not None,
+        "two_call_desc_words": len(desc.split()) if desc else 0,
+        "fused_desc_words": len(fused_desc.split()) if fused_desc else 0,
+        "two_call_qa_pairs": _count_qa_pairs(qa_pairs),
+        "fused_qa_pairs": _count_qa_pairs(fused_qa_pairs),
+        "desc_similarity": _similarity(desc, fused_desc),
+        "qa_similarity": _similarity(qa_pairs, fused_qa_pairs),
+    }
+
+
+def summarize(results: pd.DataFrame) -> pd.DataFrame:
+    rows = {}
+    for mode in ("two_call", "fused"):
+        latencies = results[f"{mode}_latency"].to_numpy()
+        rows[mode] = {
+            "latency_mean": float(np.mean(latencies)),
+            "latency_p50": float(np.percentile(latencies, 50)),
+            "latency_p95": float(np.percentile(latencies, 95)),
+            "desc_words_mean": float(results[f"{mode}_desc_words"].mean()),
+            "qa_pairs_mean": float(results[f"{mode}_qa_pairs"].mean()),
+        }
+    summary = pd.DataFrame(rows).T
+    summary["parse_rate"] = [1.0, float(results["fused_parsed"].mean())]
+    summary["desc_similarity_mean"] = [1.0, float(results["desc_similarity"].mean())]
+    summary["qa_similarity_mean"] = [1.0, float(results["qa_similarity"].mean())]
+    return summary
+
+
+def _make_model(endpoint: str | None, model_name: str, api_key_env: str | None) -> LanguageModel:
+    api_key = os.getenv(api_key_env) if api_key_env else None
+    if endpoint is None:
+        return GeminiLanguageModel(api_key=api_key or os.getenv("GOOGLE_AI_API_KEY"), model_name=model_name)
+    return LanguageModelEndpoint(api_endpoint=endpoint, model_name=model_name, bearer=api_key)
+
+
+if __name__ == '__main__':
+    def main() -> None:
+        from dotenv import load_dotenv
+
+        parser = argparse.ArgumentParser(description=__doc__)
+        parser.add_argument("--data", default=str(DEFAULT_ANNOTATION_PATH), help="Path to the annotation dataset")
+        parser.add_argument("--limit", type=int, default=20, help="Number of conversations to compare")
+        parser.add_argument("--endpoint", default=None,
+                            help="OpenAI-compatible endpoint of the description model; Gemini if omitted")
+        parser.add_argument("--model", default="learnlm-2.0-flash-experimental", help="Description model name")
+        parser.add_argument("--api-key-env", default=None, help="Environment variable holding the API key")
+        parser.add_argument("--qa-endpoint", default=None, help="Endpoint of the QA model; description model if omitted")
+        parser.add_argument("--qa-model", default=None, help="QA model name")
+        parser.add_argument("--output", default=None, help="CSV file receiving the per-conversation results")
+        args = parser.parse_args()
+
+        load_dotenv()
+        desc_model = _make_model(args.endpoint, args.model, args.api_key_env)
+        qa_model = desc_model
+        if args.qa_endpoint is not None:
+            qa_model = _make_model(args.qa_endpoint, args.qa_model or args.model, args.api_key_env)
+
+        prompt_generator = BasicPromptGenerator()
+        records = load_annotations(args.data)[:args.limit]
+        results = []
+        for record in records:
+            conversation = record_to_conversation(record)
+            results.append({"id": record["id"], **compare_sample(conversation, prompt_generator, desc_model, qa_model)})
+
+        results = pd.DataFrame(results)
+        if args.output is not None:
+            results.to_csv(args.output, index=False)
+        print(summarize(results).to_string(float_format=lambda v: f"{v:.3f}"))
+
+    main()
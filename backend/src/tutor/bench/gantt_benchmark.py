@@ -0,0 +1,106 @@
+"""
+Benchmark of the Gantt chart rendering with many synthetic tasks, comparing the per-row ``broken_barh`` rendering
+with the collection-based rendering of ``tutor.plot.gantt``, with and without level of detail.
+"""
+import argparse
+from datetime import datetime, timedelta
+import time
+from typing import Callable
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+import numpy as np
+
+from tutor.github.model import Task, Milestone
+from tutor.plot.gantt import gantt
+
+LABEL_COLORS = ["#d73a4a", "#0075ca", "#a2eeef", "#7057ff", "#008672", "#e4e669", "#cfd3d7", "#fbca04"]
+
+
+def make_tasks(count: int, seed: int | None = None) -> list[Task]:
+    rng = np.random.default_rng(seed)
+    start = datetime(2025, 1, 1)
+    offsets = rng.integers(0, 365, size=count)
+    durations = rng.integers(0, 30, size=count)
+    labels = rng.integers(0, len(LABEL_COLORS), size=count)
+    return [
+        Task(
+            title=f"Task {i}",
+            description="",
+            label_name=f"label{labels[i]}",
+            label_color=LABEL_COLORS[labels[i]],
+            url="",
+            start_date=start + timedelta(days=int(offsets[i])),
+            end_date=start + timedelta(days=int(offsets[i] + durations[i])),
+        )
+        for i in range(count)
+    ]
+
+
+def make_milestones(count: int) -> list[Milestone]:
+    return [Milestone(f"M{i}", "", datetime(2025, 1, 1) + timedelta(days=30 * i), "") for i in range(count)]
+
+
+def gantt_per_row(tasks: list[Task], milestones: list[Milestone], ax: plt.Axes) -> None:
+    """
+    Reference rendering with two ``broken_barh`` calls per task and one ``axvline`` per milestone.
+    """
+    min_numeric = mdates.date2num(min(t.start_date for t in tasks))
+    max_numeric = mdates.date2num(max(t.end_date for t in tasks)) + 1.0
+    for i, task in enumerate(tasks):
+        if i % 2 == 1:
+            ax.broken_barh([(min_numeric, max_numeric - min_numeric)], (i - 0.5, 1.0), color="#EEEEEE")
+        start = mdates.date2num(task.start_date)
+        ax.broken_barh([(start, mdates.date2num(task.end_date) + 1.0 - start)], (i - 0.4, 0.8), color=task.label_color)
+    for milestone in milestones:
+        ax.axvline(mdates.date2num(milestone.date), color="#333333", linestyle="--", linewidth=1.0)
+    ax.set_yticks(range(len(tasks)))
+    ax.set_yticklabels([task.title for task in tasks])
+
+
+def time_rendering(render: Callable[[plt.Axes], None], repeats: int) -> tuple[float, float]:
+    """
+    :return: The median time to build the plot and the median time to draw it, in seconds.
+    """
+    build_times, draw_times = [], []
+    for _ in range(repeats):
+        fig, ax = plt.subplots(figsize=(10, 6.18))
+        start = time.perf_counter()
+        render(ax)
+        built = time.perf_counter()
+        fig.canvas.draw()
+        build_times.append(built - start)
+        draw_times.append(time.perf_counter() - built)
+        plt.close(fig)
+    return float(np.median(build_times)), float(np.median(draw_times))
+
+
+if __name__ == '__main__':
+    def main() -> None:
+        parser = argparse.ArgumentParser(description=__doc__)
+        parser.add_argument("--tasks", type=int, default=10_000, help="Number of synthetic tasks")
+        parser.add_argument("--milestones", type=int, default=12, help="Number of synthetic milestones")
+        parser.add_argument("--repeats", type=int, default=3, help="Repetitions per variant")
+        parser.add_argument("--skip-per-row", action="store_true", help="Skip the slow per-row reference rendering")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed")
+        args = parser.parse_args()
+
+        tasks = make_tasks(args.tasks, args.seed)
+        milestones = make_milestones(args.milestones)
+
+        variants = {
+            "collections": lambda ax: gantt(tasks, milestones, ax=ax, odd_row_color="#EEEEEE"),
+            "collections+lod": lambda ax: gantt(tasks, milestones, ax=ax, odd_row_color="#EEEEEE",
+                                                level_of_detail=True),
+        }
+        if not args.skip_per_row:
+            variants = {"per-row": lambda ax: gantt_per_row(tasks, milestones, ax), **variants}
+
+        print(f"{'variant':<18}{'build [s]':>12}{'draw [s]':>12}{'total [s]':>12}")
+        for name, render in variants.items():
+            build, draw = time_rendering(render, args.repeats)
+            print(f"{name:<18}{build:>12.3f}{draw:>12.3f}{build + draw:>12.3f}")
+
+    main()
@@ -0,0 +1,263 @@
+"""
+Open-loop load test of a running backend. Conversations of the annotation dataset are replayed against ``/tutor``
+and synthetic webcam frames are sent to ``/faceEmotion`` with Poisson arrivals at increasing rates. For each rate,
+the throughput, latency percentiles and error rates are reported, and the highest rate the backend sustains is
+determined as its saturation point.
+Latencies are measured from the scheduled arrival time, so requests delayed by a saturated client or server count
+their queueing time as well.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import io
+import time
+from typing import Final, Sequence
+
+import numpy as np
+import pandas as pd
+import requests
+from PIL import Image
+
+from tutor.data import load_annotations, record_to_conversation, DEFAULT_ANNOTATION_PATH, AnnotationRecord
+
+TUTOR_ENDPOINT: Final[str] = "tutor"
+FACE_EMOTION_ENDPOINT: Final[str] = "faceEmotion"
+EXCEPTION_STATUS: Final[int] = -1  # status of requests that failed without response, e.g. on a timeout
+
+
+@dataclass
+class RequestResult:
+    endpoint: str
+    scheduled: float  # in seconds since the start of the step
+    latency: float  # in seconds
+    status: int
+
+
+def make_frames(count: int, size: int = 224, seed: int | None = None) -> list[bytes]:
+    """
+    Generates synthetic webcam frames as JPEG images: a smooth random gradient with sensor noise, so the frames are
+    about as large and as expensive to decode as real ones.
+    """
+    rng = np.random.default_rng(seed)
+    grid = np.linspace(0.0, 1.0, size, dtype=np.float32)
+    frames = []
+    for _ in range(count):
+        base = rng.uniform(0, 255, size=(2, 3)).astype(np.float32)
+        gradient = base[0] * grid[:, None, None] + base[1] * grid[None, :, None]
+        noise = rng.normal(0.0, 12.0, size=(size, size, 3))
+        pixels = np.clip(gradient / 2.0 + noise, 0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels, mode="RGB").save(buffer, format="JPEG", quality=85)
+        frames.append(buffer.getvalue())
+    return frames
+
+
+def make_tutor_payload(record: AnnotationRecord, session_id: str, deadline_ms: float | None = None) -> dict:
+    conversation = record_to_conversation(record)
+    payload = {
+        "sessionId": session_id,
+        "conversation": [{"content": m.content, "role": m.role} for m in conversation],
+        "useEmotions": True,
+        "messageEmotions": [{
+            "emotion": "neutral",
+            "confidence": 0.9,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }],
+    }
+    if deadline_ms is not None:
+        payload["deadlineMs"] = deadline_ms
+    return payload
+
+
+def _poisson_arrivals(rate: float, duration: float, rng: np.random.Generator) -> np.ndarray:
+    if rate <= 0.0:
+        return np.empty(0)
+    # draw more gaps than expected and cut the arrivals at the end of the step
+    gaps = rng.exponential(1.0 / rate, size=int(rate * duration * 2) + 16)
+    arrivals = np.cumsum(gaps)
+    return arrivals[arrivals < duration]
+
+
+class LoadTest:
+
+    def __init__(
+            self,
+            url: str,
+            records: Sequence[AnnotationRecord],
+            frames: Sequence[bytes],
+            face_ratio: float = 1.0,
+            timeout: float = 60.0,
+            deadline_ms: float | None = None,
+            max_workers: int = 256,
+            seed: int | None = None,
+    ) -> None:
+        """
+        :param url: The base URL of the backend.
+        :param records: The annotated records whose conversations are replayed.
+        :param frames: The JPEG frames sent to the face emotion endpoint.
+        :param face_ratio: The number of face emotion requests per tutor request.
+        :param timeout: The client timeout of a request in seconds.
+        :param deadline_ms: The ``deadlineMs`` of the tutor requests, if any.
+        :param max_workers: The maximum number of concurrent client requests.
+        :param seed: The seed of the arrivals and of the sampled conversations and frames.
+        """
+        self.url = url.rstrip("/")
+        self.records = records
+        self.frames = frames
+        self.face_ratio = face_ratio
+        self.timeout = timeout
+        self.deadline_ms = deadline_ms
+        self.max_workers = max_workers
+        self.rng = np.random.default_rng(seed)
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def _send(self, endpoint: str, index: int, step_start: float, scheduled: float) -> RequestResult:
+        # wait for the scheduled arrival time
+        delay = step_start + scheduled - time.perf_counter()
+        if delay > 0.0:
+            time.sleep(delay)
+
+        try:
+            if endpoint == TUTOR_ENDPOINT:
+                record = self.records[index % len(self.records)]
+                payload = make_tutor_payload(record, f"load-{index}", self.deadline_ms)
+                response = self._session.post(f"{self.url}/tutor", json=payload, timeout=self.timeout)
+            else:
+                frame = self.frames[index % len(self.frames)]
+                files = {"image": ("frame.jpg", frame, "image/jpeg")}
+                response = self._session.post(f"{self.url}/faceEmotion", files=files, timeout=self.timeout)
+            status = response.status_code
+        except requests.RequestException:
+            status = EXCEPTION_STATUS
+
+        return RequestResult(endpoint, scheduled, time.perf_counter() - step_start - scheduled, status)
+
+    def run_step(self, rate: float, duration: float) -> list[RequestResult]:
+        """
+        Sends tutor requests with Poisson arrivals at the given rate per second, plus face emotion requests at
+        ``face_ratio`` times that rate, and waits for all of them to finish.
+        """
+        arrivals = [(t, TUTOR_ENDPOINT) for t in _poisson_arrivals(rate, duration, self.rng)]
+        arrivals += [(t, FACE_EMOTION_ENDPOINT) for t in _poisson_arrivals(rate * self.face_ratio, duration, self.rng)]
+        arrivals.sort()
+        indices = self.rng.integers(0, 2 ** 31, size=len(arrivals))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            step_start = time.perf_counter()
+            futures = [
+                executor.submit(self._send, endpoint, int(index), step_start, float(scheduled))
+                for (scheduled, endpoint), index in zip(arrivals, indices)
+            ]
+            return [future.result() for future in futures]
+
+
+def summarize_step(results: Sequence[RequestResult], rate: float, duration: float) -> pd.DataFrame:
+    rows = []
+    for endpoint in (TUTOR_ENDPOINT, FACE_EMOTION_ENDPOINT):
+        endpoint_results = [r for r in results if r.endpoint == endpoint]
+        if not endpoint_results:
+            continue
+        ok = np.array([r.status == 200 for r in endpoint_results])
+        latencies = np.array([r.latency for r in endpoint_results])
+        makespan = max(duration, max(r.scheduled + r.latency for r in endpoint_results))
+        ok_latencies = latencies[ok] if ok.any() else np.array([np.nan])
+        rows.append({
+            "rate": rate,
+            "endpoint": endpoint,
+            "requests": len(endpoint_results),
+            "offered_rps": len(endpoint_results) / duration,
+            "throughput_rps": int(ok.sum()) / makespan,
+            "p50": float(np.percentile(ok_latencies, 50)),
+            "p95": float(np.percentile(ok_latencies, 95)),
+            "p99": float(np.percentile(ok_latencies, 99)),
+            "error_rate": float(1.0 - ok.mean()),
+            "rejected_503": sum(r.status == 503 for r in endpoint_results),
+            "superseded_409": sum(r.status == 409 for r in endpoint_results),
+            "server_errors": sum(r.status >= 500 and r.status != 503 for r in endpoint_results),
+            "client_errors": sum(r.status == EXCEPTION_STATUS for r in endpoint_results),
+        })
+    return pd.DataFrame(rows)
+
+
+def find_saturation(
+        summary: pd.DataFrame,
+        slo_p95: float,
+        max_error_rate: float = 0.01,
+        min_throughput_fraction: float = 0.9,
+) -> pd.DataFrame:
+    """
+    :return: For each endpoint, the highest sustained rate and the first rate at which the backend saturated, i.e.
+    its p95 latency exceeded the SLO, its error rate exceeded the maximum, or its throughput fell below the given
+    fraction of the offered load.
+    """
+    rows = []
+    for endpoint, steps in summary.groupby("endpoint", sort=False):
+        steps = steps.sort_values("rate")
+        saturated = (
+            (steps["p95"] > slo_p95)
+            | (steps["error_rate"] > max_error_rate)
+            | (steps["throughput_rps"] < min_throughput_fraction * steps["offered_rps"])
+        )
+        first_saturated = steps[saturated]["rate"].min() if saturated.any() else None
+        sustained = steps[~saturated]["rate"]
+        if first_saturated is not None:
+            sustained = sustained[sustained < first_saturated]
+        rows.append({
+            "endpoint": endpoint,
+            "max_sustained_rate": sustained.max() if not sustained.empty else None,
+            "saturation_rate": first_saturated,
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    def main() -> None:
+        parser = argparse.ArgumentParser(description=__doc__)
+        parser.add_argument("--url", default="http://localhost:5050", help="Base URL of the backend")
+        parser.add_argument("--data", default=str(DEFAULT_ANNOTATION_PATH), help="Path to the annotation dataset")
+        parser.add_argument("--rates", default="0.5,1,2,4,8",
+                            help="Comma-separated tutor request rates per second, one step each")
+        parser.add_argument("--duration", type=float, default=30.0, help="Duration of each step in seconds")
+        parser.add_argument("--face-ratio", type=float, default=1.0,
+                            help="Face emotion requests per tutor request")
+        parser.add_argument("--frames", type=int, default=32, help="Number of distinct synthetic frames")
+        parser.add_argument("--frame-size", type=int, default=224, help="Width and height of the frames in pixels")
+        parser.add_argument("--timeout", type=float, default=60.0, help="Client timeout in seconds")
+        parser.add_argument("--deadline-ms", type=float, default=None, help="deadlineMs of the tutor requests")
+        parser.add_argument("--slo-p95", type=float, default=5.0, help="p95 latency objective in seconds")
+        parser.add_argument("--max-error-rate", type=float, default=0.01, help="Maximum sustainable error rate")
+        parser.add_argument("--workers", type=int, default=256, help="Maximum concurrent client requests")
+        parser.add_argument("--stop-on-saturation", action="store_true",
+                            help="Skip the remaining rates once the tutor endpoint saturated")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed")
+        parser.add_argument("--output", default=None, help="CSV file receiving the per-step summary")
+        args = parser.parse_args()
+
+        records = load_annotations(args.data)
+        frames = make_frames(args.frames, args.frame_size, args.seed)
+        load_test = LoadTest(args.url, records, frames, face_ratio=args.face_ratio, timeout=args.timeout,
+                             deadline_ms=args.deadline_ms, max_workers=args.workers, seed=args.seed)
+
+        summaries = []
+        for rate in (float(r) for r in args.rates.split(",")):
+            results = load_test.run_step(rate, args.duration)
+            step_summary = summarize_step(results, rate, args.duration)
+            summaries.append(step_summary)
+            print(step_summary.to_string(index=False, float_format=lambda v: f"{v:.3f}"), flush=True)
+
+            tutor_steps = step_summary[step_summary["endpoint"] == TUTOR_ENDPOINT]
+            saturation = find_saturation(tutor_steps, args.slo_p95, args.max_error_rate)
+            if args.stop_on_saturation and not saturation["saturation_rate"].isna().all():
+                break
+
+        summary = pd.concat(summaries, ignore_index=True)
+        if args.output is not None:
+            summary.to_csv(args.output, index=False)
+        print()
+        print(find_saturation(summary, args.slo_p95, args.max_error_rate).to_string(index=False))
+
+    main()
@@ -0,0 +1,150 @@
+"""
+Local stand-in for an OpenAI-compatible chat completion API, e.g. for load tests of the backend without network
+access. Responses are delayed according to a configurable latency distribution, and a configurable fraction of the
+requests fails or is rate limited.
+Point ``LanguageModelEndpoint`` (e.g. via ``TUTOR_ENDPOINT``) to ``http://<host>:<port>/v1/chat/completions``.
+"""
+import argparse
+import threading
+import time
+import uuid
+from typing import Any, Callable, Final
+
+import numpy as np
+from flask import Flask, request, jsonify
+
+CHARS_PER_TOKEN: Final[float] = 4.0
+MOCK_RESPONSE: Final[str] = (
+    "Let's look at this step together. What do you get if you first add the two numbers in the question?"
+)
+
+LatencyDistribution = Callable[[np.random.Generator], float]
+
+
+def parse_latency_distribution(spec: str) -> LatencyDistribution:
+    """
+    Parses a latency distribution in seconds of the form ``<kind>:<params>``:
+      - ``const:<seconds>``
+      - ``uniform:<low>,<high>``
+      - ``normal:<mean>,<std>`` (clipped at zero)
+      - ``lognormal:<median>,<sigma>``
+      - ``exp:<mean>``
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()]
+    match kind, len(values):
+        case "const", 1:
+            return lambda rng: values[0]
+        case "uniform", 2:
+            return lambda rng: float(rng.uniform(values[0], values[1]))
+        case "normal", 2:
+            return lambda rng: max(0.0, float(rng.normal(values[0], values[1])))
+        case "lognormal", 2:
+            return lambda rng: float(values[0] * np.exp(rng.normal(0.0, values[1])))
+        case "exp", 1:
+            return lambda rng: float(rng.exponential(values[0]))
+    raise ValueError(f"Invalid latency distribution '{spec}'")
+
+
+def make_mock_app(
+        latency: LatencyDistribution,
+        completion_tokens: int = 64,
+        tokens_per_second: float | None = None,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        max_concurrency: int | None = None,
+        seed: int | None = None,
+) -> Flask:
+    """
+    :param latency: The distribution of the time to the first token.
+    :param completion_tokens: The number of completion tokens reported per response.
+    :param tokens_per_second: The simulated generation speed, which adds ``completion_tokens / tokens_per_second``
+    to the latency; no generation time if ``None``.
+    :param error_rate: The fraction of requests answered with status 500.
+    :param rate_limit_rate: The fraction of requests answered with status 429.
+    :param retry_after: The ``Retry-After`` value in seconds of rate limited requests.
+    :param max_concurrency: The maximum number of requests processed at once, simulating the capacity of a provider.
+    Further requests wait for a free slot.
+    :param seed: The seed of the random number generator.
+    """
+    app = Flask(__name__)
+
+    rng = np.random.default_rng(seed)
+    rng_lock = threading.Lock()
+    slots = threading.Semaphore(max_concurrency) if max_concurrency is not None else None
+
+    def draw() -> tuple[float, float]:
+        with rng_lock:
+            return latency(rng), float(rng.random())
+
+    @app.route("/v1/chat/completions", methods=["POST"])
+    def chat_completions() -> Any:
+        data = request.get_json()
+        delay, outcome = draw()
+        if outcome < rate_limit_rate:
+            return jsonify({"error": {"message": "Rate limit exceeded"}}), 429, {"Retry-After": str(retry_after)}
+        if outcome < rate_limit_rate + error_rate:
+            return jsonify({"error": {"message": "Internal error"}}), 500
+
+        if tokens_per_second is not None:
+            delay += completion_tokens / tokens_per_second
+        if slots is not None:
+            slots.acquire()
+        try:
+            time.sleep(delay)
+        finally:
+            if slots is not None:
+                slots.release()
+
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in data.get("messages", []))
+        prompt_tokens = int(prompt_chars / CHARS_PER_TOKEN)
+        return jsonify({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": data.get("model") or "mock",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": MOCK_RESPONSE},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }), 200
+
+    return app
+
+
+if __name__ == '__main__':
+    def main() -> None:
+        parser = argparse.ArgumentParser(description=__doc__)
+        parser.add_argument("--host", default="127.0.0.1", help="Host to listen on")
+        parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+        parser.add_argument("--latency", default="lognormal:0.8,0.4",
+                            help="Time to the first token, e.g. const:0.5, uniform:0.2,1.0 or lognormal:0.8,0.4")
+        parser.add_argument("--completion-tokens", type=int, default=64, help="Completion tokens per response")
+        parser.add_argument("--tokens-per-second", type=float, default=None, help="Simulated generation speed")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 500")
+        parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests failing with 429")
+        parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After of rate limited requests")
+        parser.add_argument("--max-concurrency", type=int, default=None, help="Requests processed at once")
+        parser.add_argument("--seed", type=int, default=None, help="Random seed")
+        args = parser.parse_args()
+
+        app = make_mock_app(
+            parse_latency_distribution(args.latency),
+            completion_tokens=args.completion_tokens,
+            tokens_per_second=args.tokens_per_second,
+            error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate,
+            retry_after=args.retry_after,
+            max_concurrency=args.max_concurrency,
+            seed=args.seed,
+        )
+        app.run(host=args.host, port=args.port, threaded=True)
+
+    main()
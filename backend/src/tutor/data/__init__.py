@@ -0,0 +1,2 @@
+from .annotation import AnnotationRecord, load_annotations, record_to_conversation, split_records, \
+    DEFAULT_ANNOTATION_PATH
@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+from typing import Final, IO, Sequence, TypedDict, Union
+
+import numpy as np
+
+from tutor.model.language import Message
+from tutor.util import jsons
+
+DEFAULT_ANNOTATION_PATH: Final[Path] = \
+    Path(__file__).parents[4] / "annotation" / "emotion_annotations_mathdial_bridge.json"
+
+USER_TO_ROLE: Final[dict[str, str]] = {
+    "Teacher": "tutor",
+    "Student": "student",
+}
+
+
+class AnnotationRecord(TypedDict):
+    id: int
+    emotion: str
+    polarity: int
+    utterance: str
+    history: str
+
+
+def load_annotations(source: Union[str, Path, IO] = DEFAULT_ANNOTATION_PATH) -> list[AnnotationRecord]:
+    """
+    Load the emotion-annotated MathDial-Bridge dataset.
+    :param source: The file path to the dataset or an open file-like object.
+    :return: The annotated records.
+    """
+    return jsons.load(source)
+
+
+def record_to_conversation(record: AnnotationRecord, full_history: bool = False) -> list[Message]:
+    """
+    Converts the history of an annotated record into a conversation as sent to the ``/tutor`` endpoint.
+    :param record: The annotated record.
+    :param full_history: Whether to return the entire history. By default, the conversation ends with the annotated
+    student utterance, i.e. where the tutor would have to respond next.
+    :return: The messages of the conversation.
+    """
+    history = record["history"]
+    if isinstance(history, str):
+        history = json.loads(history)
+
+    messages = [Message(content=m["text"], role=USER_TO_ROLE.get(m["user"], m["user"].lower())) for m in history]
+    if full_history:
+        return messages
+
+    utterance = record["utterance"]
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i].role == USER_TO_ROLE["Student"] and messages[i].content == utterance:
+            return messages[:i + 1]
+    return messages
+
+
+def split_records(records: Sequence[AnnotationRecord], test_fraction: float = 0.2, seed: int = 0) \
+        -> tuple[list[int], list[int]]:
+    """
+    Splits the records by id, so no conversation contributes to both the training and the test records.
+    :return: The indices of the training and the test records.
+    """
+    ids = np.unique([r["id"] for r in records])
+    rng = np.random.default_rng(seed)
+    test_ids = set(rng.permutation(ids)[:int(round(len(ids) * test_fraction))].tolist())
+    train = [i for i, r in enumerate(records) if r["id"] not in test_ids]
+    test = [i for i, r in enumerate(records) if r["id"] in test_ids]
+    return train, test
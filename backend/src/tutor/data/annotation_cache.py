@@ -0,0 +1,184 @@
+"""
+Builds a columnar cache of the annotation dataset with decoded histories and pre-tokenized utterances, so offline
+evaluations neither re-parse the nested history JSON nor re-tokenize the utterances.
+"""
+import argparse
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import tempfile
+from typing import Final, Union
+
+import fastparquet
+import numpy as np
+import pandas as pd
+from transformers import PreTrainedTokenizerBase
+
+from tutor.data.annotation import DEFAULT_ANNOTATION_PATH, AnnotationRecord
+from tutor.util import jsons
+
+DEFAULT_CACHE_DIR: Final[Path] = Path(__file__).parents[3] / ".cache" / "annotations"
+CACHE_FORMAT_VERSION: Final[int] = 1
+
+RECORDS_FILE: Final[str] = "records.parquet"
+INPUT_IDS_FILE: Final[str] = "input_ids.npy"
+ATTENTION_MASK_FILE: Final[str] = "attention_mask.npy"
+MANIFEST_FILE: Final[str] = "manifest.json"
+
+
+@dataclass
+class AnnotationCache:
+    """
+    The cached annotation dataset. Row ``i`` of the token arrays belongs to row ``i`` of the records.
+    """
+    records: pd.DataFrame  # id, emotion, polarity, utterance, history (decoded list of messages), length
+    input_ids: np.ndarray  # (records, longest utterance) int32, padded with the tokenizer's padding id
+    attention_mask: np.ndarray  # (records, longest utterance) int8
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def record(self, index: int) -> AnnotationRecord:
+        return self.records.iloc[index][["id", "emotion", "polarity", "utterance", "history"]].to_dict()
+
+    def batch(self, indices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :return: The input ids and attention mask of the given records, trimmed to the longest of them.
+        """
+        length = int(self.records["length"].to_numpy()[indices].max())
+        return self.input_ids[indices, :length], self.attention_mask[indices, :length]
+
+
+def _file_hash(path: Union[str, Path]) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _tokenizer_fingerprint(tokenizer: PreTrainedTokenizerBase, max_length: int) -> str:
+    digest = hashlib.sha256()
+    digest.update(type(tokenizer).__name__.encode("utf-8"))
+    digest.update(json.dumps(tokenizer.get_vocab(), sort_keys=True).encode("utf-8"))
+    digest.update(str((tokenizer.do_lower_case if hasattr(tokenizer, "do_lower_case") else None, max_length))
+                  .encode("utf-8"))
+    return digest.hexdigest()
+
+
+def cache_key(source: Union[str, Path], tokenizer: PreTrainedTokenizerBase, max_length: int = 512) -> str:
+    """
+    :return: The key of the cache, which changes whenever the dataset's content, the tokenizer or the cache format
+    changes.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{CACHE_FORMAT_VERSION}\x00{_file_hash(source)}\x00".encode("utf-8"))
+    digest.update(_tokenizer_fingerprint(tokenizer, max_length).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def build_annotation_cache(
+        source: Union[str, Path],
+        directory: Union[str, Path],
+        tokenizer: PreTrainedTokenizerBase,
+        max_length: int = 512,
+) -> None:
+    """
+    Writes the columnar cache of the annotation dataset to the given directory.
+    """
+    records = list(jsons.iter_records(source))
+    histories = [json.loads(r["history"]) if isinstance(r["history"], str) else r["history"] for r in records]
+    utterances = [r["utterance"] for r in records]
+
+    encoded = tokenizer(utterances, truncation=True, max_length=max_length)
+    lengths = np.array([len(ids) for ids in encoded["input_ids"]], dtype=np.int32)
+    width = int(lengths.max()) if len(lengths) else 0
+    pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else 0
+    input_ids = np.full((len(records), width), pad_id, dtype=np.int32)
+    attention_mask = np.zeros((len(records), width), dtype=np.int8)
+    for i, ids in enumerate(encoded["input_ids"]):
+        input_ids[i, :len(ids)] = ids
+        attention_mask[i, :len(ids)] = 1
+
+    df = pd.DataFrame({
+        "id": np.array([r["id"] for r in records], dtype=np.int64),
+        "emotion": [r["emotion"] for r in records],
+        "polarity": np.array([r["polarity"] for r in records], dtype=np.int64),
+        "utterance": utterances,
+        "history": histories,
+        "length": lengths,
+    })
+
+    # write into a temporary directory first, so an interrupted build never leaves a partial cache behind
+    directory = Path(directory)
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    tmp_directory = Path(tempfile.mkdtemp(dir=directory.parent, prefix=f".{directory.name}."))
+    try:
+        fastparquet.write(str(tmp_directory / RECORDS_FILE), df, object_encoding={
+            "emotion": "utf8", "utterance": "utf8", "history": "json",
+        })
+        np.save(tmp_directory / INPUT_IDS_FILE, input_ids)
+        np.save(tmp_directory / ATTENTION_MASK_FILE, attention_mask)
+        with open(tmp_directory / MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_FORMAT_VERSION, "records": len(records), "maxLength": max_length}, f)
+        if directory.exists():
+            shutil.rmtree(directory)
+        os.replace(tmp_directory, directory)
+    except BaseException:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        raise
+
+
+def read_annotation_cache(directory: Union[str, Path]) -> AnnotationCache:
+    """
+    Reads a cache written by ``build_annotation_cache``. The token arrays are memory-mapped.
+    """
+    directory = Path(directory)
+    records = fastparquet.ParquetFile(str(directory / RECORDS_FILE)).to_pandas()
+    input_ids = np.load(directory / INPUT_IDS_FILE, mmap_mode="r")
+    attention_mask = np.load(directory / ATTENTION_MASK_FILE, mmap_mode="r")
+    return AnnotationCache(records, input_ids, attention_mask)
+
+
+def load_annotation_cache(
+        tokenizer: PreTrainedTokenizerBase,
+        source: Union[str, Path] = DEFAULT_ANNOTATION_PATH,
+        cache_dir: Union[str, Path] = DEFAULT_CACHE_DIR,
+        max_length: int = 512,
+) -> AnnotationCache:
+    """
+    Loads the cache of the annotation dataset, building it first if the dataset or the tokenizer changed since the
+    cache was built.
+    :param tokenizer: The tokenizer of the utterances.
+    :param source: The file path to the dataset.
+    :param cache_dir: The directory holding the caches, one subdirectory per cache key.
+    :param max_length: The maximum number of tokens per utterance.
+    """
+    directory = Path(cache_dir) / cache_key(source, tokenizer, max_length)
+    if not (directory / MANIFEST_FILE).exists():
+        build_annotation_cache(source, directory, tokenizer, max_length)
+    return read_annotation_cache(directory)
+
+
+if __name__ == '__main__':
+    def main() -> None:
+        import time
+        from transformers import AutoTokenizer
+
+        parser = argparse.ArgumentParser(description=__doc__)
+        parser.add_argument("--data", default=str(DEFAULT_ANNOTATION_PATH), help="Path to the annotation dataset")
+        parser.add_argument("--tokenizer", required=True, help="Name or directory of the tokenizer")
+        parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="Directory holding the caches")
+        parser.add_argument("--max-length", type=int, default=512, help="Maximum number of tokens per utterance")
+        args = parser.parse_args()
+
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+        start = time.perf_counter()
+        cache = load_annotation_cache(tokenizer, args.data, args.cache_dir, args.max_length)
+        print(f"Loaded {len(cache)} records with {cache.input_ids.shape[1]} tokens at most "
+              f"in {time.perf_counter() - start:.3f}s")
+
+    main()
@@ -0,0 +1,281 @@
+"""
+Offline batch evaluation of the sentiment model and the tutor prompt generation on the annotation dataset.
+In ``sentiment`` mode, the annotated utterances are classified in length-bucketed batches and compared to the
+``emotion``/``polarity`` labels. In ``prompt`` mode, a ``ReturnPromptTutor`` without language models builds the
+tutor prompt of each conversation to measure prompt sizes.
+Predictions are appended to a JSONL file as they are made, so an interrupted run resumes where it stopped.
+A summary with accuracy or prompt size statistics and the throughput is written next to it.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Final, Iterable, Iterator, Sequence, Union
+
+import numpy as np
+import torch
+
+from tutor.data import AnnotationRecord, record_to_conversation, DEFAULT_ANNOTATION_PATH
+from tutor.data.annotation_cache import AnnotationCache, load_annotation_cache, DEFAULT_CACHE_DIR
+from tutor.model import ReturnPromptTutor, BasicPromptGenerator
+from tutor.model.emotion import CascadeEmotionModel, LocalEmotionModel, SentimentRating
+from tutor.model.emotion.emotion_bert import EMOTIONS
+from tutor.util import jsons
+
+SENTIMENT_MODE: Final[str] = "sentiment"
+PROMPT_MODE: Final[str] = "prompt"
+
+
+def length_buckets(lengths: np.ndarray, batch_size: int, max_batch_tokens: int | None = None) -> list[np.ndarray]:
+    """
+    Groups items of similar length into batches, so padded batches waste little compute.
+    :param lengths: The length of each item.
+    :param batch_size: The maximum number of items per batch.
+    :param max_batch_tokens: The maximum number of (padded) tokens per batch, if any.
+    :return: The indices of the items of each batch, from short to long items.
+    """
+    order = np.argsort(lengths, kind="stable")
+    batches = []
+    start = 0
+    while start < len(order):
+        end = min(start + batch_size, len(order))
+        if max_batch_tokens is not None:
+            # the longest item of the batch is the last one, as items are sorted by length
+            while end - start > 1 and (end - start) * lengths[order[end - 1]] > max_batch_tokens:
+                end -= 1
+        batches.append(order[start:end])
+        start = end
+    return batches
+
+
+def rating_to_label(rating: SentimentRating) -> tuple[str, int, float]:
+    """
+    :return: The emotion with the highest confidence, its polarity (1 to 3) and the confidence.
+    """
+    confidences = (rating.neutral_confidence, rating.boredom_confidence, rating.engagement_confidence)
+    classes = (rating.neutral, rating.boredom, rating.engagement)
+    best = int(np.argmax(confidences))
+    return EMOTIONS[best], int(classes[best]) + 1, float(confidences[best])
+
+
+class Checkpoint:
+    """
+    Append-only JSONL file of predictions keyed by the position of the record in the dataset, as record ids are
+    not unique.
+    """
+
+    def __init__(self, path: Union[str, Path], resume: bool = True) -> None:
+        self.path = Path(path)
+        if not resume and self.path.exists():
+            self.path.unlink()
+        self.done = {row["index"] for row in jsons.iter_records_or_default(self.path, [], fields=["index"])}
+        self._lock = threading.Lock()
+
+    def append(self, rows: Iterable[dict]) -> None:
+        lines = "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+
+    def rows(self) -> Iterator[dict]:
+        return jsons.iter_records_or_default(self.path, [])
+
+
+def evaluate_sentiment(
+        model: LocalEmotionModel,
+        cache: AnnotationCache,
+        checkpoint: Checkpoint,
+        batch_size: int = 32,
+        max_batch_tokens: int | None = None,
+        workers: int = 1,
+        limit: int | None = None,
+) -> tuple[int, int, float]:
+    """
+    Classifies all records that are not yet in the checkpoint.
+    :return: The number of classified items and tokens, and the elapsed time in seconds.
+    """
+    pending = np.array([i for i in range(len(cache)) if i not in checkpoint.done], dtype=np.int64)
+    if limit is not None:
+        pending = pending[:limit]
+    lengths = cache.records["length"].to_numpy()
+    batches = [pending[batch] for batch in length_buckets(lengths[pending], batch_size, max_batch_tokens)]
+
+    def run_batch(indices: np.ndarray) -> int:
+        input_ids, attention_mask = cache.batch(indices)
+        ratings = model.analyze_tokens(
+            torch.from_numpy(np.ascontiguousarray(input_ids, dtype=np.int64)),
+            torch.from_numpy(np.ascontiguousarray(attention_mask, dtype=np.int64)),
+        )
+        rows = []
+        for index, rating in zip(indices, ratings):
+            record = cache.records.iloc[int(index)]
+            emotion, polarity, confidence = rating_to_label(rating)
+            rows.append({
+                "index": int(index),
+                "id": int(record["id"]),
+                "emotion": record["emotion"],
+                "polarity": int(record["polarity"]),
+                "predictedEmotion": emotion,
+                "predictedPolarity": polarity,
+                "confidence": confidence,
+            })
+        checkpoint.append(rows)
+        return int(lengths[indices].sum())
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        tokens = sum(executor.map(run_batch, batches))
+    return len(pending), tokens, time.perf_counter() - start
+
+
+def evaluate_prompts(
+        tutor: ReturnPromptTutor,
+        records: Iterable[AnnotationRecord],
+        checkpoint: Checkpoint,
+        tokenizer=None,
+        use_emotion: bool = False,
+        workers: int = 1,
+        limit: int | None = None,
+) -> tuple[int, int, float]:
+    """
+    Builds the tutor prompt of all records that are not yet in the checkpoint.
+    :param tokenizer: The tokenizer measuring the prompt length in tokens; whitespace-separated words if ``None``.
+    :return: The number of prompts and their tokens, and the elapsed time in seconds.
+    """
+    pending = ((i, r) for i, r in enumerate(records) if i not in checkpoint.done)
+    if limit is not None:
+        pending = (item for _, item in zip(range(limit), pending))
+
+    def run_record(item: tuple[int, AnnotationRecord]) -> int:
+        index, record = item
+        conversation = record_to_conversation(record)
+        prompt, used_input = tutor.generate_response(conversation, use_emotion=use_emotion, face_emotions=[])
+        if tokenizer is not None:
+            prompt_tokens = len(tokenizer.encode(prompt, add_special_tokens=False))
+        else:
+            prompt_tokens = len(prompt.split())
+        checkpoint.append([{
+            "index": index,
+            "id": record["id"],
+            "turns": len(conversation),
+            "promptChars": len(prompt),
+            "promptTokens": prompt_tokens,
+            "droppedStages": used_input.get("droppedStages", []),
+        }])
+        return prompt_tokens
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        token_counts = list(executor.map(run_record, pending))
+    return len(token_counts), sum(token_counts), time.perf_counter() - start
+
+
+def _distribution(values: Sequence[float]) -> dict[str, float]:
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "max": float(values.max()),
+    }
+
+
+def summarize(mode: str, rows: Sequence[dict], items: int, tokens: int, seconds: float) -> dict:
+    """
+    :param rows: All predictions of the checkpoint, including those of resumed runs.
+    :param items: The number of items processed by this run.
+    :param tokens: The number of tokens processed by this run.
+    :param seconds: The elapsed time of this run.
+    """
+    summary = {
+        "mode": mode,
+        "items": len(rows),
+        "throughput": {
+            "items": items,
+            "seconds": seconds,
+            "itemsPerSecond": items / seconds if seconds > 0.0 else None,
+            "tokensPerSecond": tokens / seconds if seconds > 0.0 else None,
+        },
+    }
+    if not rows:
+        return summary
+
+    if mode == SENTIMENT_MODE:
+        emotion_correct = np.array([r["predictedEmotion"] == r["emotion"] for r in rows])
+        polarity_correct = np.array([r["predictedPolarity"] == r["polarity"] for r in rows])
+        summary["accuracy"] = {
+            "emotion": float(emotion_correct.mean()),
+            "polarity": float(polarity_correct.mean()),
+            "joint": float((emotion_correct & polarity_correct).mean()),
+            "perEmotion": {
+                emotion: float(emotion_correct[[r["emotion"] == emotion for r in rows]].mean())
+                for emotion in EMOTIONS if any(r["emotion"] == emotion for r in rows)
+            },
+        }
+    else:
+        summary["promptChars"] = _distribution([r["promptChars"] for r in rows])
+        summary["promptTokens"] = _distribution([r["promptTokens"] for r in rows])
+        summary["turns"] = _distribution([r["turns"] for r in rows])
+    return summary
+
+
+if __name__ == '__main__':
+    def main() -> None:
+        from dotenv import load_dotenv
+        from transformers import AutoTokenizer
+
+        parser = argparse.ArgumentParser(description=__doc__)
+        parser.add_argument("--mode", choices=(SENTIMENT_MODE, PROMPT_MODE), default=SENTIMENT_MODE)
+        parser.add_argument("--data", default=str(DEFAULT_ANNOTATION_PATH), help="Path to the annotation dataset")
+        parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="Directory of the annotation cache")
+        parser.add_argument("--output", required=True, help="JSONL file receiving the predictions")
+        parser.add_argument("--batch-size", type=int, default=32, help="Maximum utterances per batch")
+        parser.add_argument("--max-batch-tokens", type=int, default=None, help="Maximum padded tokens per batch")
+        parser.add_argument("--workers", type=int, default=1, help="Number of concurrently processed batches")
+        parser.add_argument("--limit", type=int, default=None, help="Maximum number of items of this run")
+        parser.add_argument("--no-resume", action="store_true", help="Discard the predictions of previous runs")
+        parser.add_argument("--use-emotion", action="store_true",
+                            help="Include the text sentiment stage in prompt mode (loads the sentiment model)")
+        parser.add_argument("--tokenizer", default=None,
+                            help="Tokenizer measuring prompt sizes in prompt mode; words if omitted")
+        args = parser.parse_args()
+
+        load_dotenv()
+        from tutor.backend.logic import make_sentiment_model
+
+        checkpoint = Checkpoint(args.output, resume=not args.no_resume)
+        device = torch.device("cuda") if torch.cuda.is_available() else torch.device("cpu")
+
+        if args.mode == SENTIMENT_MODE or args.use_emotion:
+            models_root = os.path.expanduser(os.getenv("MODELS_ROOT"))
+            sentiment_model = make_sentiment_model(models_root, device)
+            if args.mode == SENTIMENT_MODE and isinstance(sentiment_model, CascadeEmotionModel):
+                # the pre-tokenized batches are rated by the accurate model
+                sentiment_model = sentiment_model.second
+        else:
+            sentiment_model = None
+
+        if args.mode == SENTIMENT_MODE:
+            cache = load_annotation_cache(sentiment_model.tokenizer, args.data, args.cache_dir)
+            items, tokens, seconds = evaluate_sentiment(
+                sentiment_model, cache, checkpoint, args.batch_size, args.max_batch_tokens, args.workers, args.limit
+            )
+        else:
+            tutor = ReturnPromptTutor(BasicPromptGenerator(), None, sentiment_model)
+            tokenizer = AutoTokenizer.from_pretrained(args.tokenizer) if args.tokenizer else None
+            records = jsons.iter_records(args.data)
+            items, tokens, seconds = evaluate_prompts(
+                tutor, records, checkpoint, tokenizer, args.use_emotion, args.workers, args.limit
+            )
+
+        summary = summarize(args.mode, list(checkpoint.rows()), items, tokens, seconds)
+        summary_path = Path(args.output).with_suffix(".summary.json")
+        with open(summary_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(json.dumps(summary, indent=2))
+
+    main()
@@ -1 +1,3 @@
-from .logic import get_project_tasks, get_project_milestones
+from .cache import ResponseCache
+from .logic import GitHubQueryError, get_project_tasks, get_project_milestones, get_repositories_milestones, \
+    iter_project_tasks, iter_project_repositories
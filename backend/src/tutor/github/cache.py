@@ -0,0 +1,59 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+import tempfile
+import time
+from typing import Union
+
+
+class ResponseCache:
+    """
+    On-disk cache of GraphQL response data with a time to live.
+    Entries are keyed by the query and a fingerprint of the token, so data is never served to a token that did not
+    fetch it itself.
+    """
+
+    def __init__(self, directory: Union[str, Path], ttl: float = 300.0) -> None:
+        """
+        :param directory: The directory holding the cached responses; created if it does not exist.
+        :param ttl: The time in seconds a cached response is served without querying the API again.
+        """
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, gh_token: str, query: str) -> Path:
+        token_fingerprint = hashlib.sha256(gh_token.encode("utf-8")).hexdigest()
+        key = hashlib.sha256(f"{token_fingerprint}\x00{query}".encode("utf-8")).hexdigest()
+        return self.directory / f"{key}.json"
+
+    def get(self, gh_token: str, query: str) -> dict | None:
+        """
+        :return: The cached response data of the query, or ``None`` if it is not cached or expired.
+        """
+        path = self._path(gh_token, query)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def put(self, gh_token: str, query: str, data: dict) -> None:
+        path = self._path(gh_token, query)
+        # write to a temporary file first, so concurrent readers never see a partial response
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def clear(self) -> None:
+        for path in self.directory.glob("*.json"):
+            path.unlink(missing_ok=True)
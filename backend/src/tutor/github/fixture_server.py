@@ -0,0 +1,67 @@
+"""
+Local GraphQL fixture server that replays recorded GitHub API responses, so the GitHub functions can be tested
+without network access or a token. With ``--record``, unknown queries are forwarded to the GitHub API and their
+responses are stored as new fixtures.
+Point the GitHub functions to the server via ``GITHUB_GRAPHQL_ENDPOINT=http://<host>:<port>/graphql``.
+"""
+import argparse
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Union
+
+import requests
+from flask import Flask, request, jsonify
+
+from tutor.github.logic import DEFAULT_GRAPHQL_ENDPOINT
+
+
+def fixture_path(directory: Union[str, Path], query: str) -> Path:
+    return Path(directory) / f"{hashlib.sha256(query.encode('utf-8')).hexdigest()}.json"
+
+
+def make_fixture_app(directory: Union[str, Path], record_endpoint: str | None = None) -> Flask:
+    """
+    :param directory: The directory holding one JSON fixture per query.
+    :param record_endpoint: The GraphQL endpoint unknown queries are forwarded to and recorded from; unknown queries
+    are answered with status 404 if ``None``.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    app = Flask(__name__)
+
+    @app.route("/graphql", methods=["POST"])
+    def graphql() -> tuple[Any, int]:
+        query = request.get_json()["query"]
+        path = fixture_path(directory, query)
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                fixture = json.load(f)
+            return jsonify(fixture["response"]), fixture["status"]
+
+        if record_endpoint is None:
+            return jsonify({"errors": [{"message": "No fixture recorded for this query"}]}), 404
+
+        headers = {"Authorization": request.headers.get("Authorization", ""), "Content-Type": "application/json"}
+        response = requests.post(record_endpoint, headers=headers, json={"query": query})
+        if response.status_code == 200:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"query": query, "status": response.status_code, "response": response.json()}, f, indent=2)
+        return jsonify(response.json()), response.status_code
+
+    return app
+
+
+if __name__ == '__main__':
+    def main() -> None:
+        parser = argparse.ArgumentParser(description=__doc__)
+        parser.add_argument("directory", help="Directory holding the recorded fixtures")
+        parser.add_argument("--host", default="127.0.0.1", help="Host to listen on")
+        parser.add_argument("--port", type=int, default=8081, help="Port to listen on")
+        parser.add_argument("--record", action="store_true", help="Record unknown queries from the GitHub API")
+        args = parser.parse_args()
+
+        app = make_fixture_app(args.directory, DEFAULT_GRAPHQL_ENDPOINT if args.record else None)
+        app.run(host=args.host, port=args.port, threaded=True)
+
+    main()
@@ -1,26 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import json
+import os
+from string import Template
+from typing import Final, Iterator, Sequence, TypeVar
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from tutor.github.cache import ResponseCache
 from tutor.github.queries import GET_PROJECT_ISSUES_QUERY, GET_PROJECT_REPOSITORIES_QUERY, \
-    GET_REPOSITORY_MILESTONES_QUERY
+    GET_REPOSITORY_MILESTONES_QUERY, REPOSITORY_MILESTONES_FRAGMENT, GET_REPOSITORIES_MILESTONES_QUERY
 from tutor.github.model import Task, Milestone, Repository
 
+_T = TypeVar("_T")
+
+DEFAULT_GRAPHQL_ENDPOINT: Final[str] = "https://api.github.com/graphql"
+# number of project items per page; GitHub allows at most 100
+PROJECT_PAGE_SIZE: Final[int] = 100
+# number of repositories per aliased milestone query; keeps the query well below GitHub's node limit
+MILESTONE_BATCH_SIZE: Final[int] = 25
+MAX_QUERY_WORKERS: Final[int] = 4
+# prefix of the cache key under which all pages of a paginated query are cached together
+ALL_PAGES_CACHE_PREFIX: Final[str] = "all pages\x00"
+
+# shared session, so consecutive queries reuse the pooled TLS connections to the API
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_QUERY_WORKERS))
+_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_QUERY_WORKERS))
+
+
+class GitHubQueryError(Exception):
+    """
+    Raised if a page of a paginated query could not be fetched, so results are never silently truncated.
+    """
+    pass
+
 
 def _is_o_conv(is_organization: bool) -> str:
     return "organization" if is_organization else "user"
 
 
+def _default_cache() -> ResponseCache | None:
+    cache_dir = os.getenv("GITHUB_CACHE_DIR")
+    if not cache_dir:
+        return None
+    return ResponseCache(cache_dir, ttl=float(os.getenv("GITHUB_CACHE_TTL", "300")))
+
+
 def _send_query(gh_token: str, query: str) -> requests.Response:
     headers = {
         "Authorization": f"Bearer {gh_token}",
         "Content-Type": "application/json"
     }
 
-    response = requests.post("https://api.github.com/graphql", headers=headers, json={"query": query})
+    endpoint = os.getenv("GITHUB_GRAPHQL_ENDPOINT", DEFAULT_GRAPHQL_ENDPOINT)
+    response = _session.post(endpoint, headers=headers, json={"query": query})
     return response
 
 
+def _query_data(gh_token: str, query: str, cache: ResponseCache | None = None) -> dict | None:
+    """
+    :return: The ``data`` of the query's response, served from the cache if possible, or ``None`` if the query
+    failed.
+    """
+    if cache is not None:
+        data = cache.get(gh_token, query)
+        if data is not None:
+            return data
+
+    response = _send_query(gh_token, query)
+    if response.status_code != 200:
+        return None
+    data = response.json().get("data")
+    if data is not None and cache is not None:
+        cache.put(gh_token, query, data)
+    return data
+
+
+def _iter_project_items(
+        gh_token: str,
+        query_template: Template,
+        owner_login: str,
+        project_id: str | int,
+        is_organization: bool,
+        page_size: int,
+        cache: ResponseCache | None,
+) -> Iterator[dict]:
+    """
+    Yields the items of a project page by page. The items of all pages are cached together once the last page was
+    fetched, so a cached result never mixes pages fetched at different times.
+    """
+    project_owner_type = _is_o_conv(is_organization)
+
+    def page_query(cursor: str | None) -> str:
+        return query_template.substitute(
+            project_owner_type=project_owner_type,
+            project_id=project_id,
+            project_owner_login=owner_login,
+            page_size=page_size,
+            cursor="null" if cursor is None else json.dumps(cursor),
+        )
+
+    cache_key = ALL_PAGES_CACHE_PREFIX + page_query(None)
+    if cache is not None:
+        cached = cache.get(gh_token, cache_key)
+        if cached is not None:
+            yield from cached["nodes"]
+            return
+
+    all_nodes = []
+    cursor = None
+    while True:
+        data = _query_data(gh_token, page_query(cursor))
+        try:
+            items = data[project_owner_type]["projectV2"]["items"]
+            nodes = items["nodes"]
+            page_info = items["pageInfo"]
+        except (KeyError, TypeError):
+            raise GitHubQueryError(f"Could not fetch the items of project {project_id} after cursor {cursor}")
+
+        all_nodes.extend(nodes)
+        yield from nodes
+        if not page_info["hasNextPage"]:
+            break
+        cursor = page_info["endCursor"]
+
+    if cache is not None:
+        cache.put(gh_token, cache_key, {"nodes": all_nodes})
+
+
+def _collect(items: Iterator[_T]) -> list[_T] | None:
+    try:
+        return list(items)
+    except GitHubQueryError:
+        return None
+
+
 def issue_node_to_task(node: dict) -> Task | None:
     try:
         content = node["content"]
@@ -52,24 +168,39 @@ def issue_node_to_task(node: dict) -> Task | None:
     return None
 
 
-def get_project_tasks(gh_token: str, owner_login: str, project_id: str | int, is_organization: bool = False) -> list[Task] | None:
-    project_owner_type = _is_o_conv(is_organization)
-    query = GET_PROJECT_ISSUES_QUERY.substitute(
-        project_owner_type=project_owner_type,
-        project_id=project_id,
-        project_owner_login=owner_login,
-    )
-
-    response = _send_query(gh_token, query)
-
-    if response.status_code == 200:
-        data = response.json()
-        try:
-            issues = data["data"]["user"]["projectV2"]["items"]["nodes"]
-            return [issue_node_to_task(i) for i in issues]
-        except KeyError:
-            pass
-    return None
+def iter_project_tasks(
+        gh_token: str,
+        owner_login: str,
+        project_id: str | int,
+        is_organization: bool = False,
+        page_size: int = PROJECT_PAGE_SIZE,
+        cache: ResponseCache | None = None,
+) -> Iterator[Task]:
+    """
+    Yields the tasks of a project page by page, following the pagination cursor until all items were fetched.
+    Items that are no issues with label and dates are skipped.
+    :param cache: The cache of the responses. Defaults to the cache configured via ``GITHUB_CACHE_DIR``, if any.
+    :raise GitHubQueryError: If a page could not be fetched.
+    """
+    if cache is None:
+        cache = _default_cache()
+    for node in _iter_project_items(gh_token, GET_PROJECT_ISSUES_QUERY, owner_login, project_id, is_organization,
+                                    page_size, cache):
+        task = issue_node_to_task(node)
+        if task is not None:
+            yield task
+
+
+def get_project_tasks(gh_token: str, owner_login: str, project_id: str | int, is_organization: bool = False) -> list[Task | None] | None:
+    """
+    :return: The tasks of all items of a project, ``None`` for items that are no issues with label and dates, or
+    ``None`` if the items could not be fetched.
+    """
+    nodes = _collect(_iter_project_items(gh_token, GET_PROJECT_ISSUES_QUERY, owner_login, project_id, is_organization,
+                                         PROJECT_PAGE_SIZE, _default_cache()))
+    if nodes is None:
+        return None
+    return [issue_node_to_task(node) for node in nodes]
 
 
 def repository_node_to_repository(node: dict) -> Repository | None:
@@ -84,30 +215,33 @@ def repository_node_to_repository(node: dict) -> Repository | None:
     return None
 
 
-def get_project_repositories(gh_token: str, owner_login: str, project_id: str | int,
-                             is_organization: bool = False) -> list[Repository] | None:
-    project_owner_type = _is_o_conv(is_organization)
-    query = GET_PROJECT_REPOSITORIES_QUERY.substitute(
-        project_owner_type=project_owner_type,
-        project_id=project_id,
-        project_owner_login=owner_login,
-    )
+def iter_project_repositories(
+        gh_token: str,
+        owner_login: str,
+        project_id: str | int,
+        is_organization: bool = False,
+        page_size: int = PROJECT_PAGE_SIZE,
+        cache: ResponseCache | None = None,
+) -> Iterator[Repository]:
+    """
+    Yields each distinct repository of a project's items once, page by page.
+    :param cache: The cache of the responses. Defaults to the cache configured via ``GITHUB_CACHE_DIR``, if any.
+    :raise GitHubQueryError: If a page could not be fetched.
+    """
+    if cache is None:
+        cache = _default_cache()
+    seen = set()
+    for node in _iter_project_items(gh_token, GET_PROJECT_REPOSITORIES_QUERY, owner_login, project_id,
+                                    is_organization, page_size, cache):
+        repository = repository_node_to_repository(node)
+        if repository is not None and (repository.owner_login, repository.name) not in seen:
+            seen.add((repository.owner_login, repository.name))
+            yield repository
 
-    response = _send_query(gh_token, query)
 
-    if response.status_code == 200:
-        data = response.json()
-        try:
-            repository_nodes = data["data"]["user"]["projectV2"]["items"]["nodes"]
-            repositories = []
-            for repository_node in repository_nodes:
-                cur_repo = repository_node_to_repository(repository_node)
-                if cur_repo is not None and cur_repo not in repositories:
-                    repositories.append(cur_repo)
-            return repositories
-        except KeyError:
-            pass
-    return None
+def get_project_repositories(gh_token: str, owner_login: str, project_id: str | int,
+                             is_organization: bool = False) -> list[Repository] | None:
+    return _collect(iter_project_repositories(gh_token, owner_login, project_id, is_organization))
 
 
 def milestone_node_to_milestone(milestone_node: dict) -> Milestone | None:
@@ -122,38 +256,98 @@ def milestone_node_to_milestone(milestone_node: dict) -> Milestone | None:
     return None
 
 
-def get_repository_milestones(gh_token: str, owner_login: str, repository_name: str) -> list[Milestone] | None:
+def _milestone_nodes_to_milestones(milestone_nodes: list[dict]) -> list[Milestone]:
+    milestones = []
+    for milestone_node in milestone_nodes:
+        cur_milestone = milestone_node_to_milestone(milestone_node)
+        if cur_milestone is not None and cur_milestone not in milestones:
+            milestones.append(cur_milestone)
+    return milestones
+
+
+def get_repository_milestones(gh_token: str, owner_login: str, repository_name: str,
+                              cache: ResponseCache | None = None) -> list[Milestone] | None:
     query = GET_REPOSITORY_MILESTONES_QUERY.substitute(
         repository_owner_login=owner_login,
         repository_name=repository_name
     )
 
-    response = _send_query(gh_token, query)
-
-    if response.status_code == 200:
-        data = response.json()
-        try:
-            milestone_nodes = data["data"]["repository"]["milestones"]["nodes"]
-            milestones = []
-            for milestone_node in milestone_nodes:
-                cur_milestone = milestone_node_to_milestone(milestone_node)
-                if cur_milestone is not None and cur_milestone not in milestones:
-                    milestones.append(cur_milestone)
-            return milestones
-        except KeyError:
-            pass
+    data = _query_data(gh_token, query, cache)
+    try:
+        milestone_nodes = data["repository"]["milestones"]["nodes"]
+        return _milestone_nodes_to_milestones(milestone_nodes)
+    except (KeyError, TypeError):
+        pass
     return None
 
 
+def _get_batch_milestones(
+        gh_token: str,
+        repositories: Sequence[Repository],
+        cache: ResponseCache | None,
+) -> list[list[Milestone] | None]:
+    """
+    Fetches the milestones of all given repositories with a single aliased query. If the query as a whole fails,
+    e.g. because it exceeds the query complexity limits, the repositories are queried one by one instead.
+    """
+    fragments = [
+        REPOSITORY_MILESTONES_FRAGMENT.substitute(
+            alias=f"repository{i}",
+            repository_owner_login=repository.owner_login,
+            repository_name=repository.name,
+        )
+        for i, repository in enumerate(repositories)
+    ]
+    query = GET_REPOSITORIES_MILESTONES_QUERY.substitute(repositories="\n".join(fragments))
+
+    data = _query_data(gh_token, query, cache)
+    if data is not None:
+        results = []
+        for i in range(len(repositories)):
+            try:
+                # a missing or inaccessible repository is null, while the other aliases still resolve
+                milestone_nodes = data[f"repository{i}"]["milestones"]["nodes"]
+                results.append(_milestone_nodes_to_milestones(milestone_nodes))
+            except (KeyError, TypeError):
+                results.append(None)
+        return results
+
+    return [get_repository_milestones(gh_token, r.owner_login, r.name, cache) for r in repositories]
+
+
+def get_repositories_milestones(
+        gh_token: str,
+        repositories: Sequence[Repository],
+        batch_size: int = MILESTONE_BATCH_SIZE,
+        max_workers: int = MAX_QUERY_WORKERS,
+        cache: ResponseCache | None = None,
+) -> list[list[Milestone] | None]:
+    """
+    Fetches the milestones of many repositories in batches of aliased queries, one round trip per batch.
+    Projects with more repositories than fit into one batch are fetched with concurrent queries.
+    :param cache: The cache of the responses. Defaults to the cache configured via ``GITHUB_CACHE_DIR``, if any.
+    :return: The milestones of each repository in the given order, ``None`` for repositories that could not be
+    queried.
+    """
+    if cache is None:
+        cache = _default_cache()
+    batches = [repositories[i:i + batch_size] for i in range(0, len(repositories), batch_size)]
+    if len(batches) <= 1:
+        batch_results = [_get_batch_milestones(gh_token, batch, cache) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            batch_results = list(executor.map(lambda batch: _get_batch_milestones(gh_token, batch, cache), batches))
+    return [milestones for batch_result in batch_results for milestones in batch_result]
+
+
 def get_project_milestones(gh_token: str, owner_login: str, project_id: str | int, is_organization: bool = False) -> list[Milestone] | None:
     repositories = get_project_repositories(gh_token, owner_login, project_id, is_organization)
     if repositories is None:
         return None
 
     milestones = []
-    for repository in repositories:
-        cur_milestones = get_repository_milestones(gh_token, repository.owner_login, repository.name)
+    for cur_milestones in get_repositories_milestones(gh_token, repositories):
         if cur_milestones is not None:
             milestones.extend(cur_milestones)
 
-    return milestones
\ No newline at end of file
+    return milestones
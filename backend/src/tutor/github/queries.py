@@ -4,7 +4,11 @@ from typing import Final
 GET_PROJECT_ISSUES_QUERY: Final[Template] = Template("""{
   ${project_owner_type}(login: "${project_owner_login}") {
     projectV2(number: ${project_id}) {
-      items(first: 100) {
+      items(first: ${page_size}, after: ${cursor}) {
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
         nodes {
           content {
             ... on Issue {
@@ -41,7 +45,11 @@ GET_PROJECT_ISSUES_QUERY: Final[Template] = Template("""{
 GET_PROJECT_REPOSITORIES_QUERY: Final[Template] = Template("""{
   ${project_owner_type}(login: "${project_owner_login}") {
     projectV2(number: ${project_id}) {
-      items(first: 100) {
+      items(first: ${page_size}, after: ${cursor}) {
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
         nodes {
           content {
             ... on Issue {
@@ -82,3 +90,20 @@ GET_REPOSITORY_MILESTONES_QUERY: Final[Template] = Template("""{
   }
 }
 """)
+
+# one aliased block per repository, joined into a single query by ``GET_REPOSITORIES_MILESTONES_QUERY``
+REPOSITORY_MILESTONES_FRAGMENT: Final[Template] = Template("""  ${alias}: repository(owner: "${repository_owner_login}", name: "${repository_name}") {
+    milestones(first: 100) {
+      nodes {
+        title
+        description
+        dueOn
+        url
+      }
+    }
+  }""")
+
+GET_REPOSITORIES_MILESTONES_QUERY: Final[Template] = Template("""{
+${repositories}
+}
+""")
@@ -1,3 +1,7 @@
 from .prompt_generator import PromptGenerator, BasicPromptGenerator
+from .conversation_window import ConversationWindow
+from .registry import ModelRegistry, ManagedLanguageModel, ManagedEmotionModel, model_memory_bytes, \
+    model_file_bytes
+from .semantic_cache import SemanticIndex, HyperplaneIndex, ConversationCache
 
-from .tutor import Tutor, ReturnPromptTutor, LLMTutor, MockTutor, EchoTutor
+from .tutor import Tutor, ReturnPromptTutor, LLMTutor, MockTutor, EchoTutor, aggregate_face_emotions
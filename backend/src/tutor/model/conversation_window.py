@@ -0,0 +1,143 @@
+from collections import OrderedDict
+import hashlib
+import threading
+from typing import Final, Sequence
+
+from transformers import PreTrainedTokenizerBase
+
+from tutor.model.prompt_generator import PromptGenerator
+from tutor.model.language import LanguageModel, Message, prompt_with_ledger
+
+SUMMARY_ROLE: Final[str] = "summary"
+SUMMARY_STAGE: Final[str] = "summary"
+WORDS_PER_TOKEN: Final[float] = 0.75
+
+
+def _prefix_key(session_id: str | None, conversation: Sequence[Message]) -> str:
+    digest = hashlib.sha256()
+    digest.update((session_id or "").encode("utf-8"))
+    for message in conversation:
+        digest.update(b"\x00" + message.role.encode("utf-8") + b"\x00" + message.content.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ConversationWindow:
+    """
+    Bounds the part of a conversation that is embedded into prompts.
+    The most recent turns are kept verbatim, while older turns are folded into a rolling summary. The summary is
+    only extended once ``summary_interval`` further turns dropped out of the verbatim window, so it is generated at
+    most once per ``summary_interval`` turns. Summaries are cached per session and conversation prefix, so a changed
+    conversation (e.g. after clearing messages) never reuses a stale summary.
+    """
+
+    def __init__(
+        self,
+        prompt_generator: PromptGenerator,
+        summary_model: LanguageModel,
+        tokenizer: PreTrainedTokenizerBase,
+        max_turns: int = 8,
+        summary_interval: int = 4,
+        max_summary_tokens: int = 256,
+        cache_size: int = 1024,
+    ) -> None:
+        """
+        :param prompt_generator: The generator of the summary prompts.
+        :param summary_model: The language model that generates the summaries.
+        :param tokenizer: The tokenizer measuring the length of summaries.
+        :param max_turns: The number of most recent turns that are always kept verbatim.
+        :param summary_interval: The number of turns after which the summary is extended.
+        :param max_summary_tokens: The maximum length of a summary in tokens of the given tokenizer.
+        :param cache_size: The maximum number of cached summaries.
+        """
+        self.prompt_generator = prompt_generator
+        self.summary_model = summary_model
+        self.tokenizer = tokenizer
+        self.max_turns = max_turns
+        self.summary_interval = summary_interval
+        self.max_summary_tokens = max_summary_tokens
+        self.cache_size = cache_size
+        self._summaries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def _truncate(self, text: str) -> str:
+        token_ids = self.tokenizer.encode(text, add_special_tokens=False)
+        if len(token_ids) <= self.max_summary_tokens:
+            return text
+        return self.tokenizer.decode(token_ids[:self.max_summary_tokens], skip_special_tokens=True)
+
+    def _get_cached(self, key: str) -> str | None:
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is not None:
+                self._summaries.move_to_end(key)
+            return summary
+
+    def _set_cached(self, key: str, summary: str) -> None:
+        with self._lock:
+            self._summaries[key] = summary
+            self._summaries.move_to_end(key)
+            while len(self._summaries) > self.cache_size:
+                self._summaries.popitem(last=False)
+
+    def _summarize(
+        self,
+        session_id: str | None,
+        conversation: Sequence[Message],
+        boundary: int,
+    ) -> tuple[int, str | None]:
+        """
+        :return: The number of leading turns covered by the summary and the summary, which is ``None`` if no turn
+        could be summarized.
+        """
+        if boundary <= 0:
+            return 0, None
+
+        key = _prefix_key(session_id, conversation[:boundary])
+        summary = self._get_cached(key)
+        if summary is not None:
+            return boundary, summary
+
+        # extend the most recent cached summary, if any, with all turns it does not cover yet in a single call
+        previous_boundary, previous_summary = 0, None
+        for cached_boundary in range(boundary - self.summary_interval, 0, -self.summary_interval):
+            cached_summary = self._get_cached(_prefix_key(session_id, conversation[:cached_boundary]))
+            if cached_summary is not None:
+                previous_boundary, previous_summary = cached_boundary, cached_summary
+                break
+
+        max_words = int(self.max_summary_tokens * WORDS_PER_TOKEN)
+        prompt = self.prompt_generator.generate_summary_prompt(
+            previous_summary, conversation[previous_boundary:boundary], max_words
+        )
+        summary = prompt_with_ledger(SUMMARY_STAGE, self.summary_model, prompt)
+        if summary is None:
+            return previous_boundary, previous_summary
+
+        summary = self._truncate(summary.strip())
+        self._set_cached(key, summary)
+        return boundary, summary
+
+    def needs_summary(self, conversation: Sequence[Message]) -> bool:
+        """
+        :return: Whether older turns of the conversation are replaced by a summary.
+        """
+        return len(conversation) - self.max_turns >= self.summary_interval
+
+    def apply(self, conversation: Sequence[Message], session_id: str | None = None) -> Sequence[Message]:
+        """
+        :param conversation: The full conversation.
+        :param session_id: The session the conversation belongs to.
+        :return: The conversation with all but the most recent turns replaced by one summary message.
+        """
+        if not self.needs_summary(conversation):
+            return conversation
+
+        num_older = len(conversation) - self.max_turns
+        boundary = (num_older // self.summary_interval) * self.summary_interval
+        covered, summary = self._summarize(session_id, conversation, boundary)
+        if summary is None:
+            return conversation
+        return [Message(content=summary, role=SUMMARY_ROLE), *conversation[covered:]]
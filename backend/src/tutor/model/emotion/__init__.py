@@ -12,4 +12,10 @@ from .emotion_model import  EmotionModel, NullEmotionModel
 from .face_emotion_model import FaceEmotionModel
 
 from .local_emotion_model import LocalEmotionModel
-from .local_face_emotion_model import LocalFaceEmotionModel
\ No newline at end of file
+from .local_face_emotion_model import LocalFaceEmotionModel
+
+from .checkpoint import save_checkpoint, convert_checkpoint, load_checkpoint
+from .emotion_student import make_emotion_student, save_emotion_student, load_emotion_student
+from .tfidf_emotion_model import TfidfEmotionModel, train_tfidf_emotion_model, save_tfidf_emotion_model, \
+    load_tfidf_emotion_model
+from .cascade_emotion_model import CascadeEmotionModel
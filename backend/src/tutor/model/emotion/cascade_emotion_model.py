@@ -0,0 +1,66 @@
+import time
+from typing import Final, Sequence
+
+import numpy as np
+
+from tutor.model.emotion import SentimentRating, EmotionModel
+from tutor.model.emotion.tfidf_emotion_model import TfidfEmotionModel
+from tutor.util.metrics import METRICS
+
+CASCADE_REQUESTS_METRIC: Final[str] = "sentiment.cascade.requests"
+CASCADE_ESCALATIONS_METRIC: Final[str] = "sentiment.cascade.escalations"
+CASCADE_FIRST_LATENCY_METRIC: Final[str] = "sentiment.cascade.first_latency_ms"
+CASCADE_SECOND_LATENCY_METRIC: Final[str] = "sentiment.cascade.second_latency_ms"
+
+
+class CascadeEmotionModel(EmotionModel):
+    """
+    Rates sentences with a cheap model first and escalates only those to the accurate model, whose cheap rating is
+    less confident than the threshold.
+    The number of rated and escalated sentences and the latency of both stages are published as metrics.
+    """
+
+    def __init__(self, first: TfidfEmotionModel, second: EmotionModel, threshold: float = 0.5) -> None:
+        """
+        :param first: The cheap model.
+        :param second: The accurate model, e.g. a ``LocalEmotionModel``.
+        :param threshold: The confidence of the cheap model's most probable label, from which on its rating is used.
+        A threshold of 0 never escalates, a threshold above 1 always escalates.
+        """
+        super().__init__()
+        self.first = first
+        self.second = second
+        self.threshold = threshold
+
+    def analyze(self, sentence: str) -> SentimentRating | None:
+        return self.analyze_batch([sentence])[0]
+
+    def warmup(self) -> None:
+        self.first.analyze_with_confidence(["warmup"])
+        self.second.warmup()
+
+    def embed(self, sentence: str) -> np.ndarray | None:
+        return self.second.embed(sentence)
+
+    def analyze_batch(self, sentences: Sequence[str]) -> list[SentimentRating | None]:
+        start = time.perf_counter()
+        ratings, confidences = self.first.analyze_with_confidence(sentences)
+        METRICS.window(CASCADE_FIRST_LATENCY_METRIC).add((time.perf_counter() - start) * 1000.0)
+
+        escalated = [i for i, confidence in enumerate(confidences) if confidence < self.threshold]
+        METRICS.counter(CASCADE_REQUESTS_METRIC).increment(len(sentences))
+        METRICS.counter(CASCADE_ESCALATIONS_METRIC).increment(len(escalated))
+        if not escalated:
+            return list(ratings)
+
+        start = time.perf_counter()
+        if len(escalated) == 1:
+            escalated_ratings = [self.second.analyze(sentences[escalated[0]])]
+        else:
+            escalated_ratings = self.second.analyze_batch([sentences[i] for i in escalated])
+        METRICS.window(CASCADE_SECOND_LATENCY_METRIC).add((time.perf_counter() - start) * 1000.0)
+
+        ratings = list(ratings)
+        for i, rating in zip(escalated, escalated_ratings):
+            ratings[i] = rating
+        return ratings
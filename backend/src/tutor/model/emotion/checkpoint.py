@@ -0,0 +1,139 @@
+import json
+import os
+from pathlib import Path
+import struct
+from typing import Callable, Final, Union
+
+from accelerate import init_empty_weights
+from safetensors.torch import save_file
+import torch
+import torch.nn as nn
+from transformers import BertConfig, BertModel, PretrainedConfig, ViTConfig, ViTForImageClassification
+
+from tutor.model.emotion.emotion_bert import EmotionBert
+
+CHECKPOINT_FILE: Final[str] = "model.safetensors"
+
+ARCHITECTURE_KEY: Final[str] = "architecture"
+CONFIG_KEY: Final[str] = "config"
+
+# the model classes a checkpoint can hold, with their config class and how to build them from a config
+_ARCHITECTURES: Final[dict[str, tuple[type[PretrainedConfig], Callable[[PretrainedConfig], nn.Module]]]] = {
+    EmotionBert.__name__: (BertConfig, lambda config: EmotionBert(BertModel(config))),
+    ViTForImageClassification.__name__: (ViTConfig, ViTForImageClassification),
+}
+
+_DTYPES: Final[dict[str, torch.dtype]] = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def _model_config(model: nn.Module) -> PretrainedConfig:
+    return model.bert.config if isinstance(model, EmotionBert) else model.config
+
+
+def _build_empty(architecture: str, config: PretrainedConfig) -> nn.Module:
+    """
+    Builds the model with its parameters on the meta device, i.e. without allocating or initializing them.
+    """
+    if architecture not in _ARCHITECTURES:
+        raise ValueError(f"Unsupported checkpoint architecture '{architecture}'")
+    _, build = _ARCHITECTURES[architecture]
+    with init_empty_weights():
+        return build(config)
+
+
+def save_checkpoint(model: nn.Module, path: Union[str, Path]) -> None:
+    """
+    Saves an ``EmotionBert`` or ``ViTForImageClassification`` as a single safetensors file, which holds the config in
+    its metadata besides the weights.
+    """
+    architecture = type(model).__name__
+    if architecture not in _ARCHITECTURES:
+        raise ValueError(f"Unsupported checkpoint architecture '{architecture}'")
+    metadata = {ARCHITECTURE_KEY: architecture, CONFIG_KEY: _model_config(model).to_json_string()}
+    state_dict = {name: tensor.detach().contiguous().cpu() for name, tensor in model.state_dict().items()}
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    save_file(state_dict, str(path), metadata=metadata)
+
+
+def convert_checkpoint(
+        weights_path: Union[str, Path],
+        output_path: Union[str, Path],
+        architecture: str,
+        config: PretrainedConfig,
+) -> None:
+    """
+    Converts the state dict of a model saved with ``torch.save`` into a safetensors checkpoint.
+    :param weights_path: The file of the state dict.
+    :param output_path: The file receiving the checkpoint.
+    :param architecture: The class name of the model, e.g. ``"EmotionBert"``.
+    :param config: The config of the model, e.g. that of the pre-trained model it was fine-tuned from.
+    """
+    model = _build_empty(architecture, config)
+    state_dict = torch.load(weights_path, map_location="cpu", mmap=True, weights_only=True)
+    # fails on missing or unexpected weights, e.g. if the config does not match the state dict
+    model.load_state_dict(state_dict, assign=True)
+    save_checkpoint(model, output_path)
+
+
+def mmap_safetensors(path: Union[str, Path]) -> tuple[dict[str, torch.Tensor], dict[str, str]]:
+    """
+    Maps the tensors of a safetensors file into memory without reading or copying them.
+    The file is mapped privately: its pages are read on first access and shared through the page cache with every
+    other process that maps the same file, as long as they are not written to.
+    :return: The tensors and the metadata of the file.
+    """
+    path = os.fspath(path)
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+    metadata = header.pop("__metadata__", None) or {}
+
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=os.path.getsize(path))
+    data = torch.empty(0, dtype=torch.uint8).set_(storage)
+    data_start = 8 + header_size
+
+    tensors = {}
+    for name, info in header.items():
+        dtype = _DTYPES[info["dtype"]]
+        begin, end = info["data_offsets"]
+        raw = data[data_start + begin:data_start + end]
+        if raw.storage_offset() % dtype.itemsize != 0:
+            # a misaligned tensor cannot be viewed in place
+            raw = raw.clone()
+        tensors[name] = raw.view(dtype).reshape(info["shape"])
+    return tensors, metadata
+
+
+def load_checkpoint(path: Union[str, Path], device: torch.device) -> nn.Module:
+    """
+    Loads a checkpoint written by ``save_checkpoint`` in evaluation mode.
+    The model is built on the meta device and takes over the memory-mapped weights on the CPU, so loading neither
+    initializes nor copies any weights; on other devices, the weights are copied once from the mapping to the device.
+    """
+    state_dict, metadata = mmap_safetensors(path)
+    if ARCHITECTURE_KEY not in metadata or CONFIG_KEY not in metadata:
+        raise ValueError(f"{path} is not a model checkpoint")
+    architecture = metadata[ARCHITECTURE_KEY]
+    config_class, _ = _ARCHITECTURES.get(architecture, (None, None))
+    if config_class is None:
+        raise ValueError(f"Unsupported checkpoint architecture '{architecture}'")
+    config = config_class.from_dict(json.loads(metadata[CONFIG_KEY]))
+
+    model = _build_empty(architecture, config)
+    if device.type != "cpu":
+        state_dict = {name: tensor.to(device) for name, tensor in state_dict.items()}
+    model.load_state_dict(state_dict, assign=True)
+    model.to(device)
+    model.eval()
+    return model
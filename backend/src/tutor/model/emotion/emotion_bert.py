@@ -16,12 +16,18 @@ NEUTRAL_INDEX: Final[int] = 0
 BOREDOM_INDEX: Final[int] = 1
 ENGAGEMENT_INDEX: Final[int] = 2
 
+# the names of the labels, in the order of their indices
+EMOTIONS: Final[tuple[str, str, str]] = ("neutral", "boredom", "engagement")
+
 class EmotionBert(nn.Module, PreTrainedEmotionModel):
 
-    def __init__(self):
+    def __init__(self, bert: BertModel | None = None):
+        """
+        :param bert: The encoder, e.g. a compact student; the pre-trained ``bert-base-uncased`` if ``None``.
+        """
         super().__init__()
         # download the pre-trained model 
-        self.bert = BertModel.from_pretrained("bert-base-uncased")
+        self.bert = bert if bert is not None else BertModel.from_pretrained("bert-base-uncased")
         # create the hidden layer
         hidden_size = self.bert.config.hidden_size
         # create the final classification layer
@@ -29,26 +35,77 @@ class EmotionBert(nn.Module, PreTrainedEmotionModel):
 
 
     def forward(self, input_ids, attention_mask) -> torch.Tensor:
+        return self.forward_with_embeddings(input_ids, attention_mask)[0]
+
+
+    def forward_with_embeddings(self, input_ids, attention_mask) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        :return: The logits and the pooled outputs of the encoder, from which the logits are computed.
+        """
         output = self.bert(input_ids=input_ids, attention_mask=attention_mask)
         pooled = output.pooler_output
         logits = self.classifier(pooled)
-        return logits.view(-1, NUM_LABELS, NUM_CLASSES)
+        return logits.view(-1, NUM_LABELS, NUM_CLASSES), pooled
 
 
     def get_emotion_pred(self, input_ids, attention_mask) -> SentimentRating:
-        with torch.no_grad():
+        return self.get_emotion_preds(input_ids, attention_mask)[0]
+
+
+    def get_emotion_preds(self, input_ids, attention_mask) -> list[SentimentRating]:
+        with torch.inference_mode():
+            results = self.forward(input_ids, attention_mask)
+        return self._logits_to_ratings(results)
+
+
+    def get_aggregated_emotion_pred(self, input_ids, attention_mask) -> SentimentRating:
+        """
+        Averages the logits of all windows, weighted by their number of tokens, into a single sentiment.
+        """
+        with torch.inference_mode():
             results = self.forward(input_ids, attention_mask)
-        squeezed = results.squeeze(0)
-        pred_indices = torch.argmax(squeezed, dim=1)
+            weights = attention_mask.sum(dim=1).to(results.dtype)
+            results = (results * weights.view(-1, 1, 1)).sum(dim=0, keepdim=True) / weights.sum()
+        return self._logits_to_ratings(results)[0]
+
+
+    def get_emotion_pred_with_embedding(self, input_ids, attention_mask) -> tuple[SentimentRating, torch.Tensor]:
+        """
+        Like ``get_aggregated_emotion_pred``, but also returns the pooled output, averaged over the windows in the
+        same way, as an embedding of the text.
+        """
+        with torch.inference_mode():
+            results, pooled = self.forward_with_embeddings(input_ids, attention_mask)
+            weights = (attention_mask.sum(dim=1).to(results.dtype) / attention_mask.sum()).view(-1, 1)
+            results = (results * weights.unsqueeze(2)).sum(dim=0, keepdim=True)
+            embedding = (pooled * weights).sum(dim=0)
+        return self._logits_to_ratings(results)[0], embedding
+
+
+    def get_embedding(self, input_ids, attention_mask) -> torch.Tensor:
+        with torch.inference_mode():
+            pooled = self.bert(input_ids=input_ids, attention_mask=attention_mask).pooler_output
+            weights = (attention_mask.sum(dim=1).to(pooled.dtype) / attention_mask.sum()).view(-1, 1)
+            return (pooled * weights).sum(dim=0)
+
+
+    @staticmethod
+    def _logits_to_ratings(results: torch.Tensor) -> list[SentimentRating]:
+        pred_indices = torch.argmax(results, dim=2)
 
         # convert logits to confidence scores for the highest scores per class
-        confidences = squeezed[torch.arange(3), pred_indices].softmax(dim=0)
-
-        return SentimentRating(
-            neutral=int(pred_indices[NEUTRAL_INDEX].item()),
-            boredom=int(pred_indices[BOREDOM_INDEX].item()),
-            engagement=int(pred_indices[ENGAGEMENT_INDEX].item()),
-            neutral_confidence=float(confidences[NEUTRAL_INDEX].item()),
-            boredom_confidence=float(confidences[BOREDOM_INDEX].item()),
-            engagement_confidence=float(confidences[ENGAGEMENT_INDEX].item()),
-        )
+        confidences = torch.gather(results, 2, pred_indices.unsqueeze(2)).squeeze(2).softmax(dim=1)
+
+        pred_indices = pred_indices.tolist()
+        confidences = confidences.tolist()
+        return [
+            SentimentRating(
+                neutral=int(indices[NEUTRAL_INDEX]),
+                boredom=int(indices[BOREDOM_INDEX]),
+                engagement=int(indices[ENGAGEMENT_INDEX]),
+                neutral_confidence=float(confs[NEUTRAL_INDEX]),
+                boredom_confidence=float(confs[BOREDOM_INDEX]),
+                engagement_confidence=float(confs[ENGAGEMENT_INDEX]),
+            )
+            for indices, confs in zip(pred_indices, confidences)
+        ]
@@ -1,4 +1,7 @@
 from abc import ABC, abstractmethod
+from typing import Sequence
+
+import numpy as np
 
 from tutor.model.emotion import SentimentRating
 
@@ -9,6 +12,31 @@ class EmotionModel(ABC):
     def analyze(self, sentence: str) -> SentimentRating | None:
         pass
 
+    def analyze_batch(self, sentences: Sequence[str]) -> list[SentimentRating | None]:
+        """
+        Analyzes many sentences; by default one at a time.
+        """
+        return [self.analyze(sentence) for sentence in sentences]
+
+    def warmup(self) -> None:
+        """
+        Runs the model on representative dummy inputs, so that the first request does not pay for loading kernels and
+        sizing allocators; by default nothing.
+        """
+        pass
+
+    def analyze_with_embedding(self, sentence: str) -> tuple[SentimentRating | None, np.ndarray | None]:
+        """
+        Analyzes a sentence and returns the embedding computed on the way, if any; by default without an embedding.
+        """
+        return self.analyze(sentence), None
+
+    def embed(self, sentence: str) -> np.ndarray | None:
+        """
+        :return: An embedding of the sentence, or ``None`` if the model provides no embeddings.
+        """
+        return None
+
 class NullEmotionModel(EmotionModel):
     def analyze(self, sentence: str) -> SentimentRating | None:
         return None
\ No newline at end of file
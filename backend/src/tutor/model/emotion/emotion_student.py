@@ -0,0 +1,77 @@
+import json
+import os
+from pathlib import Path
+from typing import Final, Union
+
+import torch
+from transformers import BertConfig, BertModel
+
+from tutor.model.emotion.emotion_bert import EmotionBert
+
+STUDENT_CONFIG_FILE: Final[str] = "config.json"
+STUDENT_WEIGHTS_FILE: Final[str] = "model.pt"
+
+
+def make_emotion_student(
+        vocab_size: int,
+        hidden_size: int = 256,
+        num_layers: int = 4,
+        num_heads: int = 4,
+        intermediate_size: int = 1024,
+        max_position_embeddings: int = 512,
+        pad_token_id: int = 0,
+) -> EmotionBert:
+    """
+    Creates an untrained compact ``EmotionBert`` with a narrow and shallow encoder, which is distilled from the
+    full-size ``EmotionBert``.
+    :param vocab_size: The vocabulary size of the teacher's tokenizer, which the student shares.
+    """
+    config = BertConfig(
+        vocab_size=vocab_size,
+        hidden_size=hidden_size,
+        num_hidden_layers=num_layers,
+        num_attention_heads=num_heads,
+        intermediate_size=intermediate_size,
+        max_position_embeddings=max_position_embeddings,
+        pad_token_id=pad_token_id,
+    )
+    return EmotionBert(BertModel(config))
+
+
+def init_student_embeddings(student: EmotionBert, teacher: EmotionBert) -> None:
+    """
+    Initializes the student's word embeddings with the principal components of the teacher's word embeddings, so
+    the student starts from the teacher's notion of word similarity instead of random vectors.
+    """
+    teacher_embeddings = teacher.bert.embeddings.word_embeddings.weight.detach()
+    student_embeddings = student.bert.embeddings.word_embeddings.weight
+    hidden_size = student_embeddings.shape[1]
+    with torch.no_grad():
+        centered = teacher_embeddings - teacher_embeddings.mean(dim=0, keepdim=True)
+        u, s, _ = torch.pca_lowrank(centered, q=hidden_size, center=False)
+        projected = u * s
+        # keep the scale of the student's initialization
+        projected *= student_embeddings.std() / projected.std()
+        student_embeddings.copy_(projected.to(student_embeddings.dtype))
+
+
+def save_emotion_student(student: EmotionBert, directory: Union[str, Path]) -> None:
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / STUDENT_CONFIG_FILE, "w", encoding="utf-8") as f:
+        json.dump(student.bert.config.to_dict(), f, indent=2)
+    torch.save(student.state_dict(), directory / STUDENT_WEIGHTS_FILE)
+
+
+def load_emotion_student(directory: Union[str, Path], device: torch.device) -> EmotionBert:
+    """
+    Loads a student written by ``save_emotion_student`` in evaluation mode.
+    """
+    directory = Path(directory)
+    with open(directory / STUDENT_CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = BertConfig.from_dict(json.load(f))
+    student = EmotionBert(BertModel(config))
+    student.load_state_dict(torch.load(os.path.join(directory, STUDENT_WEIGHTS_FILE), map_location=device))
+    student.to(device)
+    student.eval()
+    return student
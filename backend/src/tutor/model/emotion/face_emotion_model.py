@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Sequence
 
 from tutor.model.emotion import SentimentRating, Emotion
 
@@ -9,6 +10,18 @@ class FaceEmotionModel(ABC):
     def analyze(self, sentence: str) -> tuple[Emotion, float] | None:
         pass
 
+    def analyze_batch(self, images: Sequence) -> list[tuple[Emotion, float] | None]:
+        """
+        Analyzes many frames; by default one at a time.
+        """
+        return [self.analyze(image) for image in images]
+
+    def warmup(self) -> None:
+        """
+        Runs the model on representative dummy frames; by default nothing.
+        """
+        pass
+
 class NullEmotionModel(FaceEmotionModel):
     def analyze(self, sentence: str) -> tuple[Emotion, float] | None:
         return None
\ No newline at end of file
@@ -1,29 +1,178 @@
+import math
+from typing import Final, Sequence
+
+import numpy as np
 from transformers import PreTrainedTokenizerFast
 import torch
 
 from tutor.model.emotion import SentimentRating, EmotionModel, PreTrainedEmotionModel
 
+# a token rarely spans more characters, so texts with more characters than this per token of their windows are
+# windowed on sampled character spans rather than tokenized as a whole
+SPAN_CHARS_PER_TOKEN: Final[int] = 8
+
 
 class LocalEmotionModel(EmotionModel):
 
-    def __init__(self, tokenizer: PreTrainedTokenizerFast, model: PreTrainedEmotionModel) -> None:
+    def __init__(
+            self,
+            tokenizer: PreTrainedTokenizerFast,
+            model: PreTrainedEmotionModel,
+            max_window_tokens: int = 512,
+            window_overlap: int = 64,
+            max_windows: int | None = 8,
+    ) -> None:
+        """
+        Texts longer than one window are split into overlapping windows, which are scored in one batch and
+        aggregated into a single sentiment.
+        :param tokenizer:
+        :param model:
+        :param max_window_tokens: The maximum number of tokens per window, including special tokens.
+        :param window_overlap: The number of tokens shared by consecutive windows.
+        :param max_windows: The maximum number of windows per text. Longer texts are covered by evenly spaced windows
+        instead of consecutive ones, which bounds the inference time for any text length. Texts with many more
+        characters than the windows can hold are only tokenized on the evenly spaced character spans of their windows,
+        which bounds the tokenization time as well. Unlimited if ``None``.
+        """
         super().__init__()
         self.tokenizer = tokenizer
         self.model = model
         self.model_device = self._get_device(model)
+        self.special_prefix, self.special_suffix = self._special_tokens(tokenizer)
+        self.window_content_tokens = max_window_tokens - len(self.special_prefix) - len(self.special_suffix)
+        if not 0 <= window_overlap < self.window_content_tokens:
+            raise ValueError(f"The window overlap must be in [0, {self.window_content_tokens}), got {window_overlap}")
+        if max_windows is not None and max_windows < 1:
+            raise ValueError(f"The maximum number of windows must be at least 1, got {max_windows}")
+        self.window_overlap = window_overlap
+        self.max_windows = max_windows
+        self.span_chars = self.window_content_tokens * SPAN_CHARS_PER_TOKEN
 
     @staticmethod
     def _get_device(obj: PreTrainedTokenizerFast | PreTrainedEmotionModel) -> torch.device:
         return next(obj.parameters()).device
 
-    def analyze(self, sentence: str) -> SentimentRating | None:
+    @staticmethod
+    def _special_tokens(tokenizer: PreTrainedTokenizerFast) -> tuple[list[int], list[int]]:
+        """
+        :return: The ids of the special tokens the tokenizer puts before and after a text, which frame every window.
+        """
+        content = tokenizer.encode("a", add_special_tokens=False)
+        full = tokenizer.encode("a")
+        num_prefix = next(
+            i for i in range(len(full) - len(content) + 1) if full[i:i + len(content)] == content
+        )
+        return full[:num_prefix], full[num_prefix + len(content):]
+
+    def _window_starts(self, num_tokens: int) -> list[int]:
+        content = self.window_content_tokens
+        if num_tokens <= content:
+            return [0]
+        last_start = num_tokens - content
+        step = content - self.window_overlap
+        num_windows = math.ceil(last_start / step) + 1
+        if self.max_windows is not None and num_windows > self.max_windows:
+            return np.unique(np.linspace(0, last_start, self.max_windows).round().astype(int)).tolist()
+        # the last window ends with the text rather than being cut short
+        return [min(i * step, last_start) for i in range(num_windows)]
+
+    def _window_contents(self, sentence: str) -> list[list[int]]:
+        """
+        :return: The content token ids of each of the sentence's windows.
+        """
+        content = self.window_content_tokens
+        if self.max_windows is None or len(sentence) <= self.max_windows * self.span_chars:
+            tokens = self.tokenizer.encode(sentence, add_special_tokens=False)
+            return [tokens[start:start + content] for start in self._window_starts(len(tokens))]
+
+        starts = np.unique(np.linspace(0, len(sentence) - self.span_chars, self.max_windows).round().astype(int))
+        spans = [sentence[start:start + self.span_chars] for start in starts]
+        span_tokens = self.tokenizer(spans, add_special_tokens=False)["input_ids"]
+        # the last window ends with the text, like the last of the consecutive windows
+        return [tokens[:content] for tokens in span_tokens[:-1]] + [span_tokens[-1][-content:]]
+
+    def _tokenize_windows(self, sentence: str) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        :return: The input ids and attention mask of the sentence's windows, padded to the longest window.
+        """
         tokenizer = self.tokenizer
-        model = self.model
+        prefix, suffix = self.special_prefix, self.special_suffix
+        windows = [prefix + window + suffix for window in self._window_contents(sentence)]
+        width = max(len(window) for window in windows)
+        pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else 0
+        input_ids = torch.full((len(windows), width), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(windows), width), dtype=torch.long)
+        for i, window in enumerate(windows):
+            input_ids[i, :len(window)] = torch.tensor(window, dtype=torch.long)
+            attention_mask[i, :len(window)] = 1
+        return input_ids, attention_mask
+
+    def analyze(self, sentence: str) -> SentimentRating | None:
+        model_device = self.model_device
+        input_ids, attention_mask = self._tokenize_windows(sentence)
+        input_ids = input_ids.to(model_device)
+        attention_mask = attention_mask.to(model_device)
+
+        if input_ids.shape[0] == 1:
+            return self.model.get_emotion_pred(input_ids, attention_mask)
+        return self.model.get_aggregated_emotion_pred(input_ids, attention_mask)
+
+    def analyze_with_embedding(self, sentence: str) -> tuple[SentimentRating | None, np.ndarray | None]:
+        """
+        Analyzes a sentence and returns the pooled output of the encoder, which the rating is computed from.
+        """
+        input_ids, attention_mask = self._tokenize_windows(sentence)
+        rating, embedding = self.model.get_emotion_pred_with_embedding(
+            input_ids.to(self.model_device), attention_mask.to(self.model_device)
+        )
+        return rating, None if embedding is None else embedding.float().cpu().numpy()
+
+    def embed(self, sentence: str) -> np.ndarray | None:
+        input_ids, attention_mask = self._tokenize_windows(sentence)
+        embedding = self.model.get_embedding(input_ids.to(self.model_device), attention_mask.to(self.model_device))
+        return None if embedding is None else embedding.float().cpu().numpy()
+
+    def warmup(self, lengths: Sequence[int] = (16, 128)) -> None:
+        """
+        Scores a single window of each of the given numbers of tokens, a full window and the largest batch of windows
+        a long text is split into.
+        """
+        filler = self.tokenizer.encode("a", add_special_tokens=False)[0]
+        content = self.window_content_tokens
+        max_windows = self.max_windows if self.max_windows is not None else 1
+        shapes = [(1, min(length, content)) for length in lengths] + [(1, content), (max_windows, content)]
+        for num_windows, length in shapes:
+            window = self.special_prefix + [filler] * length + self.special_suffix
+            input_ids = torch.tensor([window] * num_windows, dtype=torch.long, device=self.model_device)
+            attention_mask = torch.ones_like(input_ids)
+            self.model.get_emotion_pred_with_embedding(input_ids, attention_mask)
+
+    def analyze_tokens(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> list[SentimentRating]:
+        """
+        Analyzes a padded batch of pre-tokenized sentences at once.
+        """
         model_device = self.model_device
+        return self.model.get_emotion_preds(input_ids.to(model_device), attention_mask.to(model_device))
 
-        input_t = tokenizer(sentence, return_tensors="pt")
-        input_ids = input_t.input_ids.to(model_device)
-        attention_mask = input_t.attention_mask.to(model_device)
-        sentiment = model.get_emotion_pred(input_ids, attention_mask)
+    def analyze_batch(self, sentences: Sequence[str]) -> list[SentimentRating | None]:
+        """
+        Analyzes the sentences that fit a single window in one batch; longer sentences are analyzed one at a time.
+        """
+        sentences = list(sentences)
+        # sentences with too many characters to fit a window are not tokenized as a whole just to count their tokens
+        short = [
+            i for i, sentence in enumerate(sentences)
+            if len(sentence) <= self.span_chars
+            and len(self.tokenizer.encode(sentence, add_special_tokens=False)) <= self.window_content_tokens
+        ]
+        ratings: list[SentimentRating | None] = [None] * len(sentences)
 
-        return sentiment
\ No newline at end of file
+        if short:
+            input_t = self.tokenizer([sentences[i] for i in short], return_tensors="pt", padding=True)
+            for i, rating in zip(short, self.analyze_tokens(input_t.input_ids, input_t.attention_mask)):
+                ratings[i] = rating
+        short_indices = set(short)
+        for i, sentence in enumerate(sentences):
+            if i not in short_indices:
+                ratings[i] = self.analyze(sentence)
+        return ratings
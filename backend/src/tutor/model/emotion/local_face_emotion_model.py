@@ -1,4 +1,4 @@
-from typing import Final
+from typing import Final, Sequence
 
 from PIL import Image
 from transformers import PreTrainedTokenizerFast
@@ -24,23 +24,36 @@ class LocalFaceEmotionModel(FaceEmotionModel):
     def _get_device(obj) -> torch.device:
         return next(obj.parameters()).device
 
+    def warmup(self, batch_sizes: Sequence[int] = (1, 8)) -> None:
+        """
+        Scores blank frames in batches of the given sizes, i.e. a single ``/faceEmotion`` frame and a typical
+        ``/faceEmotions`` batch.
+        """
+        for batch_size in batch_sizes:
+            self.analyze_batch([Image.new("RGB", (224, 224))] * batch_size)
+
     def analyze(self, image: Image) -> tuple[Emotion, float] | None:
+        return self.analyze_batch([image])[0]
+
+    def analyze_batch(self, images: Sequence[Image]) -> list[tuple[Emotion, float] | None]:
+        """
+        Analyzes many frames in one forward pass.
+        """
         processor = self.processor
         model = self.model
         device = self.model_device
 
-        image = image.convert("RGB")
-        inputs = processor(images=image, return_tensors="pt")
+        images = [image.convert("RGB") for image in images]
+        inputs = processor(images=images, return_tensors="pt")
 
         inputs = {k: v.to(device) for k, v in inputs.items()}
 
-        with torch.no_grad():
+        with torch.inference_mode():
             outputs = model(**inputs)
 
-        confidences = outputs.logits[0].softmax(dim=0)
-        predicted_class = torch.argmax(confidences, dim=-1).item()
-
-        emotion = CLASS_TO_EMOTION[predicted_class]
-        confidence = confidences[predicted_class].item()
+        confidences, predicted_classes = outputs.logits.softmax(dim=1).max(dim=1)
 
-        return emotion, confidence
+        return [
+            (CLASS_TO_EMOTION[predicted_class], confidence)
+            for predicted_class, confidence in zip(predicted_classes.tolist(), confidences.tolist())
+        ]
@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
 
+import torch
+
 from tutor.model.emotion.emotion_model import SentimentRating
 
 
@@ -8,3 +10,33 @@ class PreTrainedEmotionModel(ABC):
     @abstractmethod
     def get_emotion_pred(self, input_ids, attention_mask) -> SentimentRating:
         pass
+
+
+    def get_emotion_preds(self, input_ids, attention_mask) -> list[SentimentRating]:
+        """
+        Predicts the sentiment of a padded batch of sentences; by default one sentence at a time.
+        """
+        return [
+            self.get_emotion_pred(input_ids[i:i + 1], attention_mask[i:i + 1])
+            for i in range(input_ids.shape[0])
+        ]
+
+    def get_aggregated_emotion_pred(self, input_ids, attention_mask) -> SentimentRating:
+        """
+        Predicts one sentiment for a text split into a padded batch of overlapping windows; by default the sentiment
+        of the first window.
+        """
+        return self.get_emotion_pred(input_ids[:1], attention_mask[:1])
+
+    def get_emotion_pred_with_embedding(self, input_ids, attention_mask) -> tuple[SentimentRating, torch.Tensor | None]:
+        """
+        Predicts one sentiment for a text split into a padded batch of windows along with an embedding of the text
+        that falls out of the same forward pass; by default without an embedding.
+        """
+        return self.get_aggregated_emotion_pred(input_ids, attention_mask), None
+
+    def get_embedding(self, input_ids, attention_mask) -> torch.Tensor | None:
+        """
+        Embeds a text split into a padded batch of windows; ``None`` if the model provides no embeddings.
+        """
+        return None
@@ -0,0 +1,94 @@
+from pathlib import Path
+from typing import Sequence, Union
+
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline, FeatureUnion
+
+from tutor.model.emotion import SentimentRating, EmotionModel
+from tutor.model.emotion.emotion_bert import EMOTIONS, NUM_CLASSES, NEUTRAL_INDEX, BOREDOM_INDEX, ENGAGEMENT_INDEX
+
+
+class TfidfEmotionModel(EmotionModel):
+    """
+    Cheap sentiment model: a linear classifier over TF-IDF features of words and character n-grams, which predicts
+    the joint (emotion, polarity) label of an utterance.
+    The confidence of each emotion of the rating is the probability of the emotion, its class the most probable
+    polarity of the emotion.
+    """
+
+    def __init__(self, pipeline: Pipeline) -> None:
+        super().__init__()
+        self.pipeline = pipeline
+        classes = pipeline.classes_
+        self._emotion_indices = classes // NUM_CLASSES
+        self._class_indices = classes % NUM_CLASSES
+
+    def _probabilities(self, sentences: Sequence[str]) -> np.ndarray:
+        """
+        :return: The probabilities of all joint labels with shape ``(sentences, emotions, classes)``.
+        """
+        proba = self.pipeline.predict_proba(list(sentences))
+        probabilities = np.zeros((len(proba), len(EMOTIONS), NUM_CLASSES))
+        probabilities[:, self._emotion_indices, self._class_indices] = proba
+        return probabilities
+
+    def analyze_with_confidence(self, sentences: Sequence[str]) -> tuple[list[SentimentRating], np.ndarray]:
+        """
+        :return: The rating of each sentence and the probability of its most probable joint label.
+        """
+        probabilities = self._probabilities(sentences)
+        emotion_confidences = probabilities.sum(axis=2)
+        classes = probabilities.argmax(axis=2)
+        ratings = [
+            SentimentRating(
+                neutral=int(c[NEUTRAL_INDEX]),
+                neutral_confidence=float(conf[NEUTRAL_INDEX]),
+                boredom=int(c[BOREDOM_INDEX]),
+                boredom_confidence=float(conf[BOREDOM_INDEX]),
+                engagement=int(c[ENGAGEMENT_INDEX]),
+                engagement_confidence=float(conf[ENGAGEMENT_INDEX]),
+            )
+            for c, conf in zip(classes.tolist(), emotion_confidences.tolist())
+        ]
+        return ratings, probabilities.reshape(len(probabilities), -1).max(axis=1)
+
+    def analyze(self, sentence: str) -> SentimentRating | None:
+        return self.analyze_with_confidence([sentence])[0][0]
+
+    def analyze_batch(self, sentences: Sequence[str]) -> list[SentimentRating | None]:
+        return self.analyze_with_confidence(sentences)[0]
+
+
+def train_tfidf_emotion_model(
+        utterances: Sequence[str],
+        emotions: Sequence[str],
+        polarities: Sequence[int],
+        regularization: float = 4.0,
+) -> TfidfEmotionModel:
+    """
+    :param utterances: The annotated utterances.
+    :param emotions: The annotated emotion of each utterance, one of ``EMOTIONS``.
+    :param polarities: The annotated polarity of each utterance, from 1 to 3.
+    :param regularization: The inverse regularization strength of the logistic regression.
+    """
+    labels = np.array([EMOTIONS.index(e) * NUM_CLASSES + p - 1 for e, p in zip(emotions, polarities)])
+    pipeline = Pipeline([
+        ("features", FeatureUnion([
+            ("words", TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True)),
+            ("chars", TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 5), sublinear_tf=True)),
+        ])),
+        ("classifier", LogisticRegression(C=regularization, max_iter=2000)),
+    ])
+    pipeline.fit(list(utterances), labels)
+    return TfidfEmotionModel(pipeline)
+
+
+def save_tfidf_emotion_model(model: TfidfEmotionModel, path: Union[str, Path]) -> None:
+    joblib.dump(model.pipeline, path)
+
+
+def load_tfidf_emotion_model(path: Union[str, Path]) -> TfidfEmotionModel:
+    return TfidfEmotionModel(joblib.load(path))
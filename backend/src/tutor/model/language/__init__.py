@@ -1,6 +1,13 @@
 from .message import Message
+from .completion import Completion, Usage
+from .errors import RateLimitError, AdmissionRejectedError
 from .language_model import LanguageModel, NullLanguageModel
 
 from .local_language_model import LocalLanguageModel
 from .language_model_endpoint import LanguageModelEndpoint
-from .gemini_language_model import GeminiLanguageModel
\ No newline at end of file
+from .gemini_language_model import GeminiLanguageModel
+from .hedged_language_model import HedgedLanguageModel
+from .rate_limited_language_model import RateLimitedLanguageModel
+from .usage_ledger import (
+    ModelPrice, UsageLedger, LedgerLog, load_prices, ledger_scope, prompt_with_ledger
+)
@@ -0,0 +1,19 @@
+class RateLimitError(Exception):
+    """
+    Raised by a language model backend if the provider rejected a request because of exceeded quotas (HTTP 429).
+    """
+
+    def __init__(self, retry_after: float | None = None) -> None:
+        super().__init__(f"Rate limit exceeded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionRejectedError(Exception):
+    """
+    Raised if a request could not be admitted to a language model backend, e.g. because its wait queue is full
+    or the request would not be served before its deadline.
+    """
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"Request rejected, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
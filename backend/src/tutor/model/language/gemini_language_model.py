@@ -1,6 +1,10 @@
+from google.api_core.exceptions import ResourceExhausted, DeadlineExceeded
 import google.generativeai as genai
 
 from tutor.model.language import LanguageModel
+from tutor.model.language.completion import Completion, Usage
+from tutor.model.language.errors import RateLimitError
+from tutor.util.deadline import current_deadline
 
 
 class GeminiLanguageModel(LanguageModel):
@@ -11,8 +15,28 @@ class GeminiLanguageModel(LanguageModel):
         self.max_new_tokens = max_new_tokens
         self._model = genai.GenerativeModel(model_name=self.model_name)
 
-    def prompt(self, prompt: str, temperature: float = 0.0) -> str | None:
+    def complete(self, prompt: str, temperature: float = 0.0) -> Completion | None:
+        deadline = current_deadline()
+        if deadline.expired:
+            return None
+        request_options = {}
+        if deadline.remaining() is not None:
+            request_options["timeout"] = deadline.remaining()
+
         genai.configure(api_key=self.api_key)
         config = genai.GenerationConfig(max_output_tokens=self.max_new_tokens, temperature=temperature)
-        response = self._model.generate_content(prompt, generation_config=config)
-        return response.text
+        try:
+            response = self._model.generate_content(prompt, generation_config=config, request_options=request_options)
+        except ResourceExhausted as e:
+            raise RateLimitError() from e
+        except DeadlineExceeded:
+            return None
+
+        usage = None
+        usage_metadata = getattr(response, "usage_metadata", None)
+        if usage_metadata is not None:
+            usage = Usage(
+                prompt_tokens=usage_metadata.prompt_token_count,
+                completion_tokens=usage_metadata.candidates_token_count,
+            )
+        return Completion(text=response.text, usage=usage, model_name=self.model_name)
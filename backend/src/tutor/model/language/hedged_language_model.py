@@ -0,0 +1,182 @@
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+import contextvars
+import logging
+import time
+from typing import Sequence, Final
+
+from tutor.model.language import LanguageModel
+from tutor.model.language.completion import Completion
+from tutor.model.language.errors import AdmissionRejectedError
+from tutor.model.language.usage_ledger import track_call
+from tutor.util.cancellation import CancellationToken, current_cancellation, cancellation_scope
+from tutor.util.deadline import current_deadline
+from tutor.util.metrics import RollingWindow
+
+DEFAULT_HEDGE_PERCENTILE: Final[float] = 95.0
+DEFAULT_HEDGE_DELAY: Final[float] = 5.0  # in seconds
+DEFAULT_MIN_SAMPLES: Final[int] = 20
+
+_logger = logging.getLogger(__name__)
+
+
+class HedgedLanguageModel(LanguageModel):
+    """
+    Composite language model that sends a prompt to an ordered list of backends.
+    The first backend is queried right away. Whenever the most recently started request takes longer than the
+    ``hedge_percentile`` of its backend's recent latencies, the next backend is queried in parallel (hedging).
+    A backend that fails or returns ``None`` is replaced by the next backend immediately (failover).
+    The first valid response wins; the cancellation tokens of the other requests are cancelled, which stops queued
+    requests and aborts running ones where the backend supports it. Abandoned requests that were already running are
+    recorded in the usage ledger of the current stage once they finish.
+    If every backend rejected the request for admission, the shortest ``AdmissionRejectedError`` is re-raised.
+    Backend requests run within the caller's context and give up once the current deadline has expired.
+    """
+
+    def __init__(
+        self,
+        backends: Sequence[LanguageModel],
+        hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        default_hedge_delay: float = DEFAULT_HEDGE_DELAY,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+        window_size: int = 256,
+        max_workers: int = 32,
+    ) -> None:
+        """
+        :param backends: The backends in order of preference.
+        :param hedge_percentile: The latency percentile of a backend after which the next backend is queried.
+        :param default_hedge_delay: The hedge delay in seconds used while a backend has too few latency samples.
+        :param min_samples: The number of latency samples required before the percentile is used.
+        :param window_size: The number of recent latencies tracked per backend.
+        :param max_workers: The maximum number of concurrently running backend requests.
+        """
+        if len(backends) == 0:
+            raise ValueError("At least one backend is required")
+        super().__init__()
+        self.backends = list(backends)
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_samples = min_samples
+        self.latencies = [RollingWindow(window_size) for _ in self.backends]
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedged-lm")
+
+    def hedge_delay(self, index: int) -> float:
+        """
+        :param index: The index of the backend.
+        :return: The time in seconds after which a request to the backend is hedged.
+        """
+        latencies = self.latencies[index]
+        if len(latencies) < self.min_samples:
+            return self.default_hedge_delay
+        return latencies.percentile(self.hedge_percentile)
+
+    def _timed_complete(
+        self,
+        index: int,
+        prompt: str,
+        temperature: float,
+        token: CancellationToken,
+    ) -> Completion | None:
+        if token.cancelled:
+            return None
+        start = time.perf_counter()
+        with cancellation_scope(token):
+            result = self.backends[index].complete(prompt, temperature)
+        if result is not None:
+            self.latencies[index].add(time.perf_counter() - start)
+        return result
+
+    def _abandon(self, future: Future, index: int, token: CancellationToken, started: float) -> None:
+        """
+        Stops waiting for a backend request and cancels it; if it is already running, it is recorded in the usage
+        ledger once it finishes, as it may consume tokens despite its cancellation.
+        """
+        token.cancel()
+        if future.cancel():
+            return
+        record = track_call(getattr(self.backends[index], "model_name", None), started)
+        if record is None:
+            return
+
+        def record_result(done: Future) -> None:
+            try:
+                record(done.result())
+            except Exception:
+                record(None)
+
+        future.add_done_callback(record_result)
+
+    def warmup(self) -> None:
+        for backend in self.backends:
+            backend.warmup()
+
+    def complete(self, prompt: str, temperature: float = 0.0) -> Completion | None:
+        deadline = current_deadline()
+        token = current_cancellation()
+        pending: dict[Future, int] = {}
+        tokens: dict[Future, CancellationToken] = {}
+        started: dict[Future, float] = {}
+        rejections: list[AdmissionRejectedError] = []
+        next_index = 0
+        hedge_at = 0.0
+
+        def launch() -> None:
+            nonlocal next_index, hedge_at
+            context = contextvars.copy_context()
+            backend_token = token.child()
+            future = self._executor.submit(context.run, self._timed_complete, next_index, prompt, temperature,
+                                           backend_token)
+            pending[future] = next_index
+            tokens[future] = backend_token
+            started[future] = time.perf_counter()
+            hedge_at = time.monotonic() + self.hedge_delay(next_index)
+            next_index += 1
+
+        launch()
+        while len(pending) > 0:
+            timeout = deadline.remaining()
+            can_hedge = next_index < len(self.backends)
+            if can_hedge:
+                hedge_timeout = max(0.0, hedge_at - time.monotonic())
+                if timeout is None or hedge_timeout < timeout:
+                    timeout = hedge_timeout
+                else:
+                    can_hedge = False
+
+            done, _ = wait((*pending, token.future()), timeout=timeout, return_when=FIRST_COMPLETED)
+            done = {future for future in done if future in pending}
+            if token.cancelled:
+                break
+            if len(done) == 0:
+                if not can_hedge:
+                    break
+                _logger.info(f"Hedging request to backend {next_index} of {type(self).__name__}")
+                launch()
+                continue
+
+            failed = 0
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    result = future.result()
+                except AdmissionRejectedError as e:
+                    rejections.append(e)
+                    result = None
+                except Exception as e:
+                    _logger.warning(f"Backend {index} of {type(self).__name__} failed: {e!r}")
+                    result = None
+
+                if result is not None:
+                    for loser, loser_index in pending.items():
+                        self._abandon(loser, loser_index, tokens[loser], started[loser])
+                    return result
+                failed += 1
+
+            # every failed backend is replaced right away, even while hedged requests are still running
+            for _ in range(min(failed, len(self.backends) - next_index)):
+                launch()
+
+        for loser, loser_index in pending.items():
+            self._abandon(loser, loser_index, tokens[loser], started[loser])
+        if len(rejections) == len(self.backends):
+            raise min(rejections, key=lambda r: r.retry_after)
+        return None
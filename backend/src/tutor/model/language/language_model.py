@@ -1,14 +1,32 @@
 from abc import ABC, abstractmethod
 
+from tutor.model.language.completion import Completion
+
 
 class LanguageModel(ABC):
 
     @abstractmethod
+    def complete(self, prompt: str, temperature: float = 0.0) -> Completion | None:
+        """
+        :return: The generated text together with the consumed tokens, or ``None`` if no text could be generated.
+        """
+        pass
+
     def prompt(self, prompt: str, temperature: float = 0.0) -> str | None:
+        completion = self.complete(prompt, temperature)
+        if completion is None:
+            return None
+        return completion.text
+
+    def warmup(self) -> None:
+        """
+        Runs the model on a short dummy prompt, so that the first request does not pay for loading kernels and sizing
+        allocators; by default nothing, e.g. for remote models.
+        """
         pass
 
 
 class NullLanguageModel(LanguageModel):
 
-    def prompt(self, prompt: str, temperature: float = 0.0) -> str | None:
-        return None
\ No newline at end of file
+    def complete(self, prompt: str, temperature: float = 0.0) -> Completion | None:
+        return None
@@ -1,7 +1,83 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import json
+import socket
+import threading
+from typing import Final
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 
 from tutor.model.language import LanguageModel
+from tutor.model.language.completion import Completion, Usage
+from tutor.model.language.errors import RateLimitError
+from tutor.util.cancellation import CancellationToken, current_cancellation, cancellation_scope
+from tutor.util.deadline import current_deadline
+
+RESPONSE_CHUNK_SIZE: Final[int] = 8192  # in bytes
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class _CancellableConnectionMixin:
+    """
+    Shuts the socket of a connection down once the cancellation token that was current when it connected is
+    cancelled, which unblocks a request waiting for the response right away.
+    """
+
+    def connect(self) -> None:
+        super().connect()
+        sock = self.sock
+
+        def shutdown() -> None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        current_cancellation().on_cancel(shutdown)
+
+
+class _CancellableHTTPConnection(_CancellableConnectionMixin, HTTPConnection):
+    pass
+
+
+class _CancellableHTTPSConnection(_CancellableConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _CancellableHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CancellableHTTPConnection
+
+
+class _CancellableHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CancellableHTTPSConnection
+
+
+class _CancellableAdapter(HTTPAdapter):
+    """
+    Transport adapter whose connections are aborted when the current cancellation token is cancelled.
+    """
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CancellableHTTPConnectionPool,
+            "https": _CancellableHTTPSConnectionPool,
+        }
 
 
 class LanguageModelEndpoint(LanguageModel):
@@ -13,12 +89,24 @@ class LanguageModelEndpoint(LanguageModel):
         self.bearer = bearer
 
     def prompt(
-        self, 
+        self,
         prompt: str,
-        temperature: float = 0.0, 
+        temperature: float = 0.0,
         add_headers: dict | None = None,
         add_payload: dict | None = None
     ) -> str | None:
+        completion = self.complete(prompt, temperature, add_headers, add_payload)
+        if completion is None:
+            return None
+        return completion.text
+
+    def complete(
+        self,
+        prompt: str,
+        temperature: float = 0.0,
+        add_headers: dict | None = None,
+        add_payload: dict | None = None
+    ) -> Completion | None:
 
         headers = {
             "Content-Type": "application/json",
@@ -38,9 +126,58 @@ class LanguageModelEndpoint(LanguageModel):
         if add_payload is not None:
             payload.update(add_payload)
 
-        response = requests.post(self.api_endpoint, headers=headers, data=json.dumps(payload))
+        deadline = current_deadline()
+        token = current_cancellation()
+        if deadline.expired or token.cancelled:
+            return None
+
+        # the connection of a superseded or late request is shut down, also while waiting for the response; its token
+        # only lives as long as this call, so that the shutdown callbacks are not kept by the request's token
+        request_token = CancellationToken()
+        unregister = token.on_cancel(request_token.cancel)
+        timer = None
+        if deadline.remaining() is not None:
+            timer = threading.Timer(deadline.remaining(), request_token.cancel)
+            timer.daemon = True
+            timer.start()
+        with requests.Session() as session, cancellation_scope(request_token):
+            session.mount("http://", _CancellableAdapter())
+            session.mount("https://", _CancellableAdapter())
+            try:
+                with session.post(self.api_endpoint, headers=headers, data=json.dumps(payload), stream=True,
+                                  timeout=deadline.remaining()) as response:
+                    body = bytearray()
+                    for chunk in response.iter_content(RESPONSE_CHUNK_SIZE):
+                        if request_token.cancelled:
+                            return None
+                        body.extend(chunk)
+            except requests.Timeout:
+                return None
+            except requests.RequestException:
+                if request_token.cancelled:
+                    return None
+                raise
+            finally:
+                unregister()
+                if timer is not None:
+                    timer.cancel()
+
+        # a late result of a superseded request is never used
+        if request_token.cancelled:
+            return None
 
         if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"]
+            data = json.loads(body)
+            usage = None
+            if data.get("usage") is not None:
+                usage = Usage(
+                    prompt_tokens=data["usage"].get("prompt_tokens", 0),
+                    completion_tokens=data["usage"].get("completion_tokens", 0),
+                )
+            text = data["choices"][0]["message"]["content"]
+            # the configured name, as the provider may report a more specific model version
+            return Completion(text=text, usage=usage, model_name=self.model_name)
+        if response.status_code == 429:
+            raise RateLimitError(_parse_retry_after(response.headers.get("Retry-After")))
 
         return None
@@ -1,7 +1,24 @@
 import torch
-from transformers import PreTrainedTokenizerFast, PreTrainedModel, AutoTokenizer, AutoModelForCausalLM
+from transformers import PreTrainedTokenizerFast, PreTrainedModel, AutoTokenizer, AutoModelForCausalLM, \
+    StoppingCriteria, StoppingCriteriaList
 
 from tutor.model.language import LanguageModel
+from tutor.model.language.completion import Completion, Usage
+from tutor.util.cancellation import CancellationToken, current_cancellation
+from tutor.util.deadline import current_deadline
+
+
+class CancellationStoppingCriteria(StoppingCriteria):
+    """
+    Stops the generation as soon as the given cancellation token is cancelled.
+    """
+
+    def __init__(self, token: CancellationToken) -> None:
+        super().__init__()
+        self.token = token
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        return torch.full((input_ids.shape[0],), self.token.cancelled, dtype=torch.bool, device=input_ids.device)
 
 
 class LocalLanguageModel(LanguageModel):
@@ -10,6 +27,7 @@ class LocalLanguageModel(LanguageModel):
         super().__init__()
         self.tokenizer = tokenizer
         self.model = model
+        self.model_name = getattr(model.config, "name_or_path", type(model).__name__)
         self.model_device = self._get_device(model)
         self.max_new_tokens = max_new_tokens
 
@@ -17,23 +35,44 @@ class LocalLanguageModel(LanguageModel):
     def _get_device(obj: PreTrainedTokenizerFast | PreTrainedModel) -> torch.device:
         return next(obj.parameters()).device
 
-    def prompt(self, prompt: str, temperature: float = 0.0) -> str | None:
+    def warmup(self, prompt: str = "Hello", max_new_tokens: int = 8) -> None:
+        input_t = self.tokenizer(prompt, return_tensors="pt")
+        with torch.inference_mode():
+            self.model.generate(
+                input_ids=input_t.input_ids.to(self.model_device),
+                attention_mask=input_t.attention_mask.to(self.model_device),
+                max_new_tokens=max_new_tokens,
+                pad_token_id=self.tokenizer.eos_token_id,
+            )
+
+    def complete(self, prompt: str, temperature: float = 0.0) -> Completion | None:
         tokenizer = self.tokenizer
         model = self.model
         model_device = self.model_device
 
+        deadline = current_deadline()
+        token = current_cancellation()
+        if deadline.expired or token.cancelled:
+            return None
+
         input_t = tokenizer(prompt, return_tensors="pt")
         input_ids = input_t.input_ids.to(model_device)
         attention_mask = input_t.attention_mask.to(model_device)
 
-        output_t = model.generate(
-            input_ids=input_ids,
-            attention_mask=attention_mask,
-            max_new_tokens=self.max_new_tokens,
-            pad_token_id=tokenizer.eos_token_id,
-            temperature=temperature,
-        )
+        with torch.inference_mode():
+            output_t = model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                max_new_tokens=self.max_new_tokens,
+                pad_token_id=tokenizer.eos_token_id,
+                temperature=temperature,
+                max_time=deadline.remaining(),
+                stopping_criteria=StoppingCriteriaList([CancellationStoppingCriteria(token)]),
+            )
+        if token.cancelled:
+            return None
 
         generated_ids = output_t[0][input_ids.shape[-1]:]
+        usage = Usage(prompt_tokens=input_ids.shape[-1], completion_tokens=generated_ids.shape[-1])
 
-        return tokenizer.decode(generated_ids)
+        return Completion(text=tokenizer.decode(generated_ids), usage=usage, model_name=self.model_name)
@@ -0,0 +1,143 @@
+from collections import deque
+import logging
+import threading
+import time
+from typing import Final
+
+from tutor.model.language import LanguageModel
+from tutor.model.language.completion import Completion
+from tutor.model.language.errors import RateLimitError, AdmissionRejectedError
+from tutor.util.deadline import current_deadline
+from tutor.util.token_bucket import TokenBucket
+
+CHARS_PER_TOKEN: Final[float] = 4.0
+DEFAULT_RETRY_AFTER: Final[float] = 5.0  # in seconds, used if a provider does not send a Retry-After value
+MIN_RATE_FRACTION: Final[float] = 0.1
+RATE_DECREASE_FACTOR: Final[float] = 0.5
+RATE_INCREASE_FRACTION: Final[float] = 0.05
+
+_logger = logging.getLogger(__name__)
+
+
+class RateLimitedLanguageModel(LanguageModel):
+    """
+    Wraps a language model backend with token-bucket rate limits in requests per minute and tokens per minute.
+    Requests that exceed the limits wait in a bounded FIFO queue until they can be sent or their maximum wait time
+    (or the current deadline) is exceeded. If the queue is full or the wait would exceed the maximum, an
+    ``AdmissionRejectedError`` is raised.
+    When the backend reports a rate limit (``RateLimitError``), the effective rate is halved and the limiter pauses
+    for the reported retry time; successful requests restore the configured rate step by step.
+    """
+
+    def __init__(
+        self,
+        model: LanguageModel,
+        requests_per_minute: float,
+        tokens_per_minute: float | None = None,
+        max_queue: int = 32,
+        max_wait: float = 30.0,
+        expected_new_tokens: int | None = None,
+    ) -> None:
+        """
+        :param model: The wrapped language model backend.
+        :param requests_per_minute: The maximum number of requests per minute.
+        :param tokens_per_minute: The maximum number of prompt and completion tokens per minute, if any.
+        :param max_queue: The maximum number of requests waiting for admission.
+        :param max_wait: The maximum time in seconds a request waits for admission.
+        :param expected_new_tokens: The number of completion tokens reserved per request. Defaults to the
+        ``max_new_tokens`` of the wrapped model, if it has one.
+        """
+        super().__init__()
+        self.model = model
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        if expected_new_tokens is None:
+            expected_new_tokens = getattr(model, "max_new_tokens", 512)
+        self.expected_new_tokens = expected_new_tokens
+
+        self._request_bucket = TokenBucket(requests_per_minute / 60.0, max(1.0, requests_per_minute / 60.0))
+        self._token_bucket = None
+        if tokens_per_minute is not None:
+            self._token_bucket = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute / 60.0)
+        self._rate_fraction = 1.0
+        self._condition = threading.Condition()
+        self._queue: deque[object] = deque()
+
+    def estimate_tokens(self, prompt: str) -> float:
+        return len(prompt) / CHARS_PER_TOKEN + self.expected_new_tokens
+
+    def _wait_time(self, tokens: float) -> float:
+        wait = self._request_bucket.wait_time(1.0)
+        if self._token_bucket is not None:
+            wait = max(wait, self._token_bucket.wait_time(tokens))
+        return wait
+
+    def _set_rate_fraction(self, fraction: float) -> None:
+        self._rate_fraction = min(1.0, max(MIN_RATE_FRACTION, fraction))
+        self._request_bucket.rate = self._rate_fraction * self.requests_per_minute / 60.0
+        if self._token_bucket is not None:
+            self._token_bucket.rate = self._rate_fraction * self.tokens_per_minute / 60.0
+
+    def _acquire(self, tokens: float, deadline: float) -> None:
+        ticket = object()
+        with self._condition:
+            if len(self._queue) >= self.max_queue:
+                raise AdmissionRejectedError(self._wait_time(tokens) + len(self._queue) / self._request_bucket.rate)
+            self._queue.append(ticket)
+            try:
+                while True:
+                    wait = self._wait_time(tokens) if self._queue[0] is ticket else None
+                    if wait == 0.0:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0.0 or (wait is not None and wait > remaining):
+                        raise AdmissionRejectedError(wait if wait is not None else self.max_wait)
+                    self._condition.wait(remaining if wait is None else wait)
+
+                self._request_bucket.consume(1.0)
+                if self._token_bucket is not None:
+                    self._token_bucket.consume(tokens)
+            finally:
+                self._queue.remove(ticket)
+                self._condition.notify_all()
+
+    def _on_rate_limited(self, retry_after: float | None) -> None:
+        with self._condition:
+            self._set_rate_fraction(self._rate_fraction * RATE_DECREASE_FACTOR)
+            self._request_bucket.pause(retry_after or DEFAULT_RETRY_AFTER)
+            if self._token_bucket is not None:
+                self._token_bucket.pause(retry_after or DEFAULT_RETRY_AFTER)
+        _logger.warning(f"Backend rate limited, reducing rate to {self._rate_fraction:.0%} of the configured rate")
+
+    def _on_success(self) -> None:
+        if self._rate_fraction < 1.0:
+            with self._condition:
+                self._set_rate_fraction(self._rate_fraction + RATE_INCREASE_FRACTION)
+
+    def _on_usage(self, completion: Completion | None, estimated_tokens: float) -> None:
+        # correct the token bucket by the difference between the reserved and the actually consumed tokens
+        if self._token_bucket is None or completion is None or completion.usage is None:
+            return
+        with self._condition:
+            self._token_bucket.consume(completion.usage.total_tokens - estimated_tokens)
+            self._condition.notify_all()
+
+    def warmup(self) -> None:
+        self.model.warmup()
+
+    def complete(self, prompt: str, temperature: float = 0.0) -> Completion | None:
+        deadline = current_deadline().earliest(self.max_wait).expires_at
+        tokens = self.estimate_tokens(prompt)
+
+        while True:
+            self._acquire(tokens, deadline)
+            try:
+                result = self.model.complete(prompt, temperature)
+            except RateLimitError as e:
+                self._on_rate_limited(e.retry_after)
+                continue
+            self._on_success()
+            self._on_usage(result, tokens)
+            return result
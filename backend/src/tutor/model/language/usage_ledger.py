@@ -0,0 +1,293 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+import json
+import logging
+from pathlib import Path
+import queue
+import threading
+import time
+from typing import Callable, Iterator, Union, Final
+
+from tutor.model.language import LanguageModel
+from tutor.model.language.completion import Completion
+from tutor.util.metrics import MetricsRegistry, METRICS
+
+TOKENS_PER_PRICE_UNIT: Final[int] = 1_000_000
+LEDGER_LOG_DROPPED_METRIC: Final[str] = "llm.ledger_log.dropped"
+
+_STOP: Final[object] = object()
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ModelPrice:
+    """
+    Price of a model in currency units per million tokens.
+    """
+    prompt: float
+    completion: float
+
+
+@dataclass
+class LedgerEntry:
+    stage: str
+    model_name: str | None
+    prompt_tokens: int
+    completion_tokens: int
+    latency: float  # in seconds
+    cost: float
+    failed: bool
+
+
+class UsageLedger:
+    """
+    Collects the tokens, latency and estimated cost of all language model calls of one request, per stage.
+    Calls that are still running when the request is answered, e.g. stages that ran out of time, are reported as
+    pending; once they finish, they are still added to the metrics registry the ledger was published to.
+    """
+
+    def __init__(self, prices: dict[str, ModelPrice] | None = None) -> None:
+        """
+        :param prices: The prices of models by the model name configured for them. Calls of models without price have
+        zero cost.
+        """
+        self.prices = {} if prices is None else prices
+        self.entries: list[LedgerEntry] = []
+        self._pending: dict[str, int] = {}
+        self._metrics: MetricsRegistry | None = None
+        self._lock = threading.Lock()
+
+    def start(self, stage: str) -> None:
+        """
+        Marks a call of the given stage as running until it is recorded.
+        """
+        with self._lock:
+            self._pending[stage] = self._pending.get(stage, 0) + 1
+
+    def record(self, stage: str, completion: Completion | None, latency: float, model_name: str | None = None) -> None:
+        """
+        :param model_name: The model name configured for the called model, which its price is looked up by; the name
+        in the completion is used if ``None``.
+        """
+        prompt_tokens = completion_tokens = 0
+        if completion is not None:
+            model_name = model_name or completion.model_name
+            if completion.usage is not None:
+                prompt_tokens = completion.usage.prompt_tokens
+                completion_tokens = completion.usage.completion_tokens
+
+        cost = 0.0
+        price = self.prices.get(model_name)
+        if price is not None:
+            cost = (prompt_tokens * price.prompt + completion_tokens * price.completion) / TOKENS_PER_PRICE_UNIT
+
+        entry = LedgerEntry(stage, model_name, prompt_tokens, completion_tokens, latency, cost, completion is None)
+        with self._lock:
+            self.entries.append(entry)
+            if self._pending.get(stage, 0) > 0:
+                self._pending[stage] -= 1
+            metrics = self._metrics
+        if metrics is not None:
+            # the call finished after the request was answered
+            self._publish_entry(entry, metrics)
+
+    def summary(self) -> dict[str, dict[str, int | float]]:
+        """
+        :return: The aggregated calls, tokens, latency (in milliseconds) and cost of each stage, and the number of its
+        calls that are still running, whose usage is not included yet.
+        """
+        result = {}
+        with self._lock:
+            entries = list(self.entries)
+            pending = {stage: count for stage, count in self._pending.items() if count > 0}
+
+        def stage_summary(name: str) -> dict[str, int | float]:
+            return result.setdefault(name, {
+                "calls": 0, "failedCalls": 0, "pendingCalls": 0, "promptTokens": 0, "completionTokens": 0,
+                "latencyMs": 0.0, "cost": 0.0,
+            })
+
+        for name, count in pending.items():
+            stage_summary(name)["pendingCalls"] = count
+        for entry in entries:
+            stage = stage_summary(entry.stage)
+            stage["calls"] += 1
+            stage["failedCalls"] += int(entry.failed)
+            stage["promptTokens"] += entry.prompt_tokens
+            stage["completionTokens"] += entry.completion_tokens
+            stage["latencyMs"] += entry.latency * 1000.0
+            stage["cost"] += entry.cost
+        return result
+
+    def publish(self, metrics: MetricsRegistry) -> None:
+        """
+        Adds the recorded calls to the counters and latency windows of the given metrics registry, and every call
+        recorded afterwards as soon as it is recorded.
+        """
+        with self._lock:
+            entries = list(self.entries)
+            self._metrics = metrics
+        for entry in entries:
+            self._publish_entry(entry, metrics)
+
+    @staticmethod
+    def _publish_entry(entry: LedgerEntry, metrics: MetricsRegistry) -> None:
+        prefix = f"llm.{entry.stage}"
+        metrics.counter(f"{prefix}.calls").increment()
+        metrics.counter(f"{prefix}.failed_calls").increment(int(entry.failed))
+        metrics.counter(f"{prefix}.prompt_tokens").increment(entry.prompt_tokens)
+        metrics.counter(f"{prefix}.completion_tokens").increment(entry.completion_tokens)
+        metrics.counter(f"{prefix}.cost").increment(entry.cost)
+        metrics.window(f"{prefix}.latency_ms").add(entry.latency * 1000.0)
+
+
+def load_prices(path: Union[str, Path]) -> dict[str, ModelPrice]:
+    """
+    Loads model prices from a JSON file that maps model names to ``{"prompt": ..., "completion": ...}`` prices
+    per million tokens.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {name: ModelPrice(float(price["prompt"]), float(price["completion"])) for name, price in data.items()}
+
+
+class LedgerLog:
+    """
+    Append-only log that stores one compact JSON line per request, mapping each stage to
+    ``[calls, prompt tokens, completion tokens, latency in ms, cost, pending calls]``.
+    ``write`` only queues the line; a background thread appends the queued lines to the file, which it keeps open, so
+    that requests never wait for the disk. Lines are dropped while the queue is full. ``close`` writes the remaining
+    lines, e.g. on shutdown.
+    """
+
+    def __init__(self, path: Union[str, Path], max_queue: int = 10000) -> None:
+        """
+        :param path: The file the lines are appended to.
+        :param max_queue: The maximum number of lines waiting to be written.
+        """
+        self.path = Path(path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name="ledger-log", daemon=True)
+        self._writer.start()
+
+    def write(self, ledger: UsageLedger, session_id: str | None = None) -> bool:
+        """
+        Queues the current usage of the ledger for writing.
+        :return: Whether the line was queued; ``False`` if it was dropped.
+        """
+        if self._closed:
+            return False
+        stages = {
+            stage: [s["calls"], s["promptTokens"], s["completionTokens"], round(s["latencyMs"], 1), round(s["cost"], 6),
+                    s["pendingCalls"]]
+            for stage, s in ledger.summary().items()
+        }
+        line = json.dumps({"t": round(time.time(), 3), "s": session_id, "stages": stages}, separators=(",", ":"))
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            METRICS.counter(LEDGER_LOG_DROPPED_METRIC).increment()
+            return False
+        return True
+
+    def flush(self) -> None:
+        """
+        Waits until all queued lines are written.
+        """
+        self._queue.join()
+
+    def close(self, timeout: float | None = 10.0) -> None:
+        """
+        Writes the queued lines and stops the writer. Lines written afterwards are dropped.
+        :param timeout: The maximum time in seconds to wait for the writer; unlimited if ``None``.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._writer.join(timeout)
+
+    def _run(self) -> None:
+        stopped = False
+        while not stopped:
+            items = [self._queue.get()]
+            # all lines queued by now are written at once
+            while items[-1] is not _STOP:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopped = items[-1] is _STOP
+            try:
+                self._file.write("".join(line + "\n" for line in items if line is not _STOP))
+                self._file.flush()
+            except OSError as e:
+                _logger.error(f"Failed to write {len(items)} ledger lines: {e!r}")
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+        self._file.close()
+
+
+_current_ledger: ContextVar[UsageLedger | None] = ContextVar("current_ledger", default=None)
+_current_stage: ContextVar[str | None] = ContextVar("current_stage", default=None)
+
+
+@contextmanager
+def ledger_scope(ledger: UsageLedger | None) -> Iterator[UsageLedger | None]:
+    """
+    Makes the given ledger record all language model calls made via ``prompt_with_ledger`` within the context.
+    """
+    token = _current_ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _current_ledger.reset(token)
+
+
+def track_call(model_name: str | None = None, started: float | None = None) -> Callable[[Completion | None], None] | None:
+    """
+    Tracks a further call of the current ``prompt_with_ledger`` stage in the ledger of the current context, e.g. a
+    hedged request that is abandoned but still running. The call is pending until its result is recorded.
+    :param model_name: The model name configured for the called model.
+    :param started: The ``time.perf_counter()`` value when the call started; now if ``None``.
+    :return: A function that records the result of the call, or ``None`` if there is no current ledger or stage.
+    """
+    ledger = _current_ledger.get()
+    stage = _current_stage.get()
+    if ledger is None or stage is None:
+        return None
+    start = time.perf_counter() if started is None else started
+    ledger.start(stage)
+
+    def record(completion: Completion | None) -> None:
+        ledger.record(stage, completion, time.perf_counter() - start, model_name)
+
+    return record
+
+
+def prompt_with_ledger(stage: str, model: LanguageModel, prompt: str, temperature: float = 0.0) -> str | None:
+    """
+    Prompts the given model and records the call in the ledger of the current context, if any.
+    The call is pending until it returns, so that a call which outlives its request is still accounted for.
+    """
+    ledger = _current_ledger.get()
+    if ledger is not None:
+        ledger.start(stage)
+    start = time.perf_counter()
+    completion = None
+    stage_token = _current_stage.set(stage)
+    try:
+        completion = model.complete(prompt, temperature)
+    finally:
+        _current_stage.reset(stage_token)
+        if ledger is not None:
+            ledger.record(stage, completion, time.perf_counter() - start, getattr(model, "model_name", None))
+
+    if completion is None:
+        return None
+    return completion.text
@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 from collections import defaultdict
 from datetime import timedelta
 from typing import Final, Sequence
+import json
 import re
 
 import numpy as np
@@ -50,6 +51,50 @@ This might help the tutor come up with a better response for the student.
 ### Response:
 """
 
+DESCRIPTION_QA_SYSTEM_PROMPT: Final[str] = f"""You are an educational assistant who interprets math tutoring conversations.
+Given a JSON-formatted conversation between a student and a teacher, solve the following two tasks.
+
+First, describe what the student's problem-solving notes would look like.
+Focus on the student, the tutor does not extend or edit the student's notes.
+Imagine and describe visuals such as number lines, equations, diagrams, or written steps.
+Use clear, specific language to explain what appears on a worksheet or whiteboard.
+Include numeric values, directional arrows, or other visual elements that correspond with the student’s reasoning.
+Focus only on the visual elements directly implied by the student's responses.
+Try to keep the description neutral, objective, and to a reasonable length, ideally fairly concise.
+You must not include the students name.
+Do not add a summery at the end.
+
+Second, look at your description and generate question-answer pairs that will help the teacher analyse the solution better.
+This might help the tutor come up with a better response for the student.
+
+Respond with a single JSON object and nothing else, using the following format:
+{{{{"description": "<the description as normal text without markup>", "qa_pairs": [{{{{"question": "<question>", "answer": "<answer>"}}}}]}}}}
+
+### Examples:
+Keep the descriptions in a format and length similar to the following example descriptions:
+{EXAMPLE_DESCRIPTIONS}
+
+### Input:
+{{}}
+"""
+
+SUMMARY_SYSTEM_PROMPT: Final[str] = """Below is an instruction that describes a task, paired with an input that provides further context. Write a response that appropriately completes the request.
+
+### Instruction:
+Summarize the beginning of a math tutoring conversation between a student and a teacher.
+Extend the previous summary, if given, with the new messages of the conversation.
+Keep the math problem, the student's solution steps, the mistakes made so far, and the hints the teacher gave.
+Do not use any markup like Markdown or LaTeX. Use at most {} words.
+
+### Previous Summary:
+{}
+
+### New Messages:
+{}
+
+### Summary:
+"""
+
 TUTOR_SYSTEM_PROMPT: Final[str] = """Below is an instruction that describes a task, paired with an input that provides further context. Write a response that appropriately completes the request.
 
 ### Instruction:
@@ -94,6 +139,7 @@ TUTOR_SYSTEM_PROMPT_RESPONSE: Final[str] = """### Tutors Response:
 """
 
 THOUGHTS_PATTERN: Final[re.Pattern] = re.compile(r"(<think>([^<]*</think>)?|(<think>[^<]*)?</think>)")
+JSON_OBJECT_PATTERN: Final[re.Pattern] = re.compile(r"\{.*}", re.DOTALL)
 
 
 class PromptGenerator(ABC):
@@ -106,6 +152,29 @@ class PromptGenerator(ABC):
     def generate_qa_prompt(self, conversation: Sequence[Message], description: str) -> str:
         pass
 
+    @abstractmethod
+    def generate_description_qa_prompt(self, conversation: Sequence[Message]) -> str:
+        """
+        Generates a prompt that asks for the description and the question-answer pairs in one response.
+        """
+        pass
+
+    @abstractmethod
+    def parse_description_qa_output(self, output: str) -> tuple[str, str] | None:
+        """
+        Parses the response to a prompt of ``generate_description_qa_prompt``.
+        :return: The description and the question-answer pairs, or ``None`` if the response cannot be parsed.
+        """
+        pass
+
+    @abstractmethod
+    def generate_summary_prompt(self, previous_summary: str | None, conversation: Sequence[Message],
+                                max_words: int) -> str:
+        """
+        Generates a prompt that folds the given messages into the previous summary of the conversation.
+        """
+        pass
+
     @abstractmethod
     def generate_tutor_prompt(
             self,
@@ -140,6 +209,34 @@ class BasicPromptGenerator(PromptGenerator):
         conv_json_str = self.make_conversation_json(conversation)
         return QA_SYSTEM_PROMPT.format(conv_json_str, description)
 
+    def generate_description_qa_prompt(self, conversation: Sequence[Message]) -> str:
+        conv_json_str = self.make_conversation_json(conversation)
+        return DESCRIPTION_QA_SYSTEM_PROMPT.format(conv_json_str)
+
+    def parse_description_qa_output(self, output: str) -> tuple[str, str] | None:
+        if output is None:
+            return None
+        output = THOUGHTS_PATTERN.sub("", output)
+        match = JSON_OBJECT_PATTERN.search(output)
+        if match is None:
+            return None
+
+        try:
+            data = json.loads(match.group(0))
+            description = data["description"]
+            qa_pairs = "\n".join(f"Q: {qa['question']}\nA: {qa['answer']}" for qa in data["qa_pairs"])
+        except (json.decoder.JSONDecodeError, KeyError, TypeError):
+            return None
+
+        if not isinstance(description, str) or not description.strip() or not qa_pairs:
+            return None
+        return description.strip(), qa_pairs
+
+    def generate_summary_prompt(self, previous_summary: str | None, conversation: Sequence[Message],
+                                max_words: int) -> str:
+        conv_json_str = self.make_conversation_json(conversation)
+        return SUMMARY_SYSTEM_PROMPT.format(max_words, previous_summary or "None", conv_json_str)
+
     def generate_tutor_prompt(
             self,
             conversation: Sequence[Message],
@@ -0,0 +1,301 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import gc
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Final, Iterator, Sequence
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from tutor.model.emotion import EmotionModel, SentimentRating
+from tutor.model.language import LanguageModel, Completion
+from tutor.util.metrics import METRICS
+
+_logger = logging.getLogger(__name__)
+
+RESIDENT_BYTES_METRIC: Final[str] = "models.resident_bytes"
+OVER_BUDGET_METRIC: Final[str] = "models.over_budget_loads"
+
+_WEIGHT_SUFFIXES: Final[tuple[tuple[str, ...], ...]] = ((".safetensors",), (".bin", ".pt", ".pth"))
+
+
+def model_memory_bytes(model: Any, max_depth: int = 3) -> int:
+    """
+    Estimates the memory a model occupies as the size of the parameters and buffers of the torch modules it holds,
+    e.g. the ``model`` of a ``LocalLanguageModel``. Tensors shared between modules are counted once.
+    """
+    modules: list[nn.Module] = []
+
+    def find_modules(obj: Any, depth: int) -> None:
+        if isinstance(obj, nn.Module):
+            modules.append(obj)
+        elif isinstance(obj, (list, tuple)):
+            for item in obj:
+                find_modules(item, depth)
+        elif depth > 0 and hasattr(obj, "__dict__"):
+            for value in vars(obj).values():
+                find_modules(value, depth - 1)
+
+    find_modules(model, max_depth)
+    seen = set()
+    total = 0
+    for module in modules:
+        for tensor in (*module.parameters(), *module.buffers()):
+            if tensor.is_meta:
+                continue
+            key = (tensor.device, tensor.data_ptr())
+            if key in seen:
+                continue
+            seen.add(key)
+            total += tensor.nelement() * tensor.element_size()
+    return total
+
+
+def model_file_bytes(directory: str) -> int | None:
+    """
+    Estimates the memory of a model from the size of the weight files in its directory, the safetensors files if there
+    are any, otherwise the PyTorch files.
+    :return: The size of the weight files in bytes, or ``None`` if the directory has none.
+    """
+    if not os.path.isdir(directory):
+        return None
+    for suffixes in _WEIGHT_SUFFIXES:
+        sizes = [entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith(suffixes)]
+        if sizes:
+            return sum(sizes)
+    return None
+
+
+@dataclass
+class _Entry:
+    loader: Callable[[], Any]
+    memory_bytes: int = 0
+    model: Any = None
+    in_use: int = 0
+    last_used: float = 0.0
+    load_lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class ModelRegistry:
+    """
+    Keeps local models resident within a global memory budget.
+    Models are loaded on their first use and unloaded when they were idle for ``idle_timeout`` seconds, or, least
+    recently used first, when loading another model would exceed the budget. As long as the memory of a model is
+    unknown, all idle models are unloaded before it is loaded. Models in use are never unloaded; if they alone exceed
+    the budget, the model is loaded anyway and the load is counted as over budget.
+    Loads, unloads, load times and resident memory in bytes are published per model, and the resident memory of all
+    models in total.
+    """
+
+    def __init__(self, memory_budget: int, idle_timeout: float | None = None) -> None:
+        """
+        :param memory_budget: The memory in bytes that all resident models may occupy together.
+        :param idle_timeout: The time in seconds after which an unused model is unloaded; never if ``None``.
+        """
+        self.memory_budget = memory_budget
+        self.idle_timeout = idle_timeout
+        self._entries: dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        if idle_timeout is not None:
+            threading.Thread(target=self._unload_idle_loop, name="model-registry", daemon=True).start()
+
+    def register(self, name: str, loader: Callable[[], Any], memory_bytes: int | None = None) -> None:
+        """
+        :param name: The name of the model, which its metrics are published under.
+        :param loader: Loads the model.
+        :param memory_bytes: The expected memory of the model, to make room before its first load; if ``None``, all idle
+        models are unloaded before its first load. It is measured after every load.
+        """
+        with self._lock:
+            if name in self._entries:
+                raise ValueError(f"Model '{name}' is already registered")
+            self._entries[name] = _Entry(loader, memory_bytes or 0)
+
+    @property
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return self._resident_bytes()
+
+    def _resident_bytes(self) -> int:
+        return sum(entry.memory_bytes for entry in self._entries.values() if entry.model is not None)
+
+    def is_loaded(self, name: str) -> bool:
+        with self._lock:
+            return self._entries[name].model is not None
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[Any]:
+        """
+        Provides the model, loading it if necessary. The model is not unloaded while it is in use.
+        """
+        entry = self._entries[name]
+        with self._lock:
+            entry.in_use += 1
+        try:
+            model = entry.model
+            if model is None:
+                # concurrent first uses wait for a single load
+                with entry.load_lock:
+                    model = entry.model if entry.model is not None else self._load(name, entry)
+            yield model
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+
+    def _load(self, name: str, entry: _Entry) -> Any:
+        # without an estimate, all idle models make room, so that the model is never loaded on top of them
+        self._make_room(entry.memory_bytes if entry.memory_bytes > 0 else None, exclude=name)
+
+        start = time.perf_counter()
+        model = entry.loader()
+        load_ms = (time.perf_counter() - start) * 1000.0
+        measured = model_memory_bytes(model)
+
+        with self._lock:
+            if measured > 0:
+                entry.memory_bytes = measured
+            entry.model = model
+            entry.last_used = time.monotonic()
+        METRICS.counter(f"models.{name}.loads").increment()
+        METRICS.window(f"models.{name}.load_ms").add(load_ms)
+        METRICS.gauge(f"models.{name}.resident_bytes").set(entry.memory_bytes)
+        METRICS.gauge(RESIDENT_BYTES_METRIC).set(self.resident_bytes)
+        _logger.info(f"Loaded model {name} ({entry.memory_bytes / 2 ** 20:.0f} MiB) in {load_ms:.0f}ms")
+
+        # the estimate may have been too low
+        self._make_room(0, exclude=name)
+        return model
+
+    def _make_room(self, required: int | None, exclude: str) -> None:
+        """
+        :param required: The memory in bytes to make room for; all idle models are unloaded if ``None``.
+        """
+        with self._lock:
+            resident = self._resident_bytes()
+            if required is not None and resident + required <= self.memory_budget:
+                return
+            candidates = sorted(
+                (entry.last_used, name) for name, entry in self._entries.items()
+                if name != exclude and entry.model is not None and entry.in_use == 0
+            )
+            evicted = []
+            for _, name in candidates:
+                if required is not None and resident + required <= self.memory_budget:
+                    break
+                resident -= self._entries[name].memory_bytes
+                evicted.append(name)
+            for name in evicted:
+                self._entries[name].model = None
+            # with an unknown requirement, the measurement after the load tells whether the budget is exceeded
+            over_budget = required is not None and resident + required > self.memory_budget
+
+        if over_budget:
+            METRICS.counter(OVER_BUDGET_METRIC).increment()
+            _logger.warning(f"Models in use exceed the memory budget of {self.memory_budget / 2 ** 20:.0f} MiB")
+        self._after_unload(evicted)
+
+    def unload(self, name: str) -> bool:
+        """
+        Unloads the model unless it is in use.
+        :return: Whether the model was unloaded.
+        """
+        with self._lock:
+            entry = self._entries[name]
+            if entry.model is None or entry.in_use > 0:
+                return False
+            entry.model = None
+        self._after_unload([name])
+        return True
+
+    def unload_idle(self) -> list[str]:
+        """
+        Unloads the models that were not used within the idle timeout.
+        :return: The names of the unloaded models.
+        """
+        if self.idle_timeout is None:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                name for name, entry in self._entries.items()
+                if entry.model is not None and entry.in_use == 0 and now - entry.last_used >= self.idle_timeout
+            ]
+            for name in idle:
+                self._entries[name].model = None
+        self._after_unload(idle)
+        return idle
+
+    def _after_unload(self, names: Sequence[str]) -> None:
+        for name in names:
+            METRICS.counter(f"models.{name}.unloads").increment()
+            METRICS.gauge(f"models.{name}.resident_bytes").set(0)
+            _logger.info(f"Unloaded model {name}")
+        if names:
+            # release the memory of the dropped models right away
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        METRICS.gauge(RESIDENT_BYTES_METRIC).set(self.resident_bytes)
+
+    def _unload_idle_loop(self) -> None:
+        interval = max(1.0, self.idle_timeout / 4)
+        while not self._closed.wait(interval):
+            self.unload_idle()
+
+    def close(self) -> None:
+        """
+        Stops unloading idle models.
+        """
+        self._closed.set()
+
+
+class ManagedLanguageModel(LanguageModel):
+    """
+    Language model of a ``ModelRegistry``, which is loaded on demand and may be unloaded between requests.
+    """
+
+    def __init__(self, registry: ModelRegistry, name: str) -> None:
+        super().__init__()
+        self.registry = registry
+        self.name = name
+
+    def complete(self, prompt: str, temperature: float = 0.0) -> Completion | None:
+        with self.registry.use(self.name) as model:
+            return model.complete(prompt, temperature)
+
+    def warmup(self) -> None:
+        # warming up would load the model at startup, which is what the registry avoids
+        pass
+
+
+class ManagedEmotionModel(EmotionModel):
+    """
+    Sentiment model of a ``ModelRegistry``, which is loaded on demand and may be unloaded between requests.
+    """
+
+    def __init__(self, registry: ModelRegistry, name: str) -> None:
+        super().__init__()
+        self.registry = registry
+        self.name = name
+
+    def analyze(self, sentence: str) -> SentimentRating | None:
+        with self.registry.use(self.name) as model:
+            return model.analyze(sentence)
+
+    def analyze_batch(self, sentences: Sequence[str]) -> list[SentimentRating | None]:
+        with self.registry.use(self.name) as model:
+            return model.analyze_batch(sentences)
+
+    def analyze_with_embedding(self, sentence: str) -> tuple[SentimentRating | None, np.ndarray | None]:
+        with self.registry.use(self.name) as model:
+            return model.analyze_with_embedding(sentence)
+
+    def embed(self, sentence: str) -> np.ndarray | None:
+        with self.registry.use(self.name) as model:
+            return model.embed(sentence)
@@ -0,0 +1,275 @@
+from collections import OrderedDict, defaultdict
+import hashlib
+import logging
+import threading
+import time
+from typing import Final, Generic, Literal, Sequence, TypeVar
+
+import numpy as np
+
+from tutor.model.emotion import EmotionModel
+from tutor.model.language import Message
+from tutor.util.metrics import METRICS
+
+_V = TypeVar("_V")
+
+_logger = logging.getLogger(__name__)
+
+Eviction = Literal["lru", "fifo"]
+
+HITS_METRIC: Final[str] = "hits"
+MISSES_METRIC: Final[str] = "misses"
+EVICTIONS_METRIC: Final[str] = "evictions"
+HIT_SIMILARITY_METRIC: Final[str] = "hit_similarity"
+MISS_SIMILARITY_METRIC: Final[str] = "miss_similarity"
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray | None:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vector))
+    if norm == 0.0 or not np.isfinite(norm):
+        return None
+    return vector / norm
+
+
+class HyperplaneIndex:
+    """
+    Approximate nearest-neighbour index of unit vectors by random-hyperplane locality-sensitive hashing.
+    Each table hashes a vector to the signs of its projections onto ``num_bits`` random hyperplanes, so vectors with a
+    high cosine similarity likely share a bucket in at least one of the ``num_tables`` tables. Only the vectors sharing
+    a bucket with a query are compared with it exactly.
+    """
+
+    def __init__(self, dim: int, num_bits: int = 12, num_tables: int = 4, seed: int = 0) -> None:
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((num_tables, num_bits, dim)).astype(np.float32)
+        self._bit_values = 1 << np.arange(num_bits, dtype=np.int64)
+        self._tables: list[defaultdict[int, set[int]]] = [defaultdict(set) for _ in range(num_tables)]
+        self._buckets: dict[int, np.ndarray] = {}
+
+    def _hash(self, vector: np.ndarray) -> np.ndarray:
+        return ((self._planes @ vector) > 0).astype(np.int64) @ self._bit_values
+
+    def add(self, slot: int, vector: np.ndarray) -> None:
+        buckets = self._hash(vector)
+        for table, bucket in zip(self._tables, buckets.tolist()):
+            table[bucket].add(slot)
+        self._buckets[slot] = buckets
+
+    def remove(self, slot: int) -> None:
+        buckets = self._buckets.pop(slot, None)
+        if buckets is None:
+            return
+        for table, bucket in zip(self._tables, buckets.tolist()):
+            table[bucket].discard(slot)
+            if not table[bucket]:
+                del table[bucket]
+
+    def candidates(self, vector: np.ndarray) -> np.ndarray:
+        slots = set()
+        for table, bucket in zip(self._tables, self._hash(vector).tolist()):
+            slots.update(table.get(bucket, ()))
+        return np.fromiter(slots, dtype=np.int64, count=len(slots))
+
+
+class SemanticIndex(Generic[_V]):
+    """
+    Bounded store of values keyed by embeddings, which returns the value of the most similar embedding if its cosine
+    similarity reaches the threshold.
+    By default, every stored embedding is compared with the query in one matrix product; an approximate index only
+    compares the embeddings that share a hash bucket with the query, which scales to larger capacities at the risk
+    of missing a neighbour.
+    Hits, misses and evictions are counted, and the similarity of hits and of the nearest neighbour of misses is
+    recorded, to judge whether the threshold is too loose or too strict.
+    """
+
+    def __init__(
+            self,
+            capacity: int = 4096,
+            threshold: float = 0.95,
+            eviction: Eviction = "lru",
+            approximate: bool = False,
+            metrics_prefix: str = "semantic_cache",
+    ) -> None:
+        """
+        :param capacity: The maximum number of stored values.
+        :param threshold: The minimum cosine similarity of a stored embedding to the query to reuse its value.
+        :param eviction: Which value a full index replaces: the least recently used (``"lru"``) or the oldest
+        (``"fifo"``).
+        :param approximate: Whether candidates are preselected by locality-sensitive hashing.
+        :param metrics_prefix: The prefix of the published metrics.
+        """
+        if eviction not in ("lru", "fifo"):
+            raise ValueError(f"Unknown eviction policy '{eviction}'")
+        self.capacity = capacity
+        self.threshold = threshold
+        self.eviction = eviction
+        self.approximate = approximate
+        self.metrics_prefix = metrics_prefix
+        self._vectors: np.ndarray | None = None
+        self._values: list[_V | None] = [None] * capacity
+        self._occupied = np.zeros(capacity, dtype=bool)
+        self._added = np.zeros(capacity, dtype=np.float64)
+        self._used = np.zeros(capacity, dtype=np.float64)
+        self._hits = np.zeros(capacity, dtype=np.int64)
+        self._index: HyperplaneIndex | None = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return int(self._occupied.sum())
+
+    def _metric(self, name: str) -> str:
+        return f"{self.metrics_prefix}.{name}"
+
+    def _nearest(self, vector: np.ndarray) -> tuple[int, float] | None:
+        if self._index is not None:
+            slots = self._index.candidates(vector)
+        else:
+            slots = np.flatnonzero(self._occupied)
+        if len(slots) == 0:
+            return None
+        similarities = self._vectors[slots] @ vector
+        best = int(np.argmax(similarities))
+        return int(slots[best]), float(similarities[best])
+
+    def search(self, embedding: np.ndarray) -> tuple[_V, float] | None:
+        """
+        :return: The value of the most similar stored embedding and its similarity, or ``None`` if no stored embedding
+        is similar enough.
+        """
+        vector = _normalize(embedding)
+        if vector is None:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            nearest = None if self._vectors is None else self._nearest(vector)
+            if nearest is None or nearest[1] < self.threshold:
+                METRICS.counter(self._metric(MISSES_METRIC)).increment()
+                if nearest is not None:
+                    METRICS.window(self._metric(MISS_SIMILARITY_METRIC)).add(nearest[1])
+                return None
+
+            slot, similarity = nearest
+            self._used[slot] = now
+            self._hits[slot] += 1
+            value, age, hits = self._values[slot], now - self._added[slot], int(self._hits[slot])
+
+        METRICS.counter(self._metric(HITS_METRIC)).increment()
+        METRICS.window(self._metric(HIT_SIMILARITY_METRIC)).add(similarity)
+        _logger.info(f"{self.metrics_prefix} hit with similarity {similarity:.4f} to an entry of age {age:.0f}s "
+                     f"and {hits} hits")
+        return value, similarity
+
+    def add(self, embedding: np.ndarray, value: _V) -> None:
+        vector = _normalize(embedding)
+        if vector is None:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, len(vector)), dtype=np.float32)
+                if self.approximate:
+                    self._index = HyperplaneIndex(len(vector))
+
+            free = np.flatnonzero(~self._occupied)
+            if len(free) > 0:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._used if self.eviction == "lru" else self._added))
+                if self._index is not None:
+                    self._index.remove(slot)
+                METRICS.counter(self._metric(EVICTIONS_METRIC)).increment()
+
+            self._vectors[slot] = vector
+            self._values[slot] = value
+            self._occupied[slot] = True
+            self._added[slot] = now
+            self._used[slot] = now
+            self._hits[slot] = 0
+            if self._index is not None:
+                self._index.add(slot, vector)
+
+
+class ConversationCache(Generic[_V]):
+    """
+    Reuses values derived from a conversation, e.g. its description and question-answer pairs, for conversations
+    that are semantically close to an earlier one.
+    A conversation is embedded as the mean embedding of its messages joined with the embedding of its last message,
+    so conversations about the same problem that end with a similar student turn are close. The messages are embedded
+    with the sentiment model, whose embedding of the latest student message is passed on by the sentiment stage, and
+    the embeddings of messages are memoized, so each message is encoded at most once.
+    """
+
+    def __init__(self, embedding_model: EmotionModel, index: SemanticIndex[_V], memo_size: int = 4096) -> None:
+        """
+        :param embedding_model: The model embedding the messages, usually the sentiment model.
+        :param index: The index of the cached values.
+        :param memo_size: The maximum number of memoized message embeddings.
+        """
+        self.embedding_model = embedding_model
+        self.index = index
+        self.memo_size = memo_size
+        self._memo: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _memo_key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def remember_embedding(self, text: str, embedding: np.ndarray) -> None:
+        """
+        Memoizes an embedding of the text that was computed anyway, e.g. while analyzing its sentiment.
+        """
+        with self._lock:
+            self._memo[self._memo_key(text)] = embedding
+            self._memo.move_to_end(self._memo_key(text))
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    def _message_embedding(self, text: str) -> np.ndarray | None:
+        key = self._memo_key(text)
+        with self._lock:
+            embedding = self._memo.get(key)
+            if embedding is not None:
+                self._memo.move_to_end(key)
+                return embedding
+        embedding = self.embedding_model.embed(text)
+        if embedding is not None:
+            self.remember_embedding(text, embedding)
+        return embedding
+
+    def embed(self, conversation: Sequence[Message]) -> np.ndarray | None:
+        """
+        :return: The embedding of the conversation, or ``None`` if it is empty or a message could not be embedded.
+        """
+        vectors = []
+        for message in conversation:
+            if not message.content.strip():
+                continue
+            embedding = self._message_embedding(message.content)
+            if embedding is None:
+                return None
+            vector = _normalize(embedding)
+            if vector is not None:
+                vectors.append(vector)
+        if not vectors:
+            return None
+        mean = _normalize(np.mean(vectors, axis=0))
+        if mean is None:
+            return None
+        return np.concatenate([mean, vectors[-1]])
+
+    def lookup(self, conversation: Sequence[Message]) -> tuple[np.ndarray | None, tuple[_V, float] | None]:
+        """
+        :return: The embedding of the conversation, to store a value under on a miss, and the cached value with its
+        similarity, or ``None`` on a miss.
+        """
+        embedding = self.embed(conversation)
+        if embedding is None:
+            return None, None
+        return embedding, self.index.search(embedding)
+
+    def store(self, embedding: np.ndarray, value: _V) -> None:
+        self.index.add(embedding, value)
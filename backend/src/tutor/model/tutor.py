@@ -1,19 +1,95 @@
 import random
 from abc import ABC, abstractmethod
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import contextvars
 from datetime import timedelta
-from typing import Sequence, Final
+import threading
+from typing import Sequence, Final, Callable, TypeVar
 
 import numpy as np
 from PIL import Image
 from scipy.special import softmax
-from tutor.model import PromptGenerator
+from tutor.model import PromptGenerator, ConversationWindow, ConversationCache
 from tutor.model.emotion import EmotionModel, Sentiment, FaceEmotionRating, SentimentRating, FaceEmotionModel, Emotion
-from tutor.model.language import LanguageModel, Message
+from tutor.model.language import LanguageModel, Message, AdmissionRejectedError, prompt_with_ledger
+from tutor.util.cancellation import current_cancellation, cancellation_scope, RequestCancelledError
+from tutor.util.deadline import Deadline, DeadlineExceededError, deadline_scope
+from tutor.util.metrics import METRICS
+from tutor.util.warmup import warm_up
 
+_T = TypeVar("_T")
 
 FACE_EMOTION_HALF_LIFE: Final[float] = 120.0  # in seconds
 
+SENTIMENT_STAGE: Final[str] = "sentiment"
+DESCRIPTION_STAGE: Final[str] = "description"
+QA_STAGE: Final[str] = "qa"
+DESCRIPTION_QA_STAGE: Final[str] = "descriptionQa"
+DESCRIPTION_QA_CACHE_STAGE: Final[str] = "descriptionQaCache"
+SUMMARY_STAGE: Final[str] = "summary"
+TUTOR_STAGE: Final[str] = "tutor"
+FACE_EMOTION_STAGE: Final[str] = "face_emotion"  # only used to report the warmup
+
+# fraction of the remaining request budget that an optional stage may use when it starts
+DEFAULT_STAGE_SHARES: Final[dict[str, float]] = {
+    SENTIMENT_STAGE: 0.1,
+    DESCRIPTION_STAGE: 0.3,
+    QA_STAGE: 0.4,
+    DESCRIPTION_QA_STAGE: 0.5,
+    DESCRIPTION_QA_CACHE_STAGE: 0.1,
+    SUMMARY_STAGE: 0.2,
+}
+MIN_STAGE_TIME: Final[float] = 0.05  # in seconds, optional stages with less time are skipped
+DEFAULT_MAX_STAGE_WORKERS: Final[int] = 16
+STAGE_RETRY_AFTER: Final[float] = 1.0  # in seconds, suggested to clients if all stage workers are busy
+
+SKIPPED_STAGES_METRIC: Final[str] = "tutor.cancelled.skipped_stages"
+ABORTED_STAGES_METRIC: Final[str] = "tutor.cancelled.aborted_stages"
+FUSED_PARSE_FAILURES_METRIC: Final[str] = "tutor.fused_description_qa.parse_failures"
+REJECTED_STAGES_METRIC: Final[str] = "tutor.rejected_stages"
+DEADLINE_EXCEEDED_METRIC: Final[str] = "tutor.deadline_exceeded"
+
+
+def aggregate_face_emotions(msg_face_emotions: Sequence[FaceEmotionRating]) -> tuple[Sentiment, float] | None:
+    """
+    Aggregates the face emotions of a message into one sentiment, weighting each emotion by the time until the next
+    one with a decay of older emotions.
+    :param msg_face_emotions: The face emotions, sorted by their timestamps.
+    :return: The sentiment and its confidence, or ``None`` if there are no face emotions.
+    """
+    if len(msg_face_emotions) == 0:
+        return None
+
+    now = msg_face_emotions[-1].timestamp + timedelta(seconds=0.25)
+    end_times = [fe.timestamp for fe in msg_face_emotions[1:]]
+    end_times.append(now)
+
+    # aggregate the emotions based on their timeframe with time based decay
+    decay_scores = defaultdict(float)
+
+    for face_emotion, end_time in zip(msg_face_emotions, end_times):
+        start_time = face_emotion.timestamp
+        duration_seconds = (end_time - start_time).total_seconds()
+        age_seconds = (now - end_time).total_seconds()
+        decay_weight = np.exp(-age_seconds * 0.693 / FACE_EMOTION_HALF_LIFE)
+        weighted_duration = duration_seconds * decay_weight
+
+        # map emotions to their sentiment for scoring
+        decay_scores[face_emotion.emotion.to_sentiment()] += weighted_duration
+
+    keys = []
+    scores = []
+    for k, v in decay_scores.items():
+        keys.append(k)
+        scores.append(v)
+    confidences = softmax(scores)
+    decay_confidences = {k: v for k, v in zip(keys, confidences)}
+    max_key = max(decay_confidences, key=decay_confidences.get)
+
+    return max_key, decay_confidences[max_key]
+
+
 class Tutor(ABC):
 
     @abstractmethod
@@ -21,7 +97,9 @@ class Tutor(ABC):
         self,
         conversation: Sequence[Message],
         use_emotion: bool = True,
-        face_emotions: Sequence[FaceEmotionRating] | None = None
+        face_emotions: Sequence[FaceEmotionRating] | None = None,
+        deadline: Deadline | None = None,
+        session_id: str | None = None,
     ) -> str:
         pass
 
@@ -29,6 +107,19 @@ class Tutor(ABC):
     def predict_face_emotion(self, image: Image) -> tuple[Emotion, float]:
         pass
 
+    def predict_face_emotions(self, images: Sequence[Image]) -> list[tuple[Emotion, float]]:
+        """
+        Predicts the face emotions of many frames; by default one frame at a time.
+        """
+        return [self.predict_face_emotion(image) for image in images]
+
+    def warmup(self, repeats: int = 3) -> None:
+        """
+        Runs the local models on representative dummy inputs before the first request; by default nothing.
+        :param repeats: The number of warmup runs per model, of which the first one is reported as cold start.
+        """
+        pass
+
 
 class ReturnPromptTutor(Tutor):
 
@@ -38,12 +129,34 @@ class ReturnPromptTutor(Tutor):
                  sentiment_model: EmotionModel | None = None,
                  desc_model: LanguageModel | None = None,
                  qa_model: LanguageModel | None = None,
+                 stage_shares: dict[str, float] | None = None,
+                 fused_desc_qa: bool = False,
+                 conversation_window: ConversationWindow | None = None,
+                 desc_qa_cache: ConversationCache[tuple[str, str]] | None = None,
+                 max_stage_workers: int = DEFAULT_MAX_STAGE_WORKERS,
                  ) -> None:
+        """
+        :param fused_desc_qa: Whether the description and the question-answer pairs should be generated with a single
+        call of the description model. If its response cannot be parsed, the two models are called one after another;
+        if it does not arrive in time, the description and the question-answer pairs are dropped.
+        :param conversation_window: Bounds the conversation embedded into the prompts, if given.
+        :param desc_qa_cache: Reuses the description and question-answer pairs of semantically similar earlier
+        conversations instead of generating them, if given.
+        :param max_stage_workers: The maximum number of stages running at once, including stages whose results were
+        abandoned after their deadline but that have not stopped yet. Further stages are rejected.
+        """
         self.prompt_generator = prompt_generator
         self.face_emotion_model = face_emotion_model
         self._sentiment_model = sentiment_model
         self._desc_model = desc_model
         self._qa_model = qa_model
+        self.stage_shares = DEFAULT_STAGE_SHARES if stage_shares is None else stage_shares
+        self.fused_desc_qa = fused_desc_qa
+        self.conversation_window = conversation_window
+        self.desc_qa_cache = desc_qa_cache
+        self._stage_executor = ThreadPoolExecutor(max_workers=max_stage_workers, thread_name_prefix="tutor-stage")
+        # counts queued stages too, so that abandoned stages cannot pile up in the executor's queue
+        self._stage_slots = threading.BoundedSemaphore(max_stage_workers)
 
     @staticmethod
     def _agg_text_emotions(sentiment_rating: SentimentRating) -> tuple[Sentiment, float]:
@@ -63,37 +176,7 @@ class ReturnPromptTutor(Tutor):
 
     @staticmethod
     def _agg_face_emotions(msg_face_emotions: Sequence[FaceEmotionRating]) -> tuple[Sentiment, float] | None:
-        # aggregate all face emotions into one sentiment-confidence tuple
-        if len(msg_face_emotions) == 0:
-            return None
-
-        now = msg_face_emotions[-1].timestamp + timedelta(seconds=0.25)
-        end_times = [fe.timestamp for fe in msg_face_emotions[1:]]
-        end_times.append(now)
-
-        # aggregate the emotions based on their timeframe with time based decay
-        decay_scores = defaultdict(float)
-
-        for face_emotion, end_time in zip(msg_face_emotions, end_times):
-            start_time = face_emotion.timestamp
-            duration_seconds = (end_time - start_time).total_seconds()
-            age_seconds = (now - end_time).total_seconds()
-            decay_weight = np.exp(-age_seconds * 0.693 / FACE_EMOTION_HALF_LIFE)
-            weighted_duration = duration_seconds * decay_weight
-
-            # map emotions to their sentiment for scoring
-            decay_scores[face_emotion.emotion.to_sentiment()] += weighted_duration
-
-        keys = []
-        scores = []
-        for k, v in decay_scores.items():
-            keys.append(k)
-            scores.append(v)
-        confidences = softmax(scores)
-        decay_confidences = {k: v for k, v in zip(keys, confidences)}
-        max_key = max(decay_confidences, key=decay_confidences.get)
-
-        return max_key, decay_confidences[max_key]
+        return aggregate_face_emotions(msg_face_emotions)
 
     @staticmethod
     def _merge_sentiment(
@@ -123,45 +206,244 @@ class ReturnPromptTutor(Tutor):
                 return face_sentiment
 
 
-    def generate_response(
+    def _run_stage(self, func: Callable[[], _T | None], deadline: Deadline | None) -> tuple[bool, _T | None]:
+        """
+        Runs a stage in a worker thread within the given deadline and the current cancellation token.
+        Waiting for the stage stops as soon as the deadline expires or the token is cancelled.
+        :return: Whether the stage finished in time and its result.
+        :raises AdmissionRejectedError: If all stage workers are busy.
+        """
+        if not self._stage_slots.acquire(blocking=False):
+            METRICS.counter(REJECTED_STAGES_METRIC).increment()
+            raise AdmissionRejectedError(STAGE_RETRY_AFTER)
+        token = current_cancellation()
+
+        def run_stage() -> _T | None:
+            with deadline_scope(deadline), cancellation_scope(token):
+                return func()
+
+        context = contextvars.copy_context()
+        future = self._stage_executor.submit(context.run, run_stage)
+        future.add_done_callback(lambda _: self._stage_slots.release())
+        timeout = None if deadline is None else deadline.remaining()
+        wait((future, token.future()), timeout=timeout, return_when=FIRST_COMPLETED)
+        if future.done():
+            return True, future.result()
+
+        future.cancel()
+        if token.cancelled:
+            METRICS.counter(ABORTED_STAGES_METRIC).increment()
+        return False, None
+
+    def _run_optional_stage(
+            self,
+            stage: str,
+            func: Callable[[], _T | None],
+            deadline: Deadline | None,
+            dropped_stages: list[str],
+    ) -> _T | None:
+        """
+        Runs an optional stage within its share of the remaining request budget.
+        If the budget is too small, the stage is skipped; if the stage does not finish in time or produces no result,
+        its result is dropped. Dropped stages are appended to ``dropped_stages``.
+        Stages of cancelled requests are not started at all.
+        """
+        if current_cancellation().cancelled:
+            METRICS.counter(SKIPPED_STAGES_METRIC).increment()
+            return None
+
+        stage_deadline = None
+        if deadline is not None:
+            stage_deadline = deadline.share(self.stage_shares.get(stage, 1.0))
+            remaining = stage_deadline.remaining()
+            if remaining is not None and remaining < MIN_STAGE_TIME:
+                dropped_stages.append(stage)
+                return None
+
+        try:
+            _, result = self._run_stage(func, stage_deadline)
+        except AdmissionRejectedError:
+            result = None
+
+        if result is None and not current_cancellation().cancelled:
+            dropped_stages.append(stage)
+        return result
+
+    def warmup(self, repeats: int = 3) -> None:
+        warm_up(FACE_EMOTION_STAGE, self.face_emotion_model.warmup, repeats)
+        if self._sentiment_model is not None:
+            warm_up(SENTIMENT_STAGE, self._sentiment_model.warmup, repeats)
+        if self._desc_model is not None:
+            warm_up(DESCRIPTION_STAGE, self._desc_model.warmup, repeats)
+        if self._qa_model is not None and self._qa_model is not self._desc_model:
+            warm_up(QA_STAGE, self._qa_model.warmup, repeats)
+
+    def _analyze_sentiment(self, text: str) -> SentimentRating | None:
+        """
+        Analyzes the sentiment of a message and hands the embedding computed on the way to the description cache.
+        """
+        if self.desc_qa_cache is None:
+            return self._sentiment_model.analyze(text)
+        sentiment, embedding = self._sentiment_model.analyze_with_embedding(text)
+        if embedding is not None:
+            self.desc_qa_cache.remember_embedding(text, embedding)
+        return sentiment
+
+    def _window_conversation(self, conversation: Sequence[Message], session_id: str | None) -> Sequence[Message] | None:
+        """
+        :return: The conversation with its older turns summarized, or ``None`` if no summary could be generated.
+        """
+        windowed_conversation = self.conversation_window.apply(conversation, session_id)
+        if len(windowed_conversation) >= len(conversation):
+            return None
+        return windowed_conversation
+
+    def _generate_description_qa(
+            self,
+            conversation: Sequence[Message],
+            deadline: Deadline | None,
+            dropped_stages: list[str],
+    ) -> tuple[str | None, str | None]:
+        """
+        Generates the description and, based on it, the question-answer pairs with two consecutive model calls.
+        """
+        prompt_generator = self.prompt_generator
+        desc_prompt = prompt_generator.generate_description_prompt(conversation)
+        desc = self._run_optional_stage(
+            DESCRIPTION_STAGE,
+            lambda: prompt_with_ledger(DESCRIPTION_STAGE, self._desc_model, desc_prompt),
+            deadline,
+            dropped_stages,
+        )
+
+        qa_tuples = None
+        if desc is not None:
+            qa_prompt = prompt_generator.generate_qa_prompt(conversation, desc)
+            qa_tuples = self._run_optional_stage(
+                QA_STAGE,
+                lambda: prompt_with_ledger(QA_STAGE, self._qa_model, qa_prompt),
+                deadline,
+                dropped_stages,
+            )
+        elif current_cancellation().cancelled:
+            METRICS.counter(SKIPPED_STAGES_METRIC).increment()
+        else:
+            dropped_stages.append(QA_STAGE)
+        return desc, qa_tuples
+
+    def _generate_fused_description_qa(
+            self,
+            conversation: Sequence[Message],
+            deadline: Deadline | None,
+            dropped_stages: list[str],
+    ) -> tuple[tuple[str, str] | None, bool]:
+        """
+        Generates the description and the question-answer pairs with a single call of the description model.
+        :return: The description and the question-answer pairs, or ``None`` if there was no response in time or it
+        could not be parsed, and whether it could not be parsed.
+        """
+        prompt_generator = self.prompt_generator
+        desc_qa_prompt = prompt_generator.generate_description_qa_prompt(conversation)
+        output = self._run_optional_stage(
+            DESCRIPTION_QA_STAGE,
+            lambda: prompt_with_ledger(DESCRIPTION_QA_STAGE, self._desc_model, desc_qa_prompt),
+            deadline,
+            dropped_stages,
+        )
+        if output is None:
+            return None, False
+
+        desc_qa = prompt_generator.parse_description_qa_output(output)
+        if desc_qa is None:
+            METRICS.counter(FUSED_PARSE_FAILURES_METRIC).increment()
+            return None, True
+        return desc_qa, False
+
+    def _prepare_tutor_prompt(
             self,
             conversation: Sequence[Message],
             use_emotion: bool = True,
-            face_emotions: Sequence[FaceEmotionRating] | None = None
+            face_emotions: Sequence[FaceEmotionRating] | None = None,
+            deadline: Deadline | None = None,
+            session_id: str | None = None,
     ) -> tuple[str, dict]:
         used_input = dict()
+        dropped_stages = []
         prompt_generator = self.prompt_generator
         recent_response = conversation[-1]
 
+        if self.conversation_window is not None and self.conversation_window.needs_summary(conversation):
+            windowed_conversation = self._run_optional_stage(
+                SUMMARY_STAGE,
+                lambda: self._window_conversation(conversation, session_id),
+                deadline,
+                dropped_stages,
+            )
+            # without a summary, the full conversation is used
+            if windowed_conversation is not None:
+                used_input["summarizedTurns"] = len(conversation) - len(windowed_conversation) + 1
+                conversation = windowed_conversation
+
         merged_sentiment = None
         if use_emotion:
             if self._sentiment_model is not None:
-                sentiment = self._sentiment_model.analyze(recent_response.content)
-                text_sentiment = self._agg_text_emotions(sentiment)
+                sentiment = self._run_optional_stage(
+                    SENTIMENT_STAGE,
+                    lambda: self._analyze_sentiment(recent_response.content),
+                    deadline,
+                    dropped_stages,
+                )
+                text_sentiment = None if sentiment is None else self._agg_text_emotions(sentiment)
                 face_sentiment = self._agg_face_emotions(face_emotions)
                 merged_sentiment = self._merge_sentiment(text_sentiment, face_sentiment)
-                used_input["sentiment"] = {
-                    "neutral": sentiment.neutral ,
-                    "confidenceNeutral": sentiment.neutral_confidence,
-                    "boredom": sentiment.boredom,
-                    "confidenceBoredom": sentiment.boredom_confidence,
-                    "engagement": sentiment.engagement,
-                    "confidenceEngagement": sentiment.engagement_confidence,
-                }
+                if sentiment is not None:
+                    used_input["sentiment"] = {
+                        "neutral": sentiment.neutral ,
+                        "confidenceNeutral": sentiment.neutral_confidence,
+                        "boredom": sentiment.boredom,
+                        "confidenceBoredom": sentiment.boredom_confidence,
+                        "engagement": sentiment.engagement,
+                        "confidenceEngagement": sentiment.engagement_confidence,
+                    }
                 if face_sentiment is not None:
                     used_input["sentimentAggFaceEmotion"] = face_sentiment[0]
                     used_input["confidenceAggFaceEmotion"] = face_sentiment[1]
                 used_input["mergedSentiment"] = merged_sentiment
 
         qa_tuples = None
-        if self._desc_model is not None and self._qa_model is not None:
-            desc_prompt = prompt_generator.generate_description_prompt(conversation)
-            desc = self._desc_model.prompt(desc_prompt)
-            qa_prompt = prompt_generator.generate_qa_prompt(conversation, desc)
-            qa_tuples = self._qa_model.prompt(qa_prompt)
+        if self._desc_model is not None and (self.fused_desc_qa or self._qa_model is not None):
+            cache_key, cached = None, None
+            if self.desc_qa_cache is not None:
+                # a lookup that does not finish in time counts as a miss, whose result is not stored
+                lookup = self._run_optional_stage(
+                    DESCRIPTION_QA_CACHE_STAGE,
+                    lambda: self.desc_qa_cache.lookup(conversation),
+                    deadline,
+                    dropped_stages,
+                )
+                if lookup is not None:
+                    cache_key, cached = lookup
+
+            if cached is not None:
+                desc_qa, similarity = cached
+                used_input["descriptionQaCacheSimilarity"] = similarity
+            else:
+                desc_qa, parse_failed = None, False
+                if self.fused_desc_qa:
+                    desc_qa, parse_failed = self._generate_fused_description_qa(conversation, deadline, dropped_stages)
+                    used_input["fusedDescriptionQa"] = desc_qa is not None
+                # a fused call that ran out of time leaves no time for two more calls
+                if desc_qa is None and self._qa_model is not None and (not self.fused_desc_qa or parse_failed):
+                    desc_qa = self._generate_description_qa(conversation, deadline, dropped_stages)
+                if cache_key is not None and desc_qa is not None and None not in desc_qa:
+                    self.desc_qa_cache.store(cache_key, desc_qa)
+            desc, qa_tuples = (None, None) if desc_qa is None else desc_qa
             used_input["description"] = desc
             used_input["qaTuples"] = qa_tuples
 
+        if len(dropped_stages) > 0:
+            used_input["droppedStages"] = dropped_stages
+
         tutor_prompt = prompt_generator.generate_tutor_prompt(
             conversation=conversation,
             merged_sentiment=merged_sentiment,
@@ -170,10 +452,27 @@ class ReturnPromptTutor(Tutor):
 
         return tutor_prompt, used_input
 
+    def generate_response(
+            self,
+            conversation: Sequence[Message],
+            use_emotion: bool = True,
+            face_emotions: Sequence[FaceEmotionRating] | None = None,
+            deadline: Deadline | None = None,
+            session_id: str | None = None,
+    ) -> tuple[str, dict]:
+        tutor_prompt, used_input = self._prepare_tutor_prompt(
+            conversation, use_emotion, face_emotions, deadline, session_id
+        )
+        current_cancellation().raise_if_cancelled()
+        return tutor_prompt, used_input
+
 
     def predict_face_emotion(self, image: Image) -> tuple[Emotion, float]:
         return self.face_emotion_model.analyze(image)
 
+    def predict_face_emotions(self, images: Sequence[Image]) -> list[tuple[Emotion, float]]:
+        return self.face_emotion_model.analyze_batch(images)
+
 
 class LLMTutor(ReturnPromptTutor):
 
@@ -184,24 +483,54 @@ class LLMTutor(ReturnPromptTutor):
                  sentiment_model: EmotionModel | None = None,
                  desc_model: LanguageModel | None = None,
                  qa_model: LanguageModel | None = None,
+                 stage_shares: dict[str, float] | None = None,
+                 fused_desc_qa: bool = False,
+                 conversation_window: ConversationWindow | None = None,
+                 desc_qa_cache: ConversationCache[tuple[str, str]] | None = None,
+                 max_stage_workers: int = DEFAULT_MAX_STAGE_WORKERS,
                  ) -> None:
         super().__init__(
             prompt_generator=prompt_generator,
             face_emotion_model=face_emotion_model,
             sentiment_model=sentiment_model,
             desc_model=desc_model,
-            qa_model=qa_model
+            qa_model=qa_model,
+            stage_shares=stage_shares,
+            fused_desc_qa=fused_desc_qa,
+            conversation_window=conversation_window,
+            desc_qa_cache=desc_qa_cache,
+            max_stage_workers=max_stage_workers,
         )
         self.tutor_model = tutor_model
 
+    def warmup(self, repeats: int = 3) -> None:
+        super().warmup(repeats)
+        warm_up(TUTOR_STAGE, self.tutor_model.warmup, repeats)
+
     def generate_response(
             self,
             conversation: Sequence[Message],
             use_emotion: bool = True,
-            face_emotions: Sequence[FaceEmotionRating] | None = None
+            face_emotions: Sequence[FaceEmotionRating] | None = None,
+            deadline: Deadline | None = None,
+            session_id: str | None = None,
     ) -> tuple[str, dict]:
-        tutor_prompt, used_input = super().generate_response(conversation, use_emotion, face_emotions)
-        tutor_response = self.tutor_model.prompt(tutor_prompt)
+        tutor_prompt, used_input = self._prepare_tutor_prompt(
+            conversation, use_emotion, face_emotions, deadline, session_id
+        )
+
+        token = current_cancellation()
+        if token.cancelled:
+            METRICS.counter(SKIPPED_STAGES_METRIC).increment()
+            raise RequestCancelledError()
+
+        finished, tutor_response = self._run_stage(
+            lambda: prompt_with_ledger(TUTOR_STAGE, self.tutor_model, tutor_prompt), deadline
+        )
+        token.raise_if_cancelled()
+        if not finished or (tutor_response is None and deadline is not None and deadline.expired):
+            METRICS.counter(DEADLINE_EXCEEDED_METRIC).increment()
+            raise DeadlineExceededError()
 
         return tutor_response, used_input
 
@@ -215,7 +544,9 @@ class MockTutor(Tutor):
             self,
             conversation: Sequence[Message],
             use_emotion: bool = True,
-            face_emotions: Sequence[FaceEmotionRating] | None = None
+            face_emotions: Sequence[FaceEmotionRating] | None = None,
+            deadline: Deadline | None = None,
+            session_id: str | None = None,
     ) -> tuple[str, dict]:
         return random.choice(("Yes", "No")), {}
 
@@ -232,7 +563,9 @@ class EchoTutor(Tutor):
             self,
             conversation: Sequence[Message],
             use_emotion: bool = True,
-            face_emotions: Sequence[FaceEmotionRating] | None = None
+            face_emotions: Sequence[FaceEmotionRating] | None = None,
+            deadline: Deadline | None = None,
+            session_id: str | None = None,
     ) -> tuple[str, dict]:
         return conversation[-1].content, {}
 
@@ -6,26 +6,69 @@ from typing import Iterable
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from matplotlib.collections import PolyCollection
 from matplotlib.ticker import AutoMinorLocator
 from matplotlib.typing import ColorType
+import numpy as np
 import pandas as pd
 
 from tutor.github.model import Task, Milestone
 
 
+def _rectangles(x: np.ndarray, width: np.ndarray, y: np.ndarray, height: float) -> np.ndarray:
+    """
+    :return: The vertices of one rectangle per element with shape ``(n, 4, 2)``.
+    """
+    x0, x1 = x, x + width
+    y0, y1 = y - height / 2.0, y + height / 2.0
+    return np.stack([
+        np.stack([x0, y0], axis=-1),
+        np.stack([x0, y1], axis=-1),
+        np.stack([x1, y1], axis=-1),
+        np.stack([x1, y0], axis=-1),
+    ], axis=1)
+
+
+def _merge_intervals(groups: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, ...]:
+    """
+    Merges the overlapping intervals within each group.
+    :param groups: The integer group of each interval.
+    :return: The groups, starts and ends of the merged intervals.
+    """
+    if len(groups) == 0:
+        return groups, starts, ends
+
+    order = np.lexsort((starts, groups))
+    groups, starts, ends = groups[order], starts[order], ends[order]
+
+    # shift each group past the previous one, so a single running maximum never crosses group boundaries
+    low = starts.min()
+    shift = groups * (ends.max() - low + 1.0)
+    running_end = np.maximum.accumulate(ends - low + shift)
+    is_new = np.r_[True, starts[1:] - low + shift[1:] > running_end[:-1]]
+
+    first = np.flatnonzero(is_new)
+    return groups[first], starts[first], np.maximum.reduceat(ends, first)
+
+
 def gantt(tasks:  Task | Iterable[Task], milestones: Milestone | Iterable[Milestone] | None = None,
           ax: mpl.axes.Axes | None = None,
           title: str | None = None,
           milestone_color: ColorType | None = None,
           even_row_color: ColorType | None = None,
-          odd_row_color: ColorType | None = None) -> mpl.axes.Axes:
+          odd_row_color: ColorType | None = None,
+          level_of_detail: bool = False) -> mpl.axes.Axes:
     """
     Plots a Gantt chart of the given tasks and milestones.
-    Tasks are visualized as horizontal bars while milestones are drawn as vertical lines.
+    Tasks are visualized as horizontal bars while milestones are drawn as vertical lines. All bars and row stripes are
+    drawn as a few collections, so charts with thousands of tasks render quickly.
     :param tasks: The tasks to plot. Can also be passed as dictionaries holding the required properties.
     :param milestones: The milestones to plot. Can also be passed as dictionaries holding the required properties.
     :param ax:
     :param title:
+    :param level_of_detail: Whether to aggregate the tasks into one row per label if there are more tasks than the
+    axes is high in pixels. The bars of a label's row are the merged time spans of its tasks. Rows are only labeled
+    if they fit the height of the axes.
     :return:
     """
     if isinstance(tasks, Task):
@@ -44,46 +87,65 @@ def gantt(tasks:  Task | Iterable[Task], milestones: Milestone | Iterable[Milest
         _, ax = plt.subplots()
     ax.set_title(title)
 
-    df = pd.DataFrame(tasks)
-    df["start_date"] = pd.to_datetime(df["start_date"])
-    df["end_date"] = pd.to_datetime(df["end_date"])
-    df["duration"] = (df["end_date"] - df["start_date"]).dt.total_seconds() / 3600 + 24 # Duration in hours
-    df["start_numeric"] = mdates.date2num(df["start_date"])
-
-    min_x = df["start_date"].min()
-    min_numeric = mdates.date2num(min_x)
-    max_x = df["end_date"].max()
-    max_dur = (max_x - min_x).total_seconds() / 3600
-
-    yticks = []
-    for i, (idx, row) in enumerate(df.iterrows()):
-        if i % 2 == 0:
-            if even_row_color is not None:
-                ax.broken_barh([(min_numeric, max_dur)], (i - 0.5, 1.0), color=even_row_color)
-        elif odd_row_color is not None:
-            ax.broken_barh([(min_numeric, max_dur)], (i - 0.5, 1.0), color=odd_row_color)
-
-        ax.broken_barh([(row["start_numeric"], row["duration"] / 24.0)], (i - 0.4, 0.8), color=row["label_color"])
-        yticks.append((i, row["title"]))
-
-    for i, milestone in enumerate(milestones):
+    # shallow field dictionaries, as pandas deep-copies every dataclass instance
+    df = pd.DataFrame([vars(task) if isinstance(task, Task) else task for task in tasks])
+    start_numeric = mdates.date2num(pd.to_datetime(df["start_date"]))
+    end_date_numeric = mdates.date2num(pd.to_datetime(df["end_date"]))
+    # bars span whole days, including the end date
+    end_numeric = end_date_numeric + 1.0
+    min_numeric = start_numeric.min()
+    max_numeric = end_numeric.max()
+
+    if level_of_detail and len(df) > ax.get_window_extent().height:
+        labels, label_rows = np.unique(df["label_name"].to_numpy(), return_inverse=True)
+        label_colors = df.groupby("label_name", sort=True)["label_color"].first().to_numpy()
+        rows, bar_starts, bar_ends = _merge_intervals(label_rows, start_numeric, end_numeric)
+        bar_colors = label_colors[rows]
+        row_titles = labels
+    else:
+        rows = np.arange(len(df))
+        bar_starts, bar_ends = start_numeric, end_numeric
+        bar_colors = df["label_color"].to_numpy()
+        row_titles = df["title"].to_numpy()
+    num_rows = len(row_titles)
+
+    row_indices = np.arange(num_rows)
+    for row_color, parity in ((even_row_color, 0), (odd_row_color, 1)):
+        if row_color is None:
+            continue
+        stripe_rows = row_indices[row_indices % 2 == parity]
+        stripes = _rectangles(
+            np.full(len(stripe_rows), min_numeric), np.full(len(stripe_rows), max_numeric - min_numeric),
+            stripe_rows, 1.0,
+        )
+        ax.add_collection(PolyCollection(stripes, facecolors=row_color, edgecolors="none"))
+
+    bars = _rectangles(bar_starts, bar_ends - bar_starts, rows.astype(float), 0.8)
+    ax.add_collection(PolyCollection(bars, facecolors=bar_colors, edgecolors="none"))
+
+    # one line per milestone, so that each milestone has its own legend entry
+    for milestone in milestones:
         cur_start_numeric = mdates.date2num(milestone.date)
         label = milestone.name
         ax.axvline(cur_start_numeric, color=milestone_color, linestyle='--', linewidth=1.0, label=label)
         ax.text(cur_start_numeric, -1.2, label, color=milestone_color, ha='right', va='top', rotation=90)
 
-    ax.set_xlim(min_x, max_x)
+    ax.xaxis_date()
+    ax.autoscale_view()
+    ax.set_xlim(min_numeric, end_date_numeric.max())
     ax.xaxis.set_major_formatter(mdates.DateFormatter("%d.%m"))
     ax.xaxis.set_major_locator(mdates.WeekdayLocator(byweekday=1))
-    ax.set_xticklabels(ax.get_xticklabels(), rotation=90)
+    ax.tick_params(axis="x", labelrotation=90)
     ax.grid(axis="x", linestyle="--", alpha=0.7, which="major")
 
     ax.xaxis.set_minor_locator(AutoMinorLocator(7))
     ax.grid(axis="x", linestyle="--", alpha=0.15, which="minor")
 
     ax.yaxis.set_inverted(True)
-    ax.set_yticks([yt[0] for yt in yticks])
-    ax.set_yticklabels([yt[1] for yt in yticks])
+    # labels of more rows than pixels would overlap illegibly, while dominating the rendering time
+    if num_rows <= ax.get_window_extent().height:
+        ax.set_yticks(row_indices)
+        ax.set_yticklabels(row_titles)
     return ax
 
 
@@ -0,0 +1,65 @@
+"""
+Converts the fine-tuned sentiment and face emotion weights in MODELS_ROOT into single-file safetensors checkpoints,
+which the backend memory-maps instead of loading the pre-trained models and overwriting their weights.
+"""
+import argparse
+import os
+
+from transformers import BertConfig, ViTConfig, ViTImageProcessor, ViTForImageClassification
+
+from tutor.model.emotion import EmotionBert, convert_checkpoint
+from tutor.model.emotion.checkpoint import CHECKPOINT_FILE
+
+
+def convert_sentiment_model(models_root: str, base_model: str) -> str:
+    """
+    :return: The path of the written checkpoint.
+    """
+    model_dir = os.path.join(models_root, "sentiment")
+    output_path = os.path.join(model_dir, CHECKPOINT_FILE)
+    convert_checkpoint(
+        os.path.join(model_dir, "BERT_model_3emo_3cls_deepseek.pt"),
+        output_path,
+        EmotionBert.__name__,
+        BertConfig.from_pretrained(base_model),
+    )
+    return output_path
+
+
+def convert_face_emotion_model(models_root: str, base_model: str, num_labels: int = 3) -> str:
+    """
+    Converts the face emotion model and stores the image processor config of its base model next to it.
+    :return: The path of the written checkpoint.
+    """
+    model_dir = os.path.join(models_root, "face_emotion")
+    output_path = os.path.join(model_dir, CHECKPOINT_FILE)
+    convert_checkpoint(
+        os.path.join(model_dir, "model.pt"),
+        output_path,
+        ViTForImageClassification.__name__,
+        ViTConfig.from_pretrained(base_model, num_labels=num_labels),
+    )
+    ViTImageProcessor.from_pretrained(base_model).save_pretrained(model_dir)
+    return output_path
+
+
+if __name__ == '__main__':
+    def main() -> None:
+        from dotenv import load_dotenv
+
+        from tutor.backend.logic import SENTIMENT_BASE_MODEL, FACE_EMOTION_BASE_MODEL
+
+        load_dotenv()
+        parser = argparse.ArgumentParser(description=__doc__)
+        parser.add_argument("--models-root", default=os.getenv("MODELS_ROOT"), help="Directory of the models")
+        parser.add_argument("--skip-sentiment", action="store_true", help="Do not convert the sentiment model")
+        parser.add_argument("--skip-face-emotion", action="store_true", help="Do not convert the face emotion model")
+        args = parser.parse_args()
+
+        models_root = os.path.expanduser(args.models_root)
+        if not args.skip_sentiment:
+            print(f"Wrote {convert_sentiment_model(models_root, SENTIMENT_BASE_MODEL)}")
+        if not args.skip_face_emotion:
+            print(f"Wrote {convert_face_emotion_model(models_root, FACE_EMOTION_BASE_MODEL)}")
+
+    main()
@@ -0,0 +1,287 @@
+"""
+Distills the text sentiment model ``EmotionBert`` into a compact student with a narrow and shallow encoder.
+The student learns the teacher's logits on the annotated student utterances and on the unlabelled student messages
+of their conversation histories, and the annotated labels where available. Training runs on the CPU.
+Records are split by conversation id into training and test records; the test utterances are never trained on.
+The student is written to the output directory together with the tokenizer and a report comparing the accuracy and
+the latency of teacher and student on the test utterances.
+"""
+import argparse
+import json
+import logging
+from pathlib import Path
+import time
+from typing import Callable, Final, Sequence
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from tutor.data import AnnotationRecord, load_annotations, split_records, DEFAULT_ANNOTATION_PATH
+from tutor.eval.batch_eval import length_buckets, rating_to_label
+from tutor.model.emotion import EmotionBert, LocalEmotionModel
+from tutor.model.emotion.emotion_bert import EMOTIONS
+from tutor.model.emotion.emotion_student import make_emotion_student, init_student_embeddings, save_emotion_student
+
+REPORT_FILE: Final[str] = "report.json"
+
+_logger = logging.getLogger(__name__)
+
+# the label of texts without annotation
+UNLABELLED: Final[int] = -1
+
+
+def distillation_texts(records: Sequence[AnnotationRecord], train: Sequence[int], test: Sequence[int]) \
+        -> tuple[list[str], np.ndarray, np.ndarray]:
+    """
+    Collects the annotated utterances of the training records and the unlabelled student messages of their
+    histories, without the utterances of the test records.
+    :return: The texts, and the emotion index and class of each text, ``UNLABELLED`` if it is not annotated.
+    """
+    excluded = {records[i]["utterance"] for i in test}
+    labels = {}
+    for i in train:
+        record = records[i]
+        labels[record["utterance"]] = (EMOTIONS.index(record["emotion"]), record["polarity"] - 1)
+    texts = dict.fromkeys(labels)
+    for i in train:
+        history = records[i]["history"]
+        history = json.loads(history) if isinstance(history, str) else history
+        texts.update(dict.fromkeys(m["text"] for m in history if m["user"] == "Student"))
+    texts = [text for text in texts if text and text not in excluded]
+    emotions = np.array([labels.get(text, (UNLABELLED, UNLABELLED))[0] for text in texts], dtype=np.int64)
+    classes = np.array([labels.get(text, (UNLABELLED, UNLABELLED))[1] for text in texts], dtype=np.int64)
+    return texts, emotions, classes
+
+
+def _pad(token_ids: Sequence[Sequence[int]], pad_id: int) -> tuple[torch.Tensor, torch.Tensor]:
+    width = max(len(ids) for ids in token_ids)
+    input_ids = torch.full((len(token_ids), width), pad_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(token_ids), width), dtype=torch.long)
+    for i, ids in enumerate(token_ids):
+        input_ids[i, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+        attention_mask[i, :len(ids)] = 1
+    return input_ids, attention_mask
+
+
+def teacher_logits(teacher: EmotionBert, token_ids: Sequence[Sequence[int]], pad_id: int, batch_size: int = 32) \
+        -> torch.Tensor:
+    """
+    :return: The teacher's logits of all texts with shape ``(texts, labels, classes)``.
+    """
+    lengths = np.array([len(ids) for ids in token_ids])
+    logits = [None] * len(token_ids)
+    with torch.no_grad():
+        for batch in length_buckets(lengths, batch_size):
+            input_ids, attention_mask = _pad([token_ids[i] for i in batch], pad_id)
+            for i, row in zip(batch, teacher.forward(input_ids, attention_mask)):
+                logits[i] = row
+    return torch.stack(logits)
+
+
+def distillation_loss(
+        student_logits: torch.Tensor,
+        target_logits: torch.Tensor,
+        emotions: torch.Tensor,
+        classes: torch.Tensor,
+        temperature: float = 2.0,
+        label_weight: float = 0.5,
+) -> torch.Tensor:
+    """
+    Combines the KL divergence to the teacher's softened distribution of every label with the cross entropy of the
+    annotated label of the labelled texts. As the confidences of a ``SentimentRating`` compare the logits of different
+    labels, which the per-label distributions do not determine, the teacher's logits are also matched directly.
+    """
+    num_classes = student_logits.shape[2]
+    soft_loss = F.kl_div(
+        F.log_softmax(student_logits.reshape(-1, num_classes) / temperature, dim=1),
+        F.softmax(target_logits.reshape(-1, num_classes) / temperature, dim=1),
+        reduction="batchmean",
+    ) * temperature ** 2
+    soft_loss = soft_loss + F.mse_loss(student_logits, target_logits)
+
+    labelled = emotions != UNLABELLED
+    if label_weight <= 0.0 or not labelled.any():
+        return soft_loss
+    annotated_logits = student_logits[labelled, emotions[labelled]]
+    hard_loss = F.cross_entropy(annotated_logits, classes[labelled])
+    return (1.0 - label_weight) * soft_loss + label_weight * hard_loss
+
+
+def train_student(
+        student: EmotionBert,
+        token_ids: Sequence[Sequence[int]],
+        targets: torch.Tensor,
+        emotions: np.ndarray,
+        classes: np.ndarray,
+        pad_id: int,
+        epochs: int = 10,
+        batch_size: int = 32,
+        learning_rate: float = 5e-4,
+        temperature: float = 2.0,
+        label_weight: float = 0.5,
+        seed: int = 0,
+        on_epoch: Callable[[int, float], None] | None = None,
+) -> list[float]:
+    """
+    :param on_epoch: Called with the number and the mean loss of each finished epoch, e.g. to report the progress.
+    :return: The mean loss of each epoch.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    optimizer = torch.optim.AdamW(student.parameters(), lr=learning_rate, weight_decay=0.01)
+    steps = epochs * ((len(token_ids) + batch_size - 1) // batch_size)
+    scheduler = torch.optim.lr_scheduler.OneCycleLR(optimizer, max_lr=learning_rate, total_steps=steps,
+                                                    pct_start=0.1)
+    emotions = torch.from_numpy(emotions)
+    classes = torch.from_numpy(classes)
+
+    student.train()
+    epoch_losses = []
+    for epoch in range(epochs):
+        losses = []
+        for batch in torch.randperm(len(token_ids), generator=generator).split(batch_size):
+            input_ids, attention_mask = _pad([token_ids[i] for i in batch], pad_id)
+            loss = distillation_loss(student(input_ids, attention_mask), targets[batch], emotions[batch],
+                                     classes[batch], temperature, label_weight)
+            optimizer.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(student.parameters(), 1.0)
+            optimizer.step()
+            scheduler.step()
+            losses.append(loss.item())
+        epoch_losses.append(float(np.mean(losses)))
+        _logger.debug(f"Epoch {epoch + 1}/{epochs}: loss {epoch_losses[-1]:.4f}")
+        if on_epoch is not None:
+            on_epoch(epoch + 1, epoch_losses[-1])
+    student.eval()
+    return epoch_losses
+
+
+def _parameters(model: EmotionBert) -> int:
+    return sum(p.numel() for p in model.parameters())
+
+
+def evaluate_model(model: LocalEmotionModel, records: Sequence[AnnotationRecord], repeats: int = 1) -> dict:
+    """
+    Measures the accuracy on the records and the latency of analyzing one utterance at a time, as per chat turn.
+    """
+    utterances = [r["utterance"] for r in records]
+    labels = [rating_to_label(rating) for rating in model.analyze_batch(utterances)]
+    emotion_correct = np.array([label[0] == r["emotion"] for label, r in zip(labels, records)])
+    polarity_correct = np.array([label[1] == r["polarity"] for label, r in zip(labels, records)])
+
+    model.analyze(utterances[0])  # warm up
+    latencies = []
+    for _ in range(repeats):
+        for utterance in utterances:
+            start = time.perf_counter()
+            model.analyze(utterance)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+    return {
+        "parameters": _parameters(model.model),
+        "accuracy": {
+            "emotion": float(emotion_correct.mean()),
+            "polarity": float(polarity_correct.mean()),
+            "joint": float((emotion_correct & polarity_correct).mean()),
+        },
+        "latencyMs": {
+            "mean": float(np.mean(latencies)),
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+        },
+        "labels": [label[:2] for label in labels],
+    }
+
+
+def compare(teacher: LocalEmotionModel, student: LocalEmotionModel, records: Sequence[AnnotationRecord],
+            repeats: int = 1) -> dict:
+    """
+    :return: The accuracy-vs-latency report of teacher and student on the given records.
+    """
+    teacher_report = evaluate_model(teacher, records, repeats)
+    student_report = evaluate_model(student, records, repeats)
+    agreement = np.mean([a == b for a, b in zip(teacher_report.pop("labels"), student_report.pop("labels"))])
+    return {
+        "records": len(records),
+        "teacher": teacher_report,
+        "student": student_report,
+        "agreement": float(agreement),
+        "speedup": teacher_report["latencyMs"]["p50"] / student_report["latencyMs"]["p50"],
+        "compression": teacher_report["parameters"] / student_report["parameters"],
+    }
+
+
+if __name__ == '__main__':
+    def main() -> None:
+        import os
+        from dotenv import load_dotenv
+
+        parser = argparse.ArgumentParser(description=__doc__)
+        parser.add_argument("--data", default=str(DEFAULT_ANNOTATION_PATH), help="Path to the annotation dataset")
+        parser.add_argument("--output", required=True, help="Directory receiving the student and the report")
+        parser.add_argument("--hidden-size", type=int, default=256, help="Hidden size of the student")
+        parser.add_argument("--layers", type=int, default=4, help="Number of transformer layers of the student")
+        parser.add_argument("--heads", type=int, default=4, help="Number of attention heads of the student")
+        parser.add_argument("--intermediate-size", type=int, default=1024, help="Feed-forward size of the student")
+        parser.add_argument("--epochs", type=int, default=10)
+        parser.add_argument("--batch-size", type=int, default=32)
+        parser.add_argument("--learning-rate", type=float, default=5e-4)
+        parser.add_argument("--temperature", type=float, default=2.0, help="Softmax temperature of the distillation")
+        parser.add_argument("--label-weight", type=float, default=0.5,
+                            help="Weight of the annotated labels relative to the teacher's logits")
+        parser.add_argument("--max-length", type=int, default=128, help="Maximum number of tokens per training text")
+        parser.add_argument("--test-fraction", type=float, default=0.2, help="Fraction of conversations held out")
+        parser.add_argument("--latency-repeats", type=int, default=3, help="Passes over the test utterances")
+        parser.add_argument("--threads", type=int, default=None, help="Number of CPU threads of PyTorch")
+        parser.add_argument("--seed", type=int, default=0)
+        args = parser.parse_args()
+
+        load_dotenv()
+        from tutor.backend.logic import make_teacher_sentiment_model
+
+        if args.threads is not None:
+            torch.set_num_threads(args.threads)
+        torch.manual_seed(args.seed)
+        device = torch.device("cpu")
+        teacher = make_teacher_sentiment_model(os.path.expanduser(os.getenv("MODELS_ROOT")), device)
+        tokenizer = teacher.tokenizer
+        pad_id = tokenizer.pad_token_id
+
+        records = load_annotations(args.data)
+        train, test = split_records(records, args.test_fraction, args.seed)
+        texts, emotions, classes = distillation_texts(records, train, test)
+        token_ids = tokenizer(texts, truncation=True, max_length=args.max_length)["input_ids"]
+        print(f"Distilling on {len(texts)} texts ({int((emotions != UNLABELLED).sum())} annotated), "
+              f"testing on {len(test)} utterances")
+
+        start = time.perf_counter()
+        targets = teacher_logits(teacher.model, token_ids, pad_id, args.batch_size)
+        print(f"Computed the teacher's logits in {time.perf_counter() - start:.1f}s")
+
+        student = make_emotion_student(len(tokenizer), args.hidden_size, args.layers, args.heads,
+                                       args.intermediate_size, pad_token_id=pad_id)
+        init_student_embeddings(student, teacher.model)
+        start = time.perf_counter()
+        losses = train_student(student, token_ids, targets, emotions, classes, pad_id, args.epochs,
+                               args.batch_size, args.learning_rate, args.temperature, args.label_weight, args.seed,
+                               lambda epoch, loss: print(f"Epoch {epoch}/{args.epochs}: loss {loss:.4f}"))
+        training_seconds = time.perf_counter() - start
+
+        output = Path(args.output)
+        save_emotion_student(student, output)
+        tokenizer.save_pretrained(output)
+
+        student_model = LocalEmotionModel(tokenizer, student)
+        report = compare(teacher, student_model, [records[i] for i in test], args.latency_repeats)
+        report["training"] = {
+            "texts": len(texts),
+            "epochs": args.epochs,
+            "seconds": training_seconds,
+            "losses": losses,
+            "config": vars(args),
+        }
+        with open(output / REPORT_FILE, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(json.dumps({k: v for k, v in report.items() if k != "training"}, indent=2))
+
+    main()
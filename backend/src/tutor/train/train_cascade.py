@@ -0,0 +1,150 @@
+"""
+Trains the cheap first stage of the text sentiment cascade, a TF-IDF linear classifier, on the annotated utterances.
+For a range of confidence thresholds, the escalation rate, accuracy and per-message latency of the cascade with the
+backend's sentiment model as second stage are reported on held-out conversations, together with the lowest-latency
+threshold whose accuracy stays within a given distance of the second stage alone.
+"""
+import argparse
+import json
+from pathlib import Path
+import time
+from typing import Sequence
+
+import numpy as np
+
+from tutor.data import AnnotationRecord, load_annotations, split_records, DEFAULT_ANNOTATION_PATH
+from tutor.eval.batch_eval import rating_to_label
+from tutor.model.emotion import EmotionModel, CascadeEmotionModel, TfidfEmotionModel, train_tfidf_emotion_model, \
+    save_tfidf_emotion_model
+
+
+def stage_predictions(model: EmotionModel, utterances: Sequence[str]) -> tuple[list[tuple[str, int]], np.ndarray]:
+    """
+    Rates one utterance at a time, as per chat turn.
+    :return: The (emotion, polarity) label of each utterance and its latency in milliseconds.
+    """
+    model.analyze(utterances[0])  # warm up
+    labels, latencies = [], []
+    for utterance in utterances:
+        start = time.perf_counter()
+        rating = model.analyze(utterance)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        labels.append(rating_to_label(rating)[:2])
+    return labels, np.array(latencies)
+
+
+def sweep_thresholds(
+        records: Sequence[AnnotationRecord],
+        first: tuple[list[tuple[str, int]], np.ndarray, np.ndarray],
+        second: tuple[list[tuple[str, int]], np.ndarray],
+        thresholds: Sequence[float],
+) -> list[dict]:
+    """
+    Combines the predictions of both stages for each threshold, as the cascade would.
+    :param first: The labels, latencies and confidences of the cheap model.
+    :param second: The labels and latencies of the accurate model.
+    """
+    first_labels, first_ms, confidences = first
+    second_labels, second_ms = second
+    gold = [(r["emotion"], r["polarity"]) for r in records]
+    rows = []
+    for threshold in thresholds:
+        escalated = confidences < threshold
+        labels = [s if e else f for f, s, e in zip(first_labels, second_labels, escalated)]
+        latencies = first_ms + np.where(escalated, second_ms, 0.0)
+        rows.append({
+            "threshold": float(threshold),
+            "escalationRate": float(escalated.mean()),
+            "accuracy": {
+                "emotion": float(np.mean([p[0] == g[0] for p, g in zip(labels, gold)])),
+                "joint": float(np.mean([p == g for p, g in zip(labels, gold)])),
+            },
+            "latencyMs": {
+                "mean": float(latencies.mean()),
+                "p50": float(np.percentile(latencies, 50)),
+                "p95": float(np.percentile(latencies, 95)),
+            },
+        })
+    return rows
+
+
+def recommend_threshold(sweep: Sequence[dict], reference_accuracy: float, max_accuracy_drop: float) -> dict | None:
+    """
+    :return: The row of the fastest threshold whose joint accuracy is at most ``max_accuracy_drop`` below the
+    reference accuracy, or ``None`` if no threshold qualifies.
+    """
+    candidates = [row for row in sweep if row["accuracy"]["joint"] >= reference_accuracy - max_accuracy_drop]
+    return min(candidates, key=lambda row: row["latencyMs"]["mean"]) if candidates else None
+
+
+def evaluate_cascade(
+        first: TfidfEmotionModel,
+        second: EmotionModel,
+        records: Sequence[AnnotationRecord],
+        thresholds: Sequence[float],
+        max_accuracy_drop: float = 0.02,
+) -> dict:
+    utterances = [r["utterance"] for r in records]
+    first_labels, first_ms = stage_predictions(first, utterances)
+    _, confidences = first.analyze_with_confidence(utterances)
+    second_labels, second_ms = stage_predictions(second, utterances)
+
+    sweep = sweep_thresholds(records, (first_labels, first_ms, confidences), (second_labels, second_ms), thresholds)
+    # a threshold above every confidence always escalates, i.e. equals the second stage alone plus the first stage
+    second_only = sweep_thresholds(records, (first_labels, np.zeros_like(first_ms), confidences),
+                                   (second_labels, second_ms), [np.inf])[0]
+    first_only = sweep_thresholds(records, (first_labels, first_ms, confidences),
+                                  (second_labels, second_ms), [0.0])[0]
+    recommended = recommend_threshold(sweep, second_only["accuracy"]["joint"], max_accuracy_drop)
+    return {
+        "records": len(records),
+        "firstStage": {k: first_only[k] for k in ("accuracy", "latencyMs")},
+        "secondStage": {k: second_only[k] for k in ("accuracy", "latencyMs")},
+        "thresholds": sweep,
+        "maxAccuracyDrop": max_accuracy_drop,
+        "recommended": recommended,
+        "speedup": second_only["latencyMs"]["mean"] / recommended["latencyMs"]["mean"] if recommended else None,
+    }
+
+
+if __name__ == '__main__':
+    def main() -> None:
+        import os
+        from dotenv import load_dotenv
+        import torch
+
+        parser = argparse.ArgumentParser(description=__doc__)
+        parser.add_argument("--data", default=str(DEFAULT_ANNOTATION_PATH), help="Path to the annotation dataset")
+        parser.add_argument("--output", required=True, help="File receiving the trained first stage")
+        parser.add_argument("--regularization", type=float, default=4.0,
+                            help="Inverse regularization strength of the logistic regression")
+        parser.add_argument("--test-fraction", type=float, default=0.2, help="Fraction of conversations held out")
+        parser.add_argument("--max-accuracy-drop", type=float, default=0.02,
+                            help="Joint accuracy the recommended threshold may lose against the second stage")
+        parser.add_argument("--seed", type=int, default=0)
+        args = parser.parse_args()
+
+        load_dotenv()
+        from tutor.backend.logic import make_sentiment_model
+
+        records = load_annotations(args.data)
+        train, test = split_records(records, args.test_fraction, args.seed)
+        first = train_tfidf_emotion_model(
+            [records[i]["utterance"] for i in train],
+            [records[i]["emotion"] for i in train],
+            [records[i]["polarity"] for i in train],
+            args.regularization,
+        )
+        save_tfidf_emotion_model(first, args.output)
+
+        second = make_sentiment_model(os.path.expanduser(os.getenv("MODELS_ROOT")), torch.device("cpu"))
+        if isinstance(second, CascadeEmotionModel):
+            second = second.second
+        report = evaluate_cascade(first, second, [records[i] for i in test], np.linspace(0.0, 1.0, 21),
+                                  args.max_accuracy_drop)
+        report_path = Path(args.output).with_suffix(".report.json")
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(json.dumps({k: v for k, v in report.items() if k != "thresholds"}, indent=2))
+
+    main()
@@ -0,0 +1,115 @@
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+from typing import Callable, Iterator, Self
+
+
+class RequestCancelledError(Exception):
+    """
+    Raised if a request was cancelled before it could be completed, e.g. because it was superseded.
+    """
+
+
+class CancellationToken:
+    """
+    Thread-safe flag that signals running work to stop. Callbacks registered via ``on_cancel`` are invoked once
+    the token is cancelled, e.g. to close connections of outbound requests.
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+        self._future: Future | None = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> bool:
+        """
+        :return: Whether the token was cancelled by this call, i.e. ``False`` if it had been cancelled before.
+        """
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self._event.set()
+            callbacks = self._callbacks
+            self._callbacks = []
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+        return True
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Registers a callback that is invoked when the token is cancelled, or right away if it already is.
+        :return: A function that unregisters the callback again.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+
+                def unregister() -> None:
+                    with self._lock:
+                        if callback in self._callbacks:
+                            self._callbacks.remove(callback)
+
+                return unregister
+        callback()
+        return lambda: None
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise RequestCancelledError()
+
+    def future(self) -> Future:
+        """
+        :return: A future that completes once the token is cancelled, e.g. to wait for work or cancellation.
+        """
+        with self._lock:
+            if self._future is None:
+                self._future = Future()
+                future = self._future
+            else:
+                return self._future
+        self.on_cancel(lambda: future.set_result(None))
+        return future
+
+    def child(self) -> Self:
+        """
+        :return: A token that is cancelled together with this token but can also be cancelled on its own.
+        """
+        child = type(self)()
+        self.on_cancel(child.cancel)
+        return child
+
+
+_current_cancellation: ContextVar[CancellationToken | None] = ContextVar("current_cancellation", default=None)
+
+
+def current_cancellation() -> CancellationToken:
+    """
+    :return: The cancellation token of the work running in the current context; a token that is never cancelled
+    if none was set.
+    """
+    token = _current_cancellation.get()
+    if token is None:
+        return CancellationToken()
+    return token
+
+
+@contextmanager
+def cancellation_scope(token: CancellationToken | None) -> Iterator[CancellationToken]:
+    """
+    Makes the given token the current cancellation token within the context.
+    """
+    context_token = _current_cancellation.set(token)
+    try:
+        yield current_cancellation()
+    finally:
+        _current_cancellation.reset(context_token)
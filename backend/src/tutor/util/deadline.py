@@ -0,0 +1,88 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+from typing import Iterator, Self
+
+
+class Deadline:
+    """
+    A point in time (based on the monotonic clock) until which some work has to be finished.
+    A deadline without expiration time never expires.
+    """
+
+    def __init__(self, seconds: float | None = None) -> None:
+        """
+        :param seconds: The time budget in seconds starting now, or ``None`` for an unbounded deadline.
+        """
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    @classmethod
+    def at(cls, expires_at: float | None) -> Self:
+        deadline = cls()
+        deadline.expires_at = expires_at
+        return deadline
+
+    def remaining(self) -> float | None:
+        """
+        :return: The remaining time in seconds (never negative), or ``None`` if the deadline is unbounded.
+        """
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def share(self, fraction: float) -> Self:
+        """
+        :param fraction: The fraction of the remaining time granted to the sub deadline, within [0, 1].
+        :return: A deadline that expires after the given fraction of this deadline's remaining time.
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return self.at(None)
+        return self.at(time.monotonic() + remaining * fraction)
+
+    def earliest(self, seconds: float | None) -> Self:
+        """
+        :return: A deadline that expires after the given number of seconds or with this deadline, whichever is first.
+        """
+        other = Deadline(seconds)
+        if self.expires_at is None:
+            return self.at(other.expires_at)
+        if other.expires_at is None:
+            return self.at(self.expires_at)
+        return self.at(min(self.expires_at, other.expires_at))
+
+
+class DeadlineExceededError(Exception):
+    """
+    Raised if a required stage of a request could not be completed before the request's deadline.
+    """
+
+
+_current_deadline: ContextVar[Deadline | None] = ContextVar("current_deadline", default=None)
+
+
+def current_deadline() -> Deadline:
+    """
+    :return: The deadline of the work running in the current context; unbounded if none was set.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return Deadline()
+    return deadline
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline | None) -> Iterator[Deadline]:
+    """
+    Makes the given deadline the current deadline within the context, e.g. to bound outbound requests of
+    language models without passing the deadline through every call.
+    """
+    token = _current_deadline.set(deadline)
+    try:
+        yield current_deadline()
+    finally:
+        _current_deadline.reset(token)
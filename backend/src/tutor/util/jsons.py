@@ -1,11 +1,19 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import io
+from itertools import islice
 import json
 from pathlib import Path
-from typing import Union, IO, TypeVar, Callable
+from typing import Union, IO, TypeVar, Callable, Iterable, Iterator, Sequence, Final
 
 from tutor.util.types import JsonResult
 
 _T = TypeVar("_T")
 
+READ_SIZE: Final[int] = 1 << 16  # characters read at once when streaming a JSON array
+JSONL_CHUNK_LINES: Final[int] = 4096  # lines parsed per task when parsing JSONL in parallel
+
 def load(source: Union[str, Path, IO]) -> JsonResult:
     """
     Load JSON data from a file path or a file-like object.
@@ -39,4 +47,199 @@ def load_or_default(source: Union[str, Path, IO], default: _T | Callable[[], _T]
         pass
     if isinstance(default, Callable):
         return default()
-    return default
\ No newline at end of file
+    return default
+
+
+@contextmanager
+def _open_text(source: Union[str, Path, IO]) -> Iterator[IO[str]]:
+    if isinstance(source, (str, Path)):
+        with open(source, 'r', encoding='utf-8') as f:
+            yield f
+    elif isinstance(source, (io.RawIOBase, io.BufferedIOBase)):
+        wrapper = io.TextIOWrapper(source, encoding='utf-8')
+        try:
+            yield wrapper
+        finally:
+            # the caller keeps owning the stream, which closing the wrapper would close as well
+            wrapper.detach()
+    else:
+        yield source
+
+
+def _project(record: JsonResult, fields: Sequence[str] | None) -> JsonResult:
+    if fields is None or not isinstance(record, dict):
+        return record
+    return {field: record[field] for field in fields if field in record}
+
+
+def _skip_whitespace(buffer: str, pos: int) -> int:
+    while pos < len(buffer) and buffer[pos].isspace():
+        pos += 1
+    return pos
+
+
+def _iter_array(f: IO[str], buffer: str, fields: Sequence[str] | None) -> Iterator[JsonResult]:
+    decoder = json.JSONDecoder()
+    pos = 1  # behind the opening bracket
+    eof = False
+    read_size = READ_SIZE
+    expect_element = True
+    while True:
+        pos = _skip_whitespace(buffer, pos)
+        if pos >= len(buffer):
+            if eof:
+                raise json.JSONDecodeError("Unterminated array", buffer, pos)
+            buffer, pos = f.read(READ_SIZE), 0
+            eof = not buffer
+            continue
+
+        if buffer[pos] == "]":
+            return
+        if not expect_element:
+            if buffer[pos] != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+            pos += 1
+            expect_element = True
+            continue
+
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+            # a number at the end of the buffer may continue in the next chunk, so the element is only complete if
+            # it is followed by a delimiter
+            complete = eof or (end < len(buffer) and (buffer[end] in ",]" or buffer[end].isspace()))
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            # drop the consumed part and read larger chunks until the element fits into the buffer
+            chunk = f.read(read_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            read_size *= 2
+            continue
+
+        yield _project(record, fields)
+        read_size = READ_SIZE
+        pos = end
+        expect_element = False
+
+
+def _chain_lines(prefix: str, f: IO[str]) -> Iterator[str]:
+    """
+    :return: The lines of the already read prefix of the file, followed by the remaining lines of the file.
+    """
+    lines = prefix.splitlines(keepends=True)
+    if lines and not lines[-1].endswith("\n"):
+        lines[-1] += f.readline()
+    yield from lines
+    yield from f
+
+
+def _parse_lines(lines: str, fields: Sequence[str] | None) -> list[JsonResult]:
+    return [_project(json.loads(line), fields) for line in lines.splitlines() if line.strip()]
+
+
+def _iter_lines(lines: Iterator[str], fields: Sequence[str] | None, workers: int) -> Iterator[JsonResult]:
+    if workers <= 1:
+        for line in lines:
+            if line.strip():
+                yield _project(json.loads(line), fields)
+        return
+
+    # parse chunks of lines in worker processes, keeping a bounded number of chunks in flight to bound the memory
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        while True:
+            while len(pending) < 2 * workers:
+                # a single joined string is much cheaper to send to a worker than a list of lines
+                chunk = "".join(islice(lines, JSONL_CHUNK_LINES))
+                if not chunk:
+                    break
+                pending.append(executor.submit(_parse_lines, chunk, fields))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+
+def iter_records(
+        source: Union[str, Path, IO],
+        fields: Sequence[str] | None = None,
+        workers: int = 1,
+) -> Iterator[JsonResult]:
+    """
+    Stream the records of a file holding either a top-level JSON array or one JSON value per line (JSONL).
+    Only the current record (or, for parallel JSONL parsing, a bounded number of line chunks) is held in memory.
+    :param source: The file path to the JSON or JSONL file or an open file-like object.
+    :type source: (str | Path | IO)
+    :param fields: The keys to keep of records that are objects; all keys if ``None``.
+    :type fields: Sequence[str] | None
+    :param workers: The number of processes parsing JSONL lines in parallel, which pays off for large files with
+    expensive records on multiple cores. JSON arrays are always parsed sequentially.
+    :type workers: int
+    :return: An iterator over the records in file order.
+    """
+    return _iter_records(source, fields, workers, allow_empty=True)
+
+
+def _iter_records(
+        source: Union[str, Path, IO],
+        fields: Sequence[str] | None,
+        workers: int,
+        allow_empty: bool,
+) -> Iterator[JsonResult]:
+    """
+    :param allow_empty: Whether an empty file has no records; otherwise it cannot be decoded, like with ``load``.
+    """
+    with _open_text(source) as f:
+        buffer = f.read(READ_SIZE)
+        pos = _skip_whitespace(buffer, 0)
+        while pos >= len(buffer):
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                if not allow_empty:
+                    raise json.JSONDecodeError("Expecting value", buffer, pos)
+                return
+            buffer, pos = buffer[pos:] + chunk, 0
+            pos = _skip_whitespace(buffer, pos)
+
+        if buffer[pos] == "[":
+            yield from _iter_array(f, buffer[pos:], fields)
+        else:
+            yield from _iter_lines(_chain_lines(buffer[pos:], f), fields, workers)
+
+
+def iter_records_or_default(
+        source: Union[str, Path, IO],
+        default: Iterable[_T] | Callable[[], Iterable[_T]],
+        fields: Sequence[str] | None = None,
+        workers: int = 1,
+) -> Iterator[JsonResult | _T]:
+    """
+    Stream the records of a JSON array or JSONL file like ``iter_records``, falling back to a default like
+    ``load_or_default``.
+    :param source: The file path to the JSON or JSONL file or an open file-like object.
+    :type source: (str | Path | IO)
+    :param default: The records to yield if the file does not exist, is empty or its first record cannot be loaded. If a
+    callable with no parameters is provided, the records it returns are yielded instead. Errors after the first
+    record was yielded are raised, as the yielded records cannot be taken back.
+    :type default: Iterable[_T] | Callable[[], Iterable[_T]]
+    :param fields: The keys to keep of records that are objects; all keys if ``None``.
+    :type fields: Sequence[str] | None
+    :param workers: The number of processes parsing JSONL lines in parallel.
+    :type workers: int
+    :return: An iterator over the records in file order, or over the default records.
+    """
+    # an empty file falls back to the default like with ``load_or_default``, while an empty array has no records
+    records = _iter_records(source, fields, workers, allow_empty=False)
+    try:
+        first = next(records)
+    except StopIteration:
+        return
+    except (OSError, json.decoder.JSONDecodeError):
+        if isinstance(default, Callable):
+            default = default()
+        yield from default
+        return
+    yield first
+    yield from records
@@ -0,0 +1,121 @@
+from collections import deque
+import threading
+from typing import Final
+
+import numpy as np
+
+
+class RollingWindow:
+    """
+    Thread-safe window over the most recent samples of a measurement, e.g. request latencies.
+    Older samples are discarded once the window is full.
+    """
+
+    def __init__(self, size: int = 256) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, value: float) -> None:
+        with self._lock:
+            self._samples.append(value)
+
+    def percentile(self, q: float) -> float | None:
+        """
+        :param q: The percentile to compute, within [0, 100].
+        :return: The q-th percentile of the samples in the window or ``None`` if the window is empty.
+        """
+        with self._lock:
+            if len(self._samples) == 0:
+                return None
+            samples = np.fromiter(self._samples, dtype=np.float64)
+        return float(np.percentile(samples, q))
+
+
+class Counter:
+    """
+    Thread-safe, monotonically increasing counter.
+    """
+
+    def __init__(self) -> None:
+        self._value = 0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> int | float:
+        return self._value
+
+    def increment(self, amount: int | float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+
+class Gauge:
+    """
+    Thread-safe value that can go up and down, e.g. the memory in use.
+    """
+
+    def __init__(self) -> None:
+        self._value = 0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> int | float:
+        return self._value
+
+    def set(self, value: int | float) -> None:
+        with self._lock:
+            self._value = value
+
+
+class MetricsRegistry:
+    """
+    Named collection of counters, gauges and rolling windows that can be exported as one JSON-compatible snapshot.
+    """
+
+    def __init__(self) -> None:
+        self._counters: dict[str, Counter] = {}
+        self._gauges: dict[str, Gauge] = {}
+        self._windows: dict[str, RollingWindow] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str) -> Counter:
+        with self._lock:
+            if name not in self._counters:
+                self._counters[name] = Counter()
+            return self._counters[name]
+
+    def gauge(self, name: str) -> Gauge:
+        with self._lock:
+            if name not in self._gauges:
+                self._gauges[name] = Gauge()
+            return self._gauges[name]
+
+    def window(self, name: str, size: int = 256) -> RollingWindow:
+        with self._lock:
+            if name not in self._windows:
+                self._windows[name] = RollingWindow(size)
+            return self._windows[name]
+
+    def snapshot(self) -> dict[str, int | float | dict[str, float | None]]:
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            windows = dict(self._windows)
+
+        result = {name: counter.value for name, counter in sorted(counters.items())}
+        for name, gauge in sorted(gauges.items()):
+            result[name] = gauge.value
+        for name, window in sorted(windows.items()):
+            result[name] = {
+                "count": len(window),
+                "p50": window.percentile(50.0),
+                "p95": window.percentile(95.0),
+                "p99": window.percentile(99.0),
+            }
+        return result
+
+
+METRICS: Final[MetricsRegistry] = MetricsRegistry()
@@ -0,0 +1,49 @@
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket that refills continuously at ``rate`` tokens per second up to ``capacity`` tokens.
+    The bucket itself is not thread-safe; callers are expected to guard it with their own lock.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        start = max(self._updated, self._paused_until)
+        if now > start:
+            self._tokens = min(self.capacity, self._tokens + (now - start) * self.rate)
+        self._updated = max(now, self._updated)
+
+    def wait_time(self, amount: float) -> float:
+        """
+        :param amount: The number of tokens to acquire. Amounts above the capacity are clipped to the capacity.
+        :return: The time in seconds until the given amount of tokens is available.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        pause = max(0.0, self._paused_until - now)
+        if self._tokens >= amount:
+            return pause
+        return pause + (amount - self._tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        """
+        Takes the given amount of tokens; a negative amount returns tokens, e.g. if fewer were used than reserved.
+        """
+        self._refill(time.monotonic())
+        self._tokens = min(self.capacity, self._tokens - min(amount, self.capacity))
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stop refilling and handing out tokens for the given time, e.g. after the provider asked to back off.
+        """
+        self._refill(time.monotonic())
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = min(self._tokens, 0.0)
@@ -0,0 +1,78 @@
+import logging
+import os
+import statistics
+import time
+from typing import Callable, Final
+
+import torch
+
+from tutor.util.metrics import METRICS
+
+_logger = logging.getLogger(__name__)
+
+COMPILE_ARTIFACTS_FILE: Final[str] = "compile_artifacts.bin"
+
+
+def warm_up(name: str, func: Callable[[], object], repeats: int = 3) -> tuple[float, float | None]:
+    """
+    Runs a representative workload several times, so that kernels are loaded (or compiled) and allocators are sized
+    before the first request arrives.
+    The latency of the first run is published as ``warmup.<name>.first_ms`` and that of the later runs as
+    ``warmup.<name>.steady_ms``.
+    :param name: The name of the warmed up component.
+    :param func: The workload.
+    :param repeats: The number of runs.
+    :return: The latency of the first run and the median latency of the later runs in milliseconds, the latter
+    ``None`` for a single run.
+    """
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+
+    first = latencies[0]
+    steady = statistics.median(latencies[1:]) if len(latencies) > 1 else None
+    METRICS.window(f"warmup.{name}.first_ms").add(first)
+    if steady is not None:
+        METRICS.window(f"warmup.{name}.steady_ms").add(steady)
+        _logger.info(f"Warmed up {name}: first run {first:.0f}ms, steady state {steady:.0f}ms")
+    else:
+        _logger.info(f"Warmed up {name}: first run {first:.0f}ms")
+    return first, steady
+
+
+def load_compile_cache(cache_dir: str) -> None:
+    """
+    Directs the compiler's on-disk caches to ``cache_dir`` and loads the compiled artifacts saved there by a previous
+    run, so compiled models start without recompiling. Must be called before the first model is compiled.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", cache_dir)
+    os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+    os.environ.setdefault("TORCHINDUCTOR_AUTOGRAD_CACHE", "1")
+
+    artifacts_path = os.path.join(cache_dir, COMPILE_ARTIFACTS_FILE)
+    if os.path.exists(artifacts_path) and hasattr(torch.compiler, "load_cache_artifacts"):
+        with open(artifacts_path, "rb") as f:
+            torch.compiler.load_cache_artifacts(f.read())
+        _logger.info(f"Loaded compiled artifacts from {artifacts_path}")
+
+
+def save_compile_cache(cache_dir: str) -> None:
+    """
+    Saves the artifacts compiled so far, e.g. after the warmup, to ``cache_dir`` for the next run.
+    """
+    if not hasattr(torch.compiler, "save_cache_artifacts"):
+        return
+    artifacts = torch.compiler.save_cache_artifacts()
+    if artifacts is None:
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    artifacts_path = os.path.join(cache_dir, COMPILE_ARTIFACTS_FILE)
+    tmp_path = f"{artifacts_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(artifacts[0])
+    os.replace(tmp_path, artifacts_path)
+    _logger.info(f"Saved compiled artifacts to {artifacts_path}")
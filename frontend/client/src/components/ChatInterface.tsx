@@ -35,7 +35,8 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({
 
   // Get webcam and voice recognition hooks
   const webcam = useEmotionWebcam({
-    emotionModel: FaceEmotionModel.faceApi
+    emotionModel: FaceEmotionModel.faceApi,
+    sessionId,
   });
   const voice = useVoiceRecognition();
 
@@ -13,9 +13,10 @@ export enum FaceEmotionModel {
 
 export interface EmotionWebcamProps {
   emotionModel: FaceEmotionModel;
+  sessionId?: string | null;
 }
 
-export const useEmotionWebcam = ({emotionModel}: EmotionWebcamProps) => {
+export const useEmotionWebcam = ({emotionModel, sessionId}: EmotionWebcamProps) => {
   const [isWebcamActive, setIsWebcamActive] = useState(false);
   const [webcamReady, setWebcamReady] = useState(false);
   const [webcamError, setWebcamError] = useState<string | null>(null);
@@ -31,6 +32,8 @@ export const useEmotionWebcam = ({emotionModel}: EmotionWebcamProps) => {
 
   const currentEmotionRef = useRef(currentEmotion);
   const emotionLoopActiveRef = useRef(emotionLoopActive);
+  // the backend recommends when to capture the next frame, based on the emotion's stability and its load
+  const captureDelayRef = useRef<number>(WEBCAM_EMOTION_DETECTION_DELAY);
   const videoRef = useRef<HTMLVideoElement | null>(null);
   const streamRef = useRef<MediaStream | null>(null);
 
@@ -202,7 +205,7 @@ export const useEmotionWebcam = ({emotionModel}: EmotionWebcamProps) => {
   useEffect(() => {
     if (!isWebcamActive || !webcamReady || !videoRef.current || !modelsLoaded) return;
 
-    let intervalId: NodeJS.Timeout;
+    let timeoutId: NodeJS.Timeout;
     let active = true;
 
     const detectEmotions = async () => {
@@ -275,6 +278,7 @@ export const useEmotionWebcam = ({emotionModel}: EmotionWebcamProps) => {
                   const formData = new FormData();
                   const now_str = new Date().toISOString().replace(/[:.]/g, '-');
                   formData.append("image", blob, `frame_${now_str}.jpg`);
+                  if (sessionId) formData.append("sessionId", sessionId);
 
                   const response = await fetch("/api/emotion/face", {
                     method: "POST",
@@ -287,6 +291,7 @@ export const useEmotionWebcam = ({emotionModel}: EmotionWebcamProps) => {
 
                   emotion = data.emotion ?? "neutral";
                   confidence = data.confidence ?? 0.0;
+                  captureDelayRef.current = data.nextCaptureMs ?? WEBCAM_EMOTION_DETECTION_DELAY;
                 } catch (error) {
                   console.error("Error sending frame to API:", error);
                 }
@@ -312,13 +317,19 @@ export const useEmotionWebcam = ({emotionModel}: EmotionWebcamProps) => {
       }
     }
 
-    intervalId = setInterval(detectEmotions, WEBCAM_EMOTION_DETECTION_DELAY);
+    const scheduleDetection = () => {
+      timeoutId = setTimeout(async () => {
+        await detectEmotions();
+        if (active) scheduleDetection();
+      }, captureDelayRef.current);
+    };
+    scheduleDetection();
 
     return () => {
       active = false;
-      clearInterval(intervalId);
+      clearTimeout(timeoutId);
     };
-  }, [isWebcamActive, webcamReady, modelsLoaded]);
+  }, [isWebcamActive, webcamReady, modelsLoaded, sessionId]);
 
 
   return {
@@ -95,12 +95,16 @@ export async function fetchLLMResponse(
 
 export interface EmotionResponse{
   emotion: string,
-  confidence: number
+  confidence: number,
+  nextCaptureMs?: number
 }
 
-export const fetchFaceEmotion = async (file: Express.Multer.File) => {
+export const fetchFaceEmotion = async (file: Express.Multer.File, sessionId?: string) => {
   const form = new FormData();
   form.append("image", file.buffer, file.originalname);
+  if (sessionId) {
+    form.append("sessionId", sessionId);
+  }
 
   let result = null;
   try {
@@ -127,5 +131,6 @@ export const fetchFaceEmotion = async (file: Express.Multer.File) => {
   return {
     emotion: castResult.emotion,
     confidence: castResult.confidence,
+    nextCaptureMs: castResult.nextCaptureMs,
   }
 }
\ No newline at end of file
@@ -197,10 +197,11 @@ export async function registerRoutes(app: Express): Promise<Server> {
     if (!req.file) return res.status(400).json({ error: 'No file uploaded' });
 
     const file = req.file;
-    const faceEmotion = await fetchFaceEmotion(file);
+    const faceEmotion = await fetchFaceEmotion(file, req.body?.sessionId);
     return res.status(201).json({
       emotion: faceEmotion.emotion,
       confidence: faceEmotion.confidence,
+      nextCaptureMs: faceEmotion.nextCaptureMs,
     })
 
   });